@@ -42,7 +42,7 @@ from app.routes.insights import router as insights_router
 from app.routes.profile import router as profile_router
 from app.routes.memory import router as memory_router
 from app.routes.activity import router as activity_router
-from app.services.feed_scheduler import start_scheduler
+from app.services.scheduler import start_scheduler
 from app.routes.memory_state import router as memory_state_router
 from app.routes.device import router as device_router
 from app.routes.push import router as push_router
@@ -115,14 +115,42 @@ async def _register_shopier_webhook_on_startup():
         _log.warning("Shopier webhook auto-register failed: %s", exc)
 
 
-@app.on_event("startup")
-def start_background_jobs():
-    try:
-        start_scheduler()
-    except Exception as exc:
-        import logging
-        logging.getLogger("sanri.scheduler").warning("Scheduler start failed: %s", exc)
-      
+@app.on_event("shutdown")
+async def _close_llm_gateway():
+    from app.services.llm_gateway import aclose
+    await aclose()
+
+
+@app.on_event("shutdown")
+def _flush_ingest_buffers():
+    from app.services.ingest_buffer import stop_flusher
+    stop_flusher()
+
+
+@app.on_event("shutdown")
+def _stop_snapshot_refresher():
+    from app.services.metrics_snapshot import stop_refresher
+    stop_refresher()
+
+
+@app.on_event("shutdown")
+def _stop_job_workers():
+    from app.services.job_queue import stop_workers
+    stop_workers()
+
+
+@app.on_event("shutdown")
+def _stop_realtime_listener():
+    from app.services.realtime import stop_listener
+    stop_listener()
+
+
+@app.on_event("shutdown")
+def _stop_scheduler():
+    from app.services.scheduler import stop_scheduler
+    stop_scheduler()
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "service": "SANRI API"}
@@ -133,13 +161,92 @@ def health():
 
 @app.get("/health/scheduler")
 def health_scheduler():
-    from app.services.feed_scheduler import get_scheduler_health
+    from app.services.scheduler import get_scheduler_health
     return get_scheduler_health()
 
+@app.get("/health/jobs")
+def health_jobs():
+    from app.db import SessionLocal
+    from app.services.job_queue import get_queue_stats
+    db = SessionLocal()
+    try:
+        return get_queue_stats(db)
+    finally:
+        db.close()
+
+@app.get("/health/ingest")
+def health_ingest():
+    from app.services.ingest_buffer import get_ingest_stats
+    return get_ingest_stats()
+
+@app.get("/health/snapshots")
+def health_snapshots():
+    from app.services.metrics_snapshot import get_snapshot_stats
+    return get_snapshot_stats()
+
+@app.get("/health/entitlements")
+def health_entitlements():
+    from app.services.entitlement_cache import get_cache_stats
+    return get_cache_stats()
+
+@app.get("/health/auth")
+def health_auth():
+    from app.services.user_cache import get_user_cache_stats
+    return get_user_cache_stats()
+
+@app.get("/health/migrations")
+def health_migrations():
+    from app.services.migrations import get_migration_status
+    return get_migration_status()
+
+@app.get("/health/presence-index")
+def health_presence_index():
+    from app.services.presence_index import get_index_stats
+    return get_index_stats()
+
+@app.get("/health/embeddings")
+def health_embeddings():
+    from app.services.embedding_store import get_stats
+    return get_stats()
+
+@app.get("/health/realtime")
+def health_realtime():
+    from app.services.realtime import get_realtime_stats
+    return get_realtime_stats()
+
+@app.get("/health/matchmaker")
+def health_matchmaker():
+    from app.services.matchmaker import get_matchmaker_stats
+    return get_matchmaker_stats()
+
+@app.get("/health/llm-cache")
+def health_llm_cache():
+    from app.services.llm_cache import get_stats
+    return get_stats()
+
 @app.on_event("startup")
 def _startup():
     import app.models  # tek satır yeter
     Base.metadata.create_all(bind=engine)
+
+    from app.services.migrations import run_migrations
+    run_migrations()
+
+    from app.services.job_queue import start_workers
+    start_workers()
+
+    from app.services.ingest_buffer import start_flusher
+    start_flusher()
+
+    from app.services.metrics_snapshot import start_refresher
+    start_refresher()
+
+    # tablolar ve migration'lar hazır olduktan sonra: ilk kira denemesi boş DB'de patlamasın
+    try:
+        start_scheduler()
+    except Exception as exc:
+        import logging
+        logging.getLogger("sanri.scheduler").warning("Scheduler start failed: %s", exc)
 # --------------------
 # CORS (FXED)
 # --------------------
@@ -1,6 +1,6 @@
 # app/models/__init__.py
 from .user import User
-from .usage import Usage
+from .usage import Usage, SanriDailyCount  # noqa: F401
 from .content import DailyStream, WeeklySymbol  # noqa: F401
 from .yanki import YankiPost, YankiComment, YankiReaction, YankiReport, YankiFieldEcho  # noqa: F401
 from .sanri_reflection import SanriReflection  # noqa: F401
@@ -9,4 +9,11 @@ from .referral import YankiReferral  # noqa: F401
 from .billing import Subscription, Purchase, ContentUnlock, UserEntitlement  # noqa: F401
 from .funnel_event import FunnelEvent  # noqa: F401
 from .anlasilma_field import AnlasilmaPresence, AnlasilmaChatRoom, AnlasilmaChatMessage  # noqa: F401
-from .daily_feeling import DailyFeeling  # noqa: F401
\ No newline at end of file
+from .daily_feeling import DailyFeeling  # noqa: F401
+from .llm_cache import LLMResponseCache  # noqa: F401
+from .embedding_cache import EmbeddingCache  # noqa: F401
+from .global_signal import GlobalSignal, GlobalSignalToken, GlobalNotification  # noqa: F401
+from .memory import UserMemorySummary  # noqa: F401
+from .background_job import BackgroundJob  # noqa: F401
+from .scheduler import SchedulerLease, SchedulerRun  # noqa: F401
+from .analytics_rollup import PageViewHourly, PageViewDaily, PageViewDailyPath, PageViewVisitor, PageViewRetentionCell, RollupState  # noqa: F401
@@ -0,0 +1,57 @@
+"""page_views ön-toplamları (bkz. app/services/analytics_rollup.py)."""
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, Integer, LargeBinary, String
+
+from app.models.base import Base
+
+
+class PageViewHourly(Base):
+    __tablename__ = "pv_rollup_hourly"
+
+    hour = Column(DateTime, primary_key=True)  # UTC, saat başı
+    views = Column(Integer, nullable=False, default=0)
+    visitors_hll = Column(LargeBinary, nullable=False)
+
+
+class PageViewDaily(Base):
+    __tablename__ = "pv_rollup_daily"
+
+    day = Column(Date, primary_key=True)  # UTC
+    views = Column(Integer, nullable=False, default=0)
+    visitors_hll = Column(LargeBinary, nullable=False)
+
+
+class PageViewDailyPath(Base):
+    __tablename__ = "pv_rollup_daily_paths"
+
+    day = Column(Date, primary_key=True)
+    path = Column(String(500), primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+
+
+class PageViewVisitor(Base):
+    """ip_hash başına ilk hafta + son iki farklı ziyaret günü (retention / returning)."""
+    __tablename__ = "pv_rollup_visitors"
+
+    ip_hash = Column(String(64), primary_key=True)
+    first_week = Column(Date, nullable=False, index=True)
+    last_week = Column(Date, nullable=False)
+    last_day = Column(Date, nullable=False)
+    prev_day = Column(Date, nullable=True, index=True)
+
+
+class PageViewRetentionCell(Base):
+    __tablename__ = "pv_rollup_retention"
+
+    first_week = Column(Date, primary_key=True)
+    week_num = Column(Integer, primary_key=True)
+    retained = Column(Integer, nullable=False, default=0)
+
+
+class RollupState(Base):
+    __tablename__ = "rollup_state"
+
+    name = Column(String(64), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
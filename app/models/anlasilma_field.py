@@ -1,7 +1,7 @@
 """Anlaşılma Alanı — anonim frekans + niyet (user_id yok, session_id)."""
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Integer, LargeBinary, String, Text
 
 from app.db import Base
 
@@ -14,7 +14,8 @@ class AnlasilmaPresence(Base):
     frequency_hz = Column(Integer, nullable=False, index=True)
     intent_text = Column(String(200), nullable=False)
     emotion_tags = Column(Text, nullable=True)  # JSON array string
-    embedding_json = Column(Text, nullable=True)  # JSON list[float]
+    embedding_json = Column(Text, nullable=True)  # eski satırlar: JSON list[float]
+    embedding_blob = Column(LargeBinary, nullable=True)  # float32 bayt (presence_index.to_blob)
     wants_chat = Column(Boolean, default=False, nullable=False)
     last_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
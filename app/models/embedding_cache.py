@@ -0,0 +1,17 @@
+"""Embedding deposunun kalıcı katmanı (bkz. app/services/embedding_store.py)."""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+
+from app.models.base import Base
+
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+
+    text_hash = Column(String(64), primary_key=True)  # sha256(model, metin)
+    model = Column(String(80), nullable=False)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 bayt
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy import Column, String, DateTime, Float, Index, JSON
 from sqlalchemy.sql import func
 from app.db import Base
 
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_action_created", "action", "created_at"),
+        Index("ix_events_created", "created_at"),
+        Index("ix_events_user_created", "user_id", "created_at"),
+    )
 
     id = Column(String, primary_key=True)
     user_id = Column(String, nullable=True)
@@ -14,4 +19,9 @@ class Event(Base):
 
     meta = Column(JSON, nullable=True)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    # meta'dan yazımda kopyalanan sıcak anahtarlar (bkz. app/services/event_columns.py)
+    session_id = Column(String(128), nullable=True)
+    screen = Column(String(255), nullable=True)
+    duration_sec = Column(Float, nullable=True)  # heartbeat: duration_sec, time_spent: seconds
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,49 @@
+"""Global sinyal alanı — sinyaller, token ters indeksi ve yankı bildirimleri."""
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text
+
+from app.db import Base
+
+
+class GlobalSignal(Base):
+    __tablename__ = "global_signals"
+    __table_args__ = (
+        Index("ix_global_signals_pending", "echo_processed", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String(120), nullable=False, default="anonymous")
+    text = Column(Text, nullable=False)
+    country = Column(String(16), nullable=False, default="UNKNOWN")
+    token_count = Column(Integer, nullable=False, default=0)
+    echo_processed = Column(Boolean, nullable=False, default=False)
+    echo_matches_json = Column(Text, nullable=True)  # JSON list[dict]
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class GlobalSignalToken(Base):
+    """Ters indeks: token → sinyal. Aday arama `token IN (...)` ile."""
+    __tablename__ = "global_signal_tokens"
+    __table_args__ = (
+        Index("ix_global_signal_tokens_signal", "signal_id"),
+    )
+
+    token = Column(String(64), primary_key=True)
+    signal_id = Column(Integer, primary_key=True)
+
+
+class GlobalNotification(Base):
+    __tablename__ = "global_notifications"
+    __table_args__ = (
+        Index("ix_global_notifications_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String(120), nullable=False)
+    signal_id = Column(Integer, nullable=False, unique=True)  # sinyal başına tek bildirim
+    title = Column(String(200), nullable=False)
+    message = Column(Text, nullable=False)
+    items_json = Column(Text, nullable=False)  # JSON list[dict]
+    is_read = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,16 @@
+"""LLM yanıt önbelleğinin kalıcı katmanı (bkz. app/services/llm_cache.py)."""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String, Text
+
+from app.models.base import Base
+
+
+class LLMResponseCache(Base):
+    __tablename__ = "llm_response_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 hex
+    namespace = Column(String(64), nullable=False, index=True)
+    value_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
 from sqlalchemy.sql import func
 from app.db import Base
 
@@ -15,4 +15,19 @@ class Memory(Base):
     input_text = Column(Text, nullable=False)
     output_text = Column(Text, nullable=False)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class UserMemorySummary(Base):
+    """Sanrı kayan hafıza özeti — user_memory satırlarının katlanmış hali (bkz. memory_compaction)."""
+    __tablename__ = "user_memory_summaries"
+
+    user_id = Column(Integer, primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    memory_line = Column(Text, nullable=True)
+    pattern_counts = Column(JSON, nullable=False, default=dict)
+
+    # Özete katlanmış en büyük user_memory.id
+    last_memory_id = Column(Integer, nullable=False, default=0)
+    folded_rows = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
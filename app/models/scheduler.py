@@ -0,0 +1,27 @@
+"""Zamanlayıcı lider kirası + çalışma geçmişi (bkz. app/services/scheduler.py)."""
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text
+
+from app.models.base import Base
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    acquired_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class SchedulerRun(Base):
+    __tablename__ = "scheduler_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(64), nullable=False, index=True)
+    node = Column(String(128), nullable=True)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    duration_ms = Column(Integer, nullable=False, default=0)
+    ok = Column(Boolean, nullable=False, default=True)
+    error = Column(Text, nullable=True)
@@ -19,4 +19,12 @@ class Usage(Base):
 
     __table_args__ = (
         UniqueConstraint("external_id", "day", name="uq_usage_external_day"),
-    )
\ No newline at end of file
+    )
+
+class SanriDailyCount(Base):
+    """Sanrı ücretsiz limit sayacı — user_memory üzerinde günlük COUNT(*) yerine."""
+    __tablename__ = "sanri_daily_counts"
+
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    message_count = Column(Integer, default=0, nullable=False)
@@ -1,10 +1,6 @@
-from openai import OpenAI
-import os
+from app.services import llm_gateway
 
-_client = None
 
 def get_client():
-    global _client
-    if _client is None:
-        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    return _client
\ No newline at end of file
+    """Eski import yolu — paylaşılan havuzlu istemciyi döndürür."""
+    return llm_gateway.get_sync_client()
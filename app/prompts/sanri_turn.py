@@ -0,0 +1,128 @@
+"""
+Sanrı sohbet turu — prompt yerleşimi.
+
+Sağlayıcı tarafı prompt cache'i yalnızca birebir aynı önekte çalışır. Bu yüzden
+mesajlar iki parçaya ayrılır:
+
+- system: statik önek (temel sistem + dil + kapı talimatı + kurallar).
+  Kullanıcıya özgü hiçbir şey içermez; aynı dil/kapı için byte düzeyinde sabittir.
+- user: dinamik kuyruk (aktif profil, hafıza, mesaj) — tek kez eklenir.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from functools import lru_cache
+
+from app.prompts.system_base import build_system_prompt
+
+SANRI_CRITICAL_RULES = """
+CRITICAL RULES:
+1. If the user asks what they said before, who said what, or whether you remember, you MUST answer directly from MEMORY.
+2. In memory questions, do NOT become abstract.
+3. If memory exists, use it clearly.
+4. Stay short, human, conscious, and clear — mirror first, not question-first.
+5. Maximum 4 sentences. Do not end every reply with a question; often use none.
+6. NEVER end your response with a question mark.
+7. The last sentence must always be a statement, not a question.
+8. If the user does not want questions, ask zero questions.
+9. Sanri does not interrogate; Sanri makes the pattern visible.
+10. Close with insight, naming, direction, or opening — never a question.
+11. Awakened / gate context: hold city or gate energy in imagery and tone; never interrogate the user.
+""".strip()
+
+SANRI_PROFILE_RULES = """
+BEHAVIOR RULES (ACTIVE SANRI PROFILE)
+- Level 1 mirror: short, simple, reflective
+- Level 2 rememberer: uses memory clearly
+- Level 3 heart_reader: warmer, more intimate
+- Level 4 path_opener: more directional and sharp
+- Level 5 deep_witness: deep, aware, precise, but still human
+
+Always match the active level naturally.
+""".strip()
+
+SANRI_TURN_RULES = """
+TURN RULES:
+The user message contains ACTIVE SANRI PROFILE, USER PROFILE, MEMORY and the current message.
+If the user is asking about past conversation, memory, or recall, answer directly using MEMORY.
+Do NOT go abstract in those cases.
+
+If the user says they do not want questions, do not ask a question.
+Give a direct opening, name the pattern, and suggest one next step.
+
+IMPORTANT ENDING RULE:
+Cevabı soru ile bitirme.
+Son cümle soru değil, net bir ifade olsun.
+Kullanıcı soru istemiyorsa hiç soru sorma.
+""".strip()
+
+# ACTIVE SANRI PROFILE satırlarında zaten yer alan / mesajın kendisini tekrarlayan alanlar.
+_PROFILE_TAIL_SKIP = {
+    "sanri_level",
+    "sanri_archetype",
+    "sanri_tone",
+    "dominant_emotion",
+    "intent",
+    "last_message",
+}
+
+
+@lru_cache(maxsize=128)
+def build_static_prefix(lang: str = "tr", system_context: str = "", gate_name: str = "") -> str:
+    lang_instruction = (
+        "Respond in Turkish."
+        if (lang or "tr").lower() == "tr"
+        else "Respond in English."
+    )
+
+    gate_block = ""
+    if system_context:
+        gate_label = gate_name or "Gate"
+        gate_block = (
+            f"\n\nACTIVE GATE: {gate_label}\n"
+            f"GATE INSTRUCTIONS (follow these strictly, they define your tone and behavior for this gate):\n"
+            f"{system_context}\n"
+        )
+
+    return (
+        build_system_prompt("user")
+        + "\n\n"
+        + lang_instruction
+        + gate_block
+        + "\n\n"
+        + SANRI_PROFILE_RULES
+        + "\n\n"
+        + SANRI_CRITICAL_RULES
+        + "\n\n"
+        + SANRI_TURN_RULES
+    )
+
+
+def prefix_version(prefix: str) -> str:
+    """Log'da öneklerin kararlılığını izlemek için kısa parmak izi."""
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:12]
+
+
+def build_dynamic_tail(runtime_profile: dict, memory_text: str, user_message: str) -> str:
+    rest = {k: v for k, v in runtime_profile.items() if k not in _PROFILE_TAIL_SKIP}
+
+    return f"""
+ACTIVE SANRI PROFILE
+level: {runtime_profile.get("sanri_level", 1)}
+archetype: {runtime_profile.get("sanri_archetype", "mirror")}
+tone: {runtime_profile.get("sanri_tone", "clear")}
+dominant_emotion: {runtime_profile.get("dominant_emotion", "neutral")}
+intent: {runtime_profile.get("intent", "reflection")}
+
+USER PROFILE:
+{json.dumps(rest, ensure_ascii=False)}
+
+MEMORY:
+{memory_text}
+
+Current user message:
+{user_message}
+
+Now respond:
+""".strip()
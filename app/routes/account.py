@@ -4,6 +4,7 @@ from sqlalchemy import text
 
 from app.db import get_db
 from app.services.auth import decode_token
+from app.services.user_cache import invalidate_user
 
 router = APIRouter(prefix="/auth", tags=["account"])
 
@@ -39,6 +40,7 @@ def delete_account(
             {"uid": user_id},
         )
         db.commit()
+        invalidate_user(user_id)
 
         return {"success": True, "message": "Account deleted"}
 
@@ -4,7 +4,7 @@ import json
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, text as sa_text
@@ -12,7 +12,9 @@ from sqlalchemy import func, desc, text as sa_text
 from app.db import get_db, engine
 from app.models.event import Event
 from app.models.memory import Memory
-from app.services.auth import decode_token
+from app.services import keyset, metric_batch, metrics_snapshot, migrations
+from app.routes.auth import get_current_admin
+from app.services.user_cache import invalidate_user
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -23,6 +25,7 @@ ADMIN_TOKEN = (os.getenv("SANRI_ADMIN_TOKEN") or "").strip()
 # TABLES
 # ═══════════════════════════════════════════════
 
+@migrations.register(2, "admin_audit_log")
 def _ensure_admin_tables():
     with engine.connect() as conn:
         conn.execute(sa_text("""
@@ -40,12 +43,6 @@ def _ensure_admin_tables():
         conn.commit()
 
 
-try:
-    _ensure_admin_tables()
-except Exception as e:
-    print(f"[ADMIN] Table migration: {e}")
-
-
 # ═══════════════════════════════════════════════
 # AUTH
 # ═══════════════════════════════════════════════
@@ -61,22 +58,7 @@ def _require_jwt(
     authorization: Optional[str] = Header(default=None),
     db: Session = Depends(get_db),
 ):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = authorization.replace("Bearer ", "").strip()
-    payload = decode_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    uid = payload.get("sub")
-    if not uid:
-        raise HTTPException(status_code=401, detail="Bad token")
-    row = db.execute(
-        sa_text("SELECT id, email, role FROM users WHERE id = :uid LIMIT 1"),
-        {"uid": int(uid)},
-    ).mappings().first()
-    if not row or row["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Admin only")
-    return dict(row)
+    return get_current_admin(authorization, db)
 
 
 # ═══════════════════════════════════════════════
@@ -112,13 +94,15 @@ def overview(db: Session = Depends(get_db), x_admin_token: Optional[str] = Heade
     now = datetime.now(timezone.utc)
     s24 = now - timedelta(hours=24)
     s7d = now - timedelta(days=7)
-    total = db.query(func.count(Event.id)).scalar() or 0
-    e24 = db.query(func.count(Event.id)).filter(Event.created_at >= s24).scalar() or 0
-    e7d = db.query(func.count(Event.id)).filter(Event.created_at >= s7d).scalar() or 0
+    ev = metric_batch.run_metrics(db, "events", [
+        metric_batch.count("total"),
+        metric_batch.count("e24", "created_at >= :s24"),
+        metric_batch.count("e7d", "created_at >= :s7d"),
+    ], {"s24": s24, "s7d": s7d})
     td = db.query(Event.domain, func.count(Event.id).label("c")).filter(Event.created_at >= s7d).group_by(Event.domain).order_by(desc(func.count(Event.id))).limit(10).all()
     last = db.query(Event).order_by(desc(Event.created_at)).limit(20).all()
     return {
-        "total_events": int(total), "events_24h": int(e24), "events_7d": int(e7d),
+        "total_events": ev["total"], "events_24h": ev["e24"], "events_7d": ev["e7d"],
         "top_domains": [{"domain": d or "unknown", "count": int(c)} for d, c in td],
         "last_events": [{"id": e.id, "user_id": e.user_id, "action": e.action, "domain": e.domain, "meta": e.meta, "created_at": e.created_at.isoformat() if e.created_at else None} for e in last],
     }
@@ -148,25 +132,39 @@ def legacy_memories(limit: int = 50, offset: int = 0, mem_type: Optional[str] =
 # ═══════════════════════════════════════════════
 
 @router.get("/dashboard")
-def dashboard(admin=Depends(_require_jwt), db: Session = Depends(get_db)):
+def dashboard(
+    request: Request,
+    fresh: bool = Query(default=False),
+    admin=Depends(_require_jwt),
+    db: Session = Depends(get_db),
+):
     _audit(db, admin, "view_dashboard")
+    return metrics_snapshot.serve(request, db, "admin.dashboard", fresh=fresh)
+
+
+@metrics_snapshot.register("admin.dashboard")
+def _dashboard_payload(db: Session) -> dict:
     now = datetime.now(timezone.utc)
     s24 = now - timedelta(hours=24)
     s7d = now - timedelta(days=7)
 
-    total_u = db.execute(sa_text("SELECT COUNT(*) FROM users")).scalar() or 0
-    premium = db.execute(sa_text("SELECT COUNT(*) FROM users WHERE is_premium = TRUE")).scalar() or 0
-    admins = db.execute(sa_text("SELECT COUNT(*) FROM users WHERE role = 'admin'")).scalar() or 0
-    verified = db.execute(sa_text("SELECT COUNT(*) FROM users WHERE email_verified = TRUE")).scalar() or 0
-    new24 = db.execute(sa_text("SELECT COUNT(*) FROM users WHERE created_at >= :s"), {"s": s24}).scalar() or 0
-    new7d = db.execute(sa_text("SELECT COUNT(*) FROM users WHERE created_at >= :s"), {"s": s7d}).scalar() or 0
-    active24 = db.execute(sa_text("SELECT COUNT(DISTINCT user_id) FROM events WHERE created_at >= :s AND user_id IS NOT NULL"), {"s": s24}).scalar() or 0
-
-    total_ev = db.query(func.count(Event.id)).scalar() or 0
-    ev24 = db.query(func.count(Event.id)).filter(Event.created_at >= s24).scalar() or 0
-    ev7d = db.query(func.count(Event.id)).filter(Event.created_at >= s7d).scalar() or 0
-    vip_c = db.query(func.count(Event.id)).filter(Event.action == "vip_click", Event.created_at >= s7d).scalar() or 0
-    vip_u = db.query(func.count(Event.id)).filter(Event.action == "vip_unlock", Event.created_at >= s7d).scalar() or 0
+    m = metric_batch
+    users = m.run_metrics(db, "users", [
+        m.count("total"),
+        m.count("premium", "is_premium = TRUE"),
+        m.count("admin", "role = 'admin'"),
+        m.count("verified", "email_verified = TRUE"),
+        m.count("new_24h", "created_at >= :s24"),
+        m.count("new_7d", "created_at >= :s7d"),
+    ], {"s24": s24, "s7d": s7d})
+    ev = m.run_metrics(db, "events", [
+        m.count("total"),
+        m.count("last_24h", "created_at >= :s24"),
+        m.count("last_7d", "created_at >= :s7d"),
+        m.count("vip_clicks", "action = 'vip_click' AND created_at >= :s7d"),
+        m.count("vip_unlocks", "action = 'vip_unlock' AND created_at >= :s7d"),
+        m.count_distinct("active_24h", "user_id", "created_at >= :s24 AND user_id IS NOT NULL"),
+    ], {"s24": s24, "s7d": s7d})
 
     td = db.query(Event.domain, func.count(Event.id).label("c")).filter(Event.created_at >= s7d).group_by(Event.domain).order_by(desc(func.count(Event.id))).limit(10).all()
     ta = db.query(Event.action, func.count(Event.id).label("c")).filter(Event.created_at >= s7d).group_by(Event.action).order_by(desc(func.count(Event.id))).limit(10).all()
@@ -174,11 +172,13 @@ def dashboard(admin=Depends(_require_jwt), db: Session = Depends(get_db)):
 
     yk = {"pending": 0, "published": 0, "rejected": 0}
     try:
-        for st in ["pending_review", "published", "rejected"]:
-            key = "pending" if st == "pending_review" else st
-            yk[key] = db.execute(sa_text("SELECT COUNT(*) FROM yanki_posts WHERE status = :s"), {"s": st}).scalar() or 0
+        yk = m.run_metrics(db, "yanki_posts", [
+            m.count("pending", "status = 'pending_review'"),
+            m.count("published", "status = 'published'"),
+            m.count("rejected", "status = 'rejected'"),
+        ])
     except Exception:
-        pass
+        db.rollback()
 
     mem = 0
     try:
@@ -187,10 +187,10 @@ def dashboard(admin=Depends(_require_jwt), db: Session = Depends(get_db)):
         pass
 
     return {
-        "users": {"total": int(total_u), "premium": int(premium), "admin": int(admins), "verified": int(verified), "active_24h": int(active24), "new_24h": int(new24), "new_7d": int(new7d)},
+        "users": {**users, "active_24h": ev["active_24h"]},
         "events": {
-            "total": int(total_ev), "last_24h": int(ev24), "last_7d": int(ev7d),
-            "vip_clicks": int(vip_c), "vip_unlocks": int(vip_u),
+            "total": ev["total"], "last_24h": ev["last_24h"], "last_7d": ev["last_7d"],
+            "vip_clicks": ev["vip_clicks"], "vip_unlocks": ev["vip_unlocks"],
             "top_domains": [{"name": d or "unknown", "count": int(c)} for d, c in td],
             "top_actions": [{"name": a, "count": int(c)} for a, c in ta],
         },
@@ -210,10 +210,12 @@ def users_list(
     role: Optional[str] = Query(default=None),
     limit: int = Query(default=50),
     offset: int = Query(default=0),
+    cursor: Optional[str] = Query(default=None),
     admin=Depends(_require_jwt),
     db: Session = Depends(get_db),
 ):
-    conds, params = [], {"lim": min(limit, 200), "off": offset}
+    limit = min(limit, 200)
+    conds, params = [], {}
     if search:
         conds.append("email ILIKE :search")
         params["search"] = f"%{search}%"
@@ -221,13 +223,22 @@ def users_list(
         conds.append("role = :role")
         params["role"] = role
     w = " AND ".join(conds) if conds else "1=1"
-
-    rows = db.execute(sa_text(f"SELECT id, email, role, is_premium, email_verified, created_at FROM users WHERE {w} ORDER BY created_at DESC OFFSET :off LIMIT :lim"), params).mappings().all()
-    total = db.execute(sa_text(f"SELECT COUNT(*) FROM users WHERE {w}"), {k: v for k, v in params.items() if k not in ("lim", "off")}).scalar() or 0
+    total = keyset.cached_total(
+        ("admin.users", search, role),
+        lambda: db.execute(sa_text(f"SELECT COUNT(*) FROM users WHERE {w}"), dict(params)).scalar(),
+    )
+
+    cur = keyset.decode_cursor(cursor)
+    page_params = {**params, "lim": limit + 1, "off": 0 if cur else offset}
+    if cur:
+        w = f"{w} AND " + keyset.after_sql("created_at, id", cur, page_params)
+    rows = db.execute(sa_text(f"SELECT id, email, role, is_premium, email_verified, created_at FROM users WHERE {w} ORDER BY created_at DESC, id DESC LIMIT :lim OFFSET :off"), page_params).mappings().all()
+    rows, next_cursor = keyset.page(list(rows), limit, lambda u: (u["created_at"], u["id"]))
 
     return {
         "items": [{"id": u["id"], "email": u["email"], "role": u.get("role", "free"), "is_premium": bool(u.get("is_premium")), "email_verified": bool(u.get("email_verified")), "created_at": str(u["created_at"]) if u.get("created_at") else None} for u in rows],
         "total": int(total),
+        "next_cursor": next_cursor,
     }
 
 
@@ -241,6 +252,7 @@ def set_user_role(payload: SetRoleBody, admin=Depends(_require_jwt), db: Session
     _audit(db, admin, "set_user_role", "user", payload.target_user_id, {"new_role": payload.role})
     db.execute(sa_text("UPDATE users SET role = :role WHERE id = :uid"), {"role": payload.role, "uid": payload.target_user_id})
     db.commit()
+    invalidate_user(payload.target_user_id)
     return {"ok": True, "user_id": payload.target_user_id, "role": payload.role}
 
 
@@ -262,9 +274,13 @@ def analytics(
     by_action = db.execute(sa_text("SELECT action, COUNT(*) as cnt FROM events WHERE created_at >= :s GROUP BY action ORDER BY cnt DESC LIMIT 20"), {"s": since}).mappings().all()
     by_domain = db.execute(sa_text("SELECT COALESCE(domain,'unknown') as domain, COUNT(*) as cnt FROM events WHERE created_at >= :s GROUP BY domain ORDER BY cnt DESC LIMIT 20"), {"s": since}).mappings().all()
 
-    counts = {}
-    for ev in ["page_view", "mode_switch", "city_open", "vip_click", "vip_unlock", "message_sent", "post_submitted", "purchase_attempt", "purchase_success"]:
-        counts[ev] = db.execute(sa_text("SELECT COUNT(*) FROM events WHERE action = :a AND created_at >= :s"), {"a": ev, "s": since}).scalar() or 0
+    tracked = ["page_view", "mode_switch", "city_open", "vip_click", "vip_unlock", "message_sent", "post_submitted", "purchase_attempt", "purchase_success"]
+    counts = metric_batch.run_metrics(
+        db, "events",
+        [metric_batch.count(a, f"action = '{a}'") for a in tracked],
+        {"s": since},
+        where="created_at >= :s",
+    )
 
     return {
         "daily_events": [{"day": str(d["day"]), "count": int(d["cnt"])} for d in daily_ev],
@@ -381,19 +397,26 @@ def security_summary(admin=Depends(_require_jwt), db: Session = Depends(get_db))
 def events_list(
     limit: int = Query(default=50),
     offset: int = Query(default=0),
+    cursor: Optional[str] = Query(default=None),
     domain: Optional[str] = Query(default=None),
     action: Optional[str] = Query(default=None),
     admin=Depends(_require_jwt),
     db: Session = Depends(get_db),
 ):
+    limit = min(limit, 200)
     q = db.query(Event)
     if domain: q = q.filter(Event.domain == domain)
     if action: q = q.filter(Event.action == action)
-    total = q.count()
-    rows = q.order_by(desc(Event.created_at)).offset(offset).limit(min(limit, 200)).all()
+    total = keyset.cached_total(("admin.events", domain, action), q.count)
+    cur = keyset.decode_cursor(cursor)
+    if cur:
+        q = q.filter(keyset.after((Event.created_at, Event.id), cur))
+    rows = q.order_by(desc(Event.created_at), desc(Event.id)).offset(0 if cur else offset).limit(limit + 1).all()
+    rows, next_cursor = keyset.page(rows, limit, lambda e: (e.created_at, e.id))
     return {
         "items": [{"id": e.id, "user_id": e.user_id, "action": e.action, "domain": e.domain, "meta": e.meta, "created_at": e.created_at.isoformat() if e.created_at else None} for e in rows],
         "total": total,
+        "next_cursor": next_cursor,
     }
 
 
@@ -401,17 +424,24 @@ def events_list(
 def memories_list(
     limit: int = Query(default=50),
     offset: int = Query(default=0),
+    cursor: Optional[str] = Query(default=None),
     mem_type: Optional[str] = Query(default=None),
     admin=Depends(_require_jwt),
     db: Session = Depends(get_db),
 ):
+    limit = min(limit, 200)
     q = db.query(Memory)
     if mem_type: q = q.filter(Memory.type == mem_type)
-    total = q.count()
-    rows = q.order_by(desc(Memory.created_at)).offset(offset).limit(min(limit, 200)).all()
+    total = keyset.cached_total(("admin.memories", mem_type), q.count)
+    cur = keyset.decode_cursor(cursor)
+    if cur:
+        q = q.filter(keyset.after((Memory.created_at, Memory.id), cur))
+    rows = q.order_by(desc(Memory.created_at), desc(Memory.id)).offset(0 if cur else offset).limit(limit + 1).all()
+    rows, next_cursor = keyset.page(rows, limit, lambda m: (m.created_at, m.id))
     return {
         "items": [{"id": m.id, "user_id": m.user_id, "type": m.type, "context": m.context, "input_text": m.input_text, "output_text": m.output_text, "created_at": m.created_at.isoformat() if m.created_at else None} for m in rows],
         "total": total,
+        "next_cursor": next_cursor,
     }
 
 
@@ -20,12 +20,13 @@ import io
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query, Response
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text as sa_text
 
 from app.db import get_db
 from app.routes.admin import _require_jwt
+from app.services import metric_batch, metrics_snapshot
 
 router = APIRouter(prefix="/admin", tags=["admin-accounting"])
 
@@ -104,6 +105,7 @@ def _unlock_status(device_fp: Optional[str], user_id: Optional[int]) -> str:
 
 @router.get("/accounting")
 def accounting_dashboard(
+    request: Request,
     admin=Depends(_require_jwt),
     db: Session = Depends(get_db),
     date_from: Optional[str] = Query(None, description="ISO date YYYY-MM-DD (filtre başı, UTC gün)"),
@@ -113,11 +115,35 @@ def accounting_dashboard(
     orders_limit: int = Query(300, ge=1, le=1000),
     orders_offset: int = Query(0, ge=0),
     funnel_days: int = Query(30, ge=1, le=90),
+    fresh: bool = Query(False, description="Snapshot yerine anında yeniden hesapla"),
 ):
     """
     Özet kartlar, sipariş listesi (sayfalı), ürün bazlı gelir, tahsilat özeti, funnel köprüsü.
     """
     _ = admin
+    params = {
+        "date_from": date_from,
+        "date_to": date_to,
+        "content_id": content_id,
+        "payment_status": payment_status,
+        "orders_limit": orders_limit,
+        "orders_offset": orders_offset,
+        "funnel_days": funnel_days,
+    }
+    return metrics_snapshot.serve(request, db, "admin.accounting", params, fresh=fresh)
+
+
+@metrics_snapshot.register("admin.accounting")
+def _accounting_payload(
+    db: Session,
+    date_from: Optional[str],
+    date_to: Optional[str],
+    content_id: Optional[str],
+    payment_status: Optional[str],
+    orders_limit: int,
+    orders_offset: int,
+    funnel_days: int,
+) -> dict:
     now = _utc_now()
     today0 = _day_start(now)
     tomorrow0 = today0 + timedelta(days=1)
@@ -147,49 +173,38 @@ def accounting_dashboard(
     def mappings(sql: str, params: dict):
         return db.execute(sa_text(sql), params).mappings().all()
 
-    # ── Üst özet: bugün / bu ay
-    sales_today = int(
-        scalar(
-            """SELECT COUNT(*) FROM shopier_purchases
-               WHERE status = 'completed' AND created_at >= :a AND created_at < :b""",
-            {"a": today0, "b": tomorrow0},
-        )
-        or 0
-    )
-    revenue_today = float(
-        scalar(
-            """SELECT COALESCE(SUM(amount), 0) FROM shopier_purchases
-               WHERE status = 'completed' AND created_at >= :a AND created_at < :b""",
-            {"a": today0, "b": tomorrow0},
-        )
-        or 0
-    )
-
-    sales_month = int(
-        scalar(
-            """SELECT COUNT(*) FROM shopier_purchases
-               WHERE status = 'completed' AND created_at >= :a AND created_at < :b""",
-            {"a": month0, "b": tomorrow0},
-        )
-        or 0
-    )
-    revenue_month = float(
-        scalar(
-            """SELECT COALESCE(SUM(amount), 0) FROM shopier_purchases
-               WHERE status = 'completed' AND created_at >= :a AND created_at < :b""",
-            {"a": month0, "b": tomorrow0},
-        )
-        or 0
-    )
-
-    avg_basket_month = float(
-        scalar(
-            """SELECT COALESCE(AVG(amount), 0) FROM shopier_purchases
-               WHERE status = 'completed' AND created_at >= :a AND created_at < :b""",
-            {"a": month0, "b": tomorrow0},
-        )
-        or 0
+    # ── Üst özet + tahsilat + funnel penceresi: shopier_purchases tek tarama
+    since_f = now - timedelta(days=funnel_days)
+    done = "status = 'completed'"
+    pending_sql = (
+        "(LOWER(COALESCE(payment_status, '')) IN ('unpaid', 'pending', 'beklemede')"
+        " OR (status IS NOT NULL AND status <> 'completed'))"
     )
+    m = metric_batch
+    sp = m.run_metrics(db, "shopier_purchases", [
+        m.count("sales_today", f"{done} AND created_at >= :today0 AND created_at < :tomorrow0"),
+        m.total("revenue_today", "amount", f"{done} AND created_at >= :today0 AND created_at < :tomorrow0"),
+        m.count("sales_month", f"{done} AND created_at >= :month0 AND created_at < :tomorrow0"),
+        m.total("revenue_month", "amount", f"{done} AND created_at >= :month0 AND created_at < :tomorrow0"),
+        m.avg("avg_basket_month", "amount", f"{done} AND created_at >= :month0 AND created_at < :tomorrow0"),
+        m.count("pending_cnt", pending_sql),
+        m.total("pending_amount", "amount", pending_sql),
+        m.total("collected_all", "amount", done),
+        m.count("purchases_window", f"{done} AND created_at >= :since_f"),
+        m.count("role_purchases", f"{done} AND content_id = 'role_unlock' AND created_at >= :since_f"),
+        m.count(
+            "ankod_purchases",
+            f"{done} AND content_id IN ('ankod_unlock', 'subconscious_unlock') AND created_at >= :since_f",
+        ),
+    ], {"today0": today0, "tomorrow0": tomorrow0, "month0": month0, "since_f": since_f})
+    sales_today = sp["sales_today"]
+    revenue_today = sp["revenue_today"]
+    sales_month = sp["sales_month"]
+    revenue_month = sp["revenue_month"]
+    avg_basket_month = sp["avg_basket_month"]
+    pending_cnt = sp["pending_cnt"]
+    pending_amount = sp["pending_amount"]
+    collected_all = sp["collected_all"]
 
     top_row = mappings(
         """
@@ -207,37 +222,6 @@ def accounting_dashboard(
         else None
     )
 
-    pending_cnt = int(
-        scalar(
-            """
-            SELECT COUNT(*) FROM shopier_purchases
-            WHERE LOWER(COALESCE(payment_status, '')) IN ('unpaid', 'pending', 'beklemede')
-               OR (status IS NOT NULL AND status <> 'completed')
-            """,
-            {},
-        )
-        or 0
-    )
-    pending_amount = float(
-        scalar(
-            """
-            SELECT COALESCE(SUM(amount), 0) FROM shopier_purchases
-            WHERE LOWER(COALESCE(payment_status, '')) IN ('unpaid', 'pending', 'beklemede')
-               OR (status IS NOT NULL AND status <> 'completed')
-            """,
-            {},
-        )
-        or 0
-    )
-
-    collected_all = float(
-        scalar(
-            """SELECT COALESCE(SUM(amount), 0) FROM shopier_purchases WHERE status = 'completed'""",
-            {},
-        )
-        or 0
-    )
-
     # ── Sipariş tablosu (filtreli)
     conds = ["1=1"]
     pparams: dict = {
@@ -324,7 +308,6 @@ def accounting_dashboard(
     ]
 
     # ── Funnel + satış köprüsü
-    since_f = now - timedelta(days=funnel_days)
     fe_counts: dict[str, int] = {}
     try:
         rows_fe = mappings(
@@ -342,31 +325,9 @@ def accounting_dashboard(
     except Exception:
         fe_counts = {}
 
-    purchases_window = int(
-        scalar(
-            """SELECT COUNT(*) FROM shopier_purchases
-               WHERE status = 'completed' AND created_at >= :s""",
-            {"s": since_f},
-        )
-        or 0
-    )
-    role_purchases = int(
-        scalar(
-            """SELECT COUNT(*) FROM shopier_purchases
-               WHERE status = 'completed' AND content_id = 'role_unlock' AND created_at >= :s""",
-            {"s": since_f},
-        )
-        or 0
-    )
-    ankod_purchases = int(
-        scalar(
-            """SELECT COUNT(*) FROM shopier_purchases
-               WHERE status = 'completed' AND content_id IN ('ankod_unlock', 'subconscious_unlock')
-               AND created_at >= :s""",
-            {"s": since_f},
-        )
-        or 0
-    )
+    purchases_window = sp["purchases_window"]
+    role_purchases = sp["role_purchases"]
+    ankod_purchases = sp["ankod_purchases"]
 
     sr = fe_counts.get("role_shopier_redirect", 0) or 0
     ar = fe_counts.get("ankod_shopier_redirect", 0) or 0
@@ -468,7 +429,7 @@ def accounting_customer(
         SELECT content_id, product_name, amount, currency, payment_status, status,
                created_at, shopier_order_id, 'shopier' AS ledger_source
         FROM shopier_purchases
-        WHERE LOWER(TRIM(email)) = :e
+        WHERE email_norm = :e
         """),
         {"e": em},
     ).mappings().all()
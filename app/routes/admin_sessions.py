@@ -3,7 +3,8 @@ Admin Session & Retention Analytics — Oturum süresi, günlük aktif kullanıc
 retention, ekran bazlı geçiş ve session heatmap.
 
 events tablosundaki session_start / heartbeat / screen_view / session_end
-kayıtlarını kullanır. meta alanı: { session_id, screen, duration_sec }.
+kayıtlarını kullanır. meta alanındaki { session_id, screen, duration_sec } yazımda
+tipli kolonlara kopyalanır (bkz. app/services/event_columns.py); sorgular onları okur.
 """
 
 from __future__ import annotations
@@ -11,16 +12,20 @@ from __future__ import annotations
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import text as sa_text
 
 from app.db import get_db
 from app.routes.admin import _require_jwt
+from app.services import metrics_snapshot
 
 router = APIRouter(prefix="/admin", tags=["admin-sessions"])
 
 
+_PERIOD_DAYS = {"24h": 1, "7d": 7, "30d": 30, "90d": 90}
+
+
 def _utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -31,12 +36,21 @@ def _utc_now() -> datetime:
 
 @router.get("/session-stats")
 def session_stats(
+    request: Request,
     period: str = Query(default="7d"),
+    fresh: bool = Query(default=False),
     admin=Depends(_require_jwt),
     db: Session = Depends(get_db),
 ):
     """Oturum istatistikleri: ortalama süre, günlük aktif, session sayısı."""
-    days = {"24h": 1, "7d": 7, "30d": 30, "90d": 90}.get(period, 7)
+    if period not in _PERIOD_DAYS:
+        period = "7d"
+    return metrics_snapshot.serve(request, db, "admin.session_stats", {"period": period}, fresh=fresh)
+
+
+@metrics_snapshot.register("admin.session_stats")
+def _session_stats_payload(db: Session, period: str) -> dict:
+    days = _PERIOD_DAYS.get(period, 7)
     since = _utc_now() - timedelta(days=days)
 
     # Total sessions
@@ -51,7 +65,7 @@ def session_stats(
     unique_session_users = int(
         db.execute(
             sa_text("""
-                SELECT COUNT(DISTINCT COALESCE(user_id, meta->>'session_id'))
+                SELECT COUNT(DISTINCT COALESCE(user_id, session_id))
                 FROM events WHERE action = 'session_start' AND created_at >= :s
             """),
             {"s": since},
@@ -62,10 +76,10 @@ def session_stats(
     avg_duration = float(
         db.execute(
             sa_text("""
-                SELECT COALESCE(AVG((meta->>'duration_sec')::float), 0)
+                SELECT COALESCE(AVG(duration_sec), 0)
                 FROM events
                 WHERE action = 'heartbeat'
-                  AND meta->>'duration_sec' IS NOT NULL
+                  AND duration_sec IS NOT NULL
                   AND created_at >= :s
             """),
             {"s": since},
@@ -76,7 +90,7 @@ def session_stats(
     dau_rows = db.execute(
         sa_text("""
             SELECT DATE(created_at) AS day,
-                   COUNT(DISTINCT COALESCE(user_id, meta->>'session_id')) AS cnt
+                   COUNT(DISTINCT COALESCE(user_id, session_id)) AS cnt
             FROM events
             WHERE action IN ('session_start', 'screen_view', 'page_view', 'message_sent')
               AND created_at >= :s
@@ -101,15 +115,15 @@ def session_stats(
     # Screen time breakdown (from time_spent events)
     screen_time = db.execute(
         sa_text("""
-            SELECT meta->>'screen' AS screen,
+            SELECT screen,
                    COUNT(*) AS visits,
-                   COALESCE(SUM((meta->>'seconds')::float), 0) AS total_sec,
-                   COALESCE(AVG((meta->>'seconds')::float), 0) AS avg_sec
+                   COALESCE(SUM(duration_sec), 0) AS total_sec,
+                   COALESCE(AVG(duration_sec), 0) AS avg_sec
             FROM events
             WHERE action = 'time_spent'
-              AND meta->>'screen' IS NOT NULL
+              AND screen IS NOT NULL
               AND created_at >= :s
-            GROUP BY meta->>'screen'
+            GROUP BY screen
             ORDER BY total_sec DESC
             LIMIT 25
         """),
@@ -119,12 +133,12 @@ def session_stats(
     # Top screens by page views
     top_screens = db.execute(
         sa_text("""
-            SELECT COALESCE(meta->>'screen', meta->>'page', domain) AS screen,
+            SELECT COALESCE(screen, domain) AS screen,
                    COUNT(*) AS views
             FROM events
             WHERE action IN ('screen_view', 'page_view')
               AND created_at >= :s
-            GROUP BY screen
+            GROUP BY COALESCE(screen, domain)
             ORDER BY views DESC
             LIMIT 20
         """),
@@ -172,10 +186,17 @@ def session_stats(
 
 @router.get("/retention")
 def retention(
+    request: Request,
+    fresh: bool = Query(default=False),
     admin=Depends(_require_jwt),
     db: Session = Depends(get_db),
 ):
     """Haftalık retention: kayıt sonrası 1., 7., 14., 30. gün geri dönüş."""
+    return metrics_snapshot.serve(request, db, "admin.retention", fresh=fresh)
+
+
+@metrics_snapshot.register("admin.retention")
+def _retention_payload(db: Session) -> dict:
     now = _utc_now()
     cohort_start = now - timedelta(days=60)
 
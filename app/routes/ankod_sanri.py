@@ -8,9 +8,10 @@ import os
 import re
 
 from fastapi import APIRouter, HTTPException
-from openai import OpenAI
 from pydantic import BaseModel
 
+from app.services import llm_gateway
+
 router = APIRouter(prefix="/sanri", tags=["sanri"])
 
 MODEL = (os.getenv("OPENAI_MODEL") or "gpt-4.1-mini").strip()
@@ -19,11 +20,9 @@ MAX_TEASER = int(os.getenv("SANRI_ANKOD_MAX_TEASER", "650"))
 MAX_DEEP = int(os.getenv("SANRI_ANKOD_MAX_DEEP", "1400"))
 
 
-def _client() -> OpenAI:
-    key = (os.getenv("OPENAI_API_KEY") or "").strip()
-    if not key:
+def _ensure_llm() -> None:
+    if not llm_gateway.is_configured():
         raise HTTPException(status_code=503, detail="OPENAI_API_KEY not configured")
-    return OpenAI(api_key=key)
 
 
 class AnkodSanriIn(BaseModel):
@@ -84,7 +83,7 @@ def _extract_json_object(raw: str) -> dict:
 
 
 @router.post("/ankod-commentary")
-def ankod_commentary(body: AnkodSanriIn):
+async def ankod_commentary(body: AnkodSanriIn):
     lines = [str(x).strip() for x in (body.lines or []) if str(x).strip()]
     if len(lines) < 4:
         raise HTTPException(status_code=400, detail="En az 4 anket satırı gerekli.")
@@ -92,7 +91,7 @@ def ankod_commentary(body: AnkodSanriIn):
     user_block = "\n".join(f"- {ln}" for ln in lines)
     mode = (body.mode or "teaser").lower().strip()
 
-    client = _client()
+    _ensure_llm()
 
     if mode == "deep":
         messages = [
@@ -114,13 +113,12 @@ def ankod_commentary(body: AnkodSanriIn):
         max_t = MAX_TEASER
 
     try:
-        comp = client.chat.completions.create(
+        text = await llm_gateway.chat_text(
+            messages,
             model=MODEL,
-            messages=messages,
             temperature=TEMP_TEASER if mode != "deep" else 0.5,
             max_tokens=max_t,
         )
-        text = (comp.choices[0].message.content or "").strip()
         data = _extract_json_object(text)
     except HTTPException:
         raise
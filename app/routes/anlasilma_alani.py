@@ -4,19 +4,22 @@ session_id ile; user_id yok. Embedding: OpenAI text-embedding-3-small.
 """
 from __future__ import annotations
 
+import asyncio
 import json
-import math
 import os
 import re
 from datetime import datetime, timedelta
 
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException
-from openai import OpenAI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
-from sqlalchemy import desc, or_
+from sqlalchemy import desc, inspect, or_, text
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.db import get_db
+from app.db import SessionLocal, engine, get_db
+from app.services import embedding_store, llm_gateway, matchmaker, migrations, presence_index, realtime
 from app.models.anlasilma_field import AnlasilmaChatMessage, AnlasilmaChatRoom, AnlasilmaPresence
 
 router = APIRouter(prefix="/api/anlasilma", tags=["anlasilma"])
@@ -25,26 +28,28 @@ ALLOWED_HZ = {396, 417, 528, 639, 741, 852, 963}
 ACTIVE_WINDOW_MIN = 15
 SIMILARITY_THRESHOLD = 0.68
 CHAT_MIN_INTERVAL_SEC = 28
+STREAM_HEARTBEAT_SEC = 15
+MESSAGES_PAGE = 50
+QUEUE_STREAM_MAX_SEC = int(os.getenv("ANLASILMA_QUEUE_STREAM_MAX_SEC", "600"))
 EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small").strip()
 CHAT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini").strip()
 
 
-def _client() -> OpenAI:
-    key = (os.getenv("OPENAI_API_KEY") or "").strip()
-    if not key:
+def _ensure_llm() -> None:
+    if not llm_gateway.is_configured():
         raise HTTPException(status_code=503, detail="OPENAI_API_KEY not configured")
-    return OpenAI(api_key=key)
 
 
-def _cosine(a: list[float], b: list[float]) -> float:
-    if not a or not b or len(a) != len(b):
-        return 0.0
-    dot = sum(x * y for x, y in zip(a, b))
-    na = math.sqrt(sum(x * x for x in a))
-    nb = math.sqrt(sum(x * x for x in b))
-    if na == 0 or nb == 0:
-        return 0.0
-    return dot / (na * nb)
+@migrations.register(14, "anlasilma_presence_embedding_blob")
+def _add_embedding_blob():
+    insp = inspect(engine)
+    if not insp.has_table("anlasilma_presence"):
+        return
+    cols = {c["name"] for c in insp.get_columns("anlasilma_presence")}
+    if "embedding_blob" not in cols:
+        blob = "BYTEA" if engine.dialect.name == "postgresql" else "BLOB"
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE anlasilma_presence ADD COLUMN embedding_blob {blob}"))
 
 
 def _now():
@@ -84,12 +89,12 @@ def _extract_json_object(raw: str) -> dict:
     return {}
 
 
-def _embed_text(client: OpenAI, text: str) -> list[float]:
+async def _embed_text(text: str) -> np.ndarray | None:
+    """Aynı niyet + etiketlerle yeniden girişte embedding_store'dan döner."""
     t = (text or "").strip()[:2000]
     if not t:
-        return []
-    r = client.embeddings.create(model=EMBED_MODEL, input=t)
-    return list(r.data[0].embedding)
+        return None
+    return await embedding_store.embed(t, model=EMBED_MODEL)
 
 
 class EnterIn(BaseModel):
@@ -122,34 +127,28 @@ class EnterOut(BaseModel):
     reflection: str
 
 
-@router.post("/enter", response_model=EnterOut)
-def anlasilma_enter(body: EnterIn, db: Session = Depends(get_db)):
-    client = _client()
+def _upsert_presence(db: Session, body: EnterIn, vec: np.ndarray) -> tuple[int, float]:
+    """Presence kaydını yaz; aynı frekanstaki aktif sayıyı ve en yakın benzerliği döndür."""
     now = _now()
     cutoff = _active_cutoff()
 
-    embed_source = body.intent_text.strip()
-    if body.emotion_tags:
-        embed_source += " | " + ", ".join(body.emotion_tags)
-    vec = _embed_text(client, embed_source)
-    if not vec:
-        raise HTTPException(status_code=500, detail="embedding_failed")
-
     row = db.query(AnlasilmaPresence).filter(AnlasilmaPresence.session_id == body.session_id).first()
     if row:
         row.frequency_hz = body.frequency_hz
         row.intent_text = body.intent_text.strip()[:200]
         row.emotion_tags = json.dumps(body.emotion_tags, ensure_ascii=False)
-        row.embedding_json = json.dumps(vec)
+        row.embedding_blob = presence_index.to_blob(vec)
+        row.embedding_json = None
         row.last_seen_at = now
         row.wants_chat = False
+        matchmaker.leave(body.session_id)
     else:
         row = AnlasilmaPresence(
             session_id=body.session_id,
             frequency_hz=body.frequency_hz,
             intent_text=body.intent_text.strip()[:200],
             emotion_tags=json.dumps(body.emotion_tags, ensure_ascii=False),
-            embedding_json=json.dumps(vec),
+            embedding_blob=presence_index.to_blob(vec),
             wants_chat=False,
             last_seen_at=now,
             created_at=now,
@@ -157,35 +156,27 @@ def anlasilma_enter(body: EnterIn, db: Session = Depends(get_db)):
         db.add(row)
     db.commit()
 
-    active_count = (
-        db.query(AnlasilmaPresence)
-        .filter(
-            AnlasilmaPresence.frequency_hz == body.frequency_hz,
-            AnlasilmaPresence.last_seen_at >= cutoff,
-        )
-        .count()
-    )
+    presence_index.upsert(body.frequency_hz, body.session_id, vec, now)
+    presence_index.sync(db, body.frequency_hz, cutoff)
+    active_count = presence_index.active_count(body.frequency_hz, cutoff)
+    nearest = presence_index.top_k_verified(db, body.frequency_hz, vec, cutoff, k=1, exclude=body.session_id)
+    best_sim = max(0.0, nearest[0][1]) if nearest else 0.0
 
-    peers = (
-        db.query(AnlasilmaPresence)
-        .filter(
-            AnlasilmaPresence.frequency_hz == body.frequency_hz,
-            AnlasilmaPresence.last_seen_at >= cutoff,
-            AnlasilmaPresence.session_id != body.session_id,
-            AnlasilmaPresence.embedding_json.isnot(None),
-        )
-        .all()
-    )
+    return active_count, best_sim
 
-    best_sim = 0.0
-    for p in peers:
-        try:
-            pv = json.loads(p.embedding_json or "[]")
-            if isinstance(pv, list) and pv:
-                best_sim = max(best_sim, _cosine(vec, [float(x) for x in pv]))
-        except (json.JSONDecodeError, TypeError, ValueError):
-            continue
 
+@router.post("/enter", response_model=EnterOut)
+async def anlasilma_enter(body: EnterIn, db: Session = Depends(get_db)):
+    _ensure_llm()
+
+    embed_source = body.intent_text.strip()
+    if body.emotion_tags:
+        embed_source += " | " + ", ".join(body.emotion_tags)
+    vec = await _embed_text(embed_source)
+    if vec is None or not vec.size:
+        raise HTTPException(status_code=500, detail="embedding_failed")
+
+    active_count, best_sim = await run_in_threadpool(_upsert_presence, db, body, vec)
     proximity = best_sim >= SIMILARITY_THRESHOLD
 
     user_prompt = f"""Frekans: {body.frequency_hz} Hz
@@ -195,16 +186,15 @@ Aynı frekansta şu an yaklaşık {active_count} oturum var (anonim).
 Benzer niyet yakınlığı skoru (iç kullanım): {best_sim:.2f}
 """
 
-    comp = client.chat.completions.create(
-        model=CHAT_MODEL,
-        temperature=0.65,
-        max_tokens=400,
-        messages=[
+    raw = await llm_gateway.chat_text(
+        [
             {"role": "system", "content": SYSTEM_ANLASILMA},
             {"role": "user", "content": user_prompt},
         ],
+        model=CHAT_MODEL,
+        temperature=0.65,
+        max_tokens=400,
     )
-    raw = (comp.choices[0].message.content or "").strip()
     parsed = _extract_json_object(raw)
     hear = (parsed.get("how_i_hear_you") or "").strip() or "Seni şöyle duyuyorum: bu frekansta bir şey bıraktın; henüz sözcükleştirmek zor."
     refl = (parsed.get("reflection") or "").strip() or "İçinde sessizce duran bir his var — ona acele ettirmeden yaklaşabilirsin."
@@ -245,69 +235,23 @@ def chat_queue(body: ChatQueueIn, db: Session = Depends(get_db)):
     if not me or me.frequency_hz != body.frequency_hz:
         raise HTTPException(status_code=400, detail="presence_required_call_enter_first")
 
-    existing = (
-        db.query(AnlasilmaChatRoom)
-        .filter(
-            AnlasilmaChatRoom.is_active.is_(True),
-            AnlasilmaChatRoom.frequency_hz == body.frequency_hz,
-            or_(
-                AnlasilmaChatRoom.session_a == body.session_id,
-                AnlasilmaChatRoom.session_b == body.session_id,
-            ),
-        )
-        .first()
-    )
-    if existing:
-        return ChatQueueOut(status="paired", room_id=existing.id, message="Zaten bir bağ odasındasın.")
-
-    peer = (
-        db.query(AnlasilmaPresence)
-        .filter(
-            AnlasilmaPresence.session_id != body.session_id,
-            AnlasilmaPresence.frequency_hz == body.frequency_hz,
-            AnlasilmaPresence.wants_chat.is_(True),
-            AnlasilmaPresence.last_seen_at >= _active_cutoff(),
-        )
-        .order_by(AnlasilmaPresence.last_seen_at.asc())
-        .first()
-    )
-
-    if peer:
-        sa, sb = sorted([body.session_id, peer.session_id])
-        room = AnlasilmaChatRoom(
-            session_a=sa,
-            session_b=sb,
-            frequency_hz=body.frequency_hz,
-            created_at=now,
-            is_active=True,
-        )
-        db.add(room)
-        me.wants_chat = False
-        peer.wants_chat = False
-        db.commit()
-        db.refresh(room)
-        return ChatQueueOut(status="paired", room_id=room.id, message="Bir enerji hizalandı.")
-
-    me.wants_chat = True
-    me.last_seen_at = now
-    db.commit()
+    paired = matchmaker.queue(db, me, body.frequency_hz, now, _active_cutoff())
+    if paired:
+        room_id, peer_session = paired
+        if peer_session is None:
+            return ChatQueueOut(status="paired", room_id=room_id, message="Zaten bir bağ odasındasın.")
+        # bekleyen taraf /chat/queue/stream üzerinden haber alır
+        for sid in (body.session_id, peer_session):
+            realtime.publish(_session_channel(sid), "paired", {"room_id": room_id})
+        return ChatQueueOut(status="paired", room_id=room_id, message="Bir enerji hizalandı.")
+
+    presence_index.touch(body.frequency_hz, body.session_id, now)
     return ChatQueueOut(status="waiting", room_id=None, message="Niyetin duyuldu. Eşleşme bekleniyor — sayfayı kapatma.")
 
 
 @router.post("/chat/queue/poll", response_model=ChatQueueOut)
 def chat_queue_poll(body: ChatQueueIn, db: Session = Depends(get_db)):
-    room = (
-        db.query(AnlasilmaChatRoom)
-        .filter(
-            AnlasilmaChatRoom.is_active.is_(True),
-            AnlasilmaChatRoom.frequency_hz == body.frequency_hz,
-            or_(
-                AnlasilmaChatRoom.session_a == body.session_id,
-                AnlasilmaChatRoom.session_b == body.session_id,
-            ),
-        )
-        .first()
-    )
+    room = matchmaker.active_room(db, body.session_id, body.frequency_hz)
     if room:
         p = db.query(AnlasilmaPresence).filter(AnlasilmaPresence.session_id == body.session_id).first()
         if p:
@@ -362,6 +306,7 @@ def chat_send(body: ChatSendIn, db: Session = Depends(get_db)):
     db.add(msg)
     db.commit()
     db.refresh(msg)
+    realtime.publish(_room_channel(room.id), "message", _message_payload(msg))
     return ChatSendOut(ok=True, message_id=msg.id)
 
 
@@ -384,19 +329,167 @@ def chat_messages(room_id: int, session_id: str, after_id: int = 0, db: Session
             AnlasilmaChatMessage.id > after_id,
         )
         .order_by(AnlasilmaChatMessage.id.asc())
-        .limit(50)
+        .limit(MESSAGES_PAGE)
         .all()
     )
-    out = [
-        {
-            "id": m.id,
-            "from_self": m.from_session == session_id,
-            "body": m.body,
-            "created_at": m.created_at.isoformat() + "Z",
-        }
-        for m in rows
-    ]
-    return MessagesOut(messages=out)
+    return MessagesOut(messages=[_message_out(_message_payload(m), session_id) for m in rows])
+
+
+# ----------------------------------------------------
+# SSE — poll uçlarının push karşılıkları
+# ----------------------------------------------------
+
+def _session_channel(session_id: str) -> str:
+    return f"anlasilma:session:{session_id}"
+
+
+def _room_channel(room_id: int) -> str:
+    return f"anlasilma:room:{room_id}"
+
+
+def _message_payload(m: AnlasilmaChatMessage) -> dict:
+    return {
+        "id": m.id,
+        "from_session": m.from_session,
+        "body": m.body,
+        "created_at": m.created_at.isoformat() + "Z",
+    }
+
+
+def _message_out(payload: dict, session_id: str) -> dict:
+    return {
+        "id": payload["id"],
+        "from_self": payload["from_session"] == session_id,
+        "body": payload["body"],
+        "created_at": payload["created_at"],
+    }
+
+
+def _sse_frame(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _active_room_id(session_id: str, frequency_hz: int) -> int | None:
+    db = SessionLocal()
+    try:
+        room = (
+            db.query(AnlasilmaChatRoom.id)
+            .filter(
+                AnlasilmaChatRoom.is_active.is_(True),
+                AnlasilmaChatRoom.frequency_hz == frequency_hz,
+                or_(
+                    AnlasilmaChatRoom.session_a == session_id,
+                    AnlasilmaChatRoom.session_b == session_id,
+                ),
+            )
+            .first()
+        )
+        return room[0] if room else None
+    finally:
+        db.close()
+
+
+def _messages_after(room_id: int, after_id: int) -> list[dict]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(AnlasilmaChatMessage)
+            .filter(AnlasilmaChatMessage.room_id == room_id, AnlasilmaChatMessage.id > after_id)
+            .order_by(AnlasilmaChatMessage.id.asc())
+            .limit(MESSAGES_PAGE)
+            .all()
+        )
+        return [_message_payload(m) for m in rows]
+    finally:
+        db.close()
+
+
+@router.get("/chat/queue/stream")
+async def chat_queue_stream(session_id: str, frequency_hz: int):
+    """
+    /chat/queue/poll'un SSE hali: eşleşince tek bir "paired" olayı ({room_id})
+    gönderip kapanır; QUEUE_STREAM_MAX_SEC dolarsa "timeout". Önce
+    /chat/queue ile sıraya girilmiş olmalı.
+    """
+    if frequency_hz not in ALLOWED_HZ:
+        raise HTTPException(status_code=400, detail="invalid_frequency")
+
+    async def events():
+        # abone ol, sonra DB'ye bak: arada gelen eşleşme kaçmaz
+        with realtime.subscribe(_session_channel(session_id)) as q:
+            room_id = await run_in_threadpool(_active_room_id, session_id, frequency_hz)
+            if room_id:
+                yield _sse_frame("paired", {"room_id": room_id})
+                return
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + QUEUE_STREAM_MAX_SEC
+            while loop.time() < deadline:
+                try:
+                    msg = await asyncio.wait_for(q.get(), timeout=min(STREAM_HEARTBEAT_SEC, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if msg["event"] == "paired":
+                    yield _sse_frame("paired", msg["data"])
+                    return
+            yield _sse_frame("timeout", {})
+
+    return _sse_response(events())
+
+
+def _room_access(room_id: int, session_id: str) -> None:
+    db = SessionLocal()
+    try:
+        room = db.query(AnlasilmaChatRoom).filter(AnlasilmaChatRoom.id == room_id).first()
+        if not room or not room.is_active:
+            raise HTTPException(status_code=404, detail="room_not_found")
+        if session_id not in (room.session_a, room.session_b):
+            raise HTTPException(status_code=403, detail="forbidden")
+    finally:
+        db.close()
+
+
+@router.get("/chat/stream")
+async def chat_stream(room_id: int, session_id: str, after_id: int = 0):
+    """
+    /chat/messages'ın SSE hali: bağlanınca after_id sonrasının tamamını gönderir,
+    ardından her yeni mesaj "message" olayı olarak gelir (/chat/messages ile
+    aynı şekil). Yeniden bağlanırken son görülen id after_id olarak verilir.
+    """
+    await run_in_threadpool(_room_access, room_id, session_id)
+
+    async def events():
+        last_id = after_id
+        with realtime.subscribe(_room_channel(room_id)) as q:
+            # backlog sayfa sayfa: MESSAGES_PAGE'den geride bağlanan istemci de hepsini alır
+            while True:
+                page = await run_in_threadpool(_messages_after, room_id, last_id)
+                for payload in page:
+                    last_id = max(last_id, payload["id"])
+                    yield _sse_frame("message", _message_out(payload, session_id))
+                if len(page) < MESSAGES_PAGE:
+                    break
+            while True:
+                try:
+                    msg = await asyncio.wait_for(q.get(), timeout=STREAM_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                payload = msg["data"]
+                if msg["event"] != "message" or payload["id"] <= last_id:
+                    continue
+                last_id = payload["id"]
+                yield _sse_frame("message", _message_out(payload, session_id))
+
+    return _sse_response(events())
 
 
 @router.get("/meta/frequencies")
@@ -11,19 +11,38 @@ from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
-from app.db import get_db
+from app.db import get_db, engine
+from app.services import migrations
 from app.services.auth import (
     verify_password,
     hash_password,
     create_access_token,
     decode_token,
 )
+from app.services.user_cache import get_user_row, invalidate_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 ADMIN_EMAILS = {"selin@asksanri.com", "admin@asksanri.com", "caelinusai.asksanri@gmail.com"}
 
 
+@migrations.register(12, "users_two_fa_columns")
+def _ensure_two_fa_columns():
+    """2FA kolonları User modelinde yok; ham SQL ile okunup yazılıyor."""
+    is_pg = engine.dialect.name == "postgresql"
+    with engine.begin() as conn:
+        cols = set() if is_pg else {r[1] for r in conn.execute(text("PRAGMA table_info(users)"))}
+        for col, typ in (
+            ("two_fa_secret", "VARCHAR(64)"),
+            ("two_fa_enabled", "BOOLEAN DEFAULT FALSE"),
+            ("two_fa_confirmed_at", "TIMESTAMP"),
+        ):
+            if is_pg:
+                conn.execute(text(f"ALTER TABLE users ADD COLUMN IF NOT EXISTS {col} {typ}"))
+            elif col not in cols:
+                conn.execute(text(f"ALTER TABLE users ADD COLUMN {col} {typ}"))
+
+
 # =========================================================
 # SCHEMAS
 # =========================================================
@@ -73,25 +92,27 @@ def get_current_user(
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
-    user = db.execute(
-        text("""
-            SELECT
-                id,
-                email,
-                role,
-                two_fa_enabled,
-                created_at
-            FROM users
-            WHERE id = :uid
-            LIMIT 1
-        """),
-        {"uid": int(user_id)},
-    ).mappings().first()
+    user = get_user_row(db, int(user_id))
 
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
-    return dict(user)
+    return user
+
+
+def get_current_admin(
+    authorization: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    payload = decode_token(authorization.replace("Bearer ", "").strip())
+    if not payload or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user = get_user_row(db, int(payload["sub"]))
+    if not user or user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+    return user
 
 
 # =========================================================
@@ -202,6 +223,7 @@ def login(payload: LoginIn, db: Session = Depends(get_db)):
             {"uid": user["id"]},
         )
         db.commit()
+        invalidate_user(user["id"])
         role = "admin"
 
     token = create_access_token({"sub": str(user["id"])})
@@ -263,6 +285,7 @@ def setup_2fa(payload: Enable2FAIn, db: Session = Depends(get_db)):
             },
         )
         db.commit()
+        invalidate_user(user["id"])
 
         otp_uri = pyotp.TOTP(secret).provisioning_uri(
             name=user["email"],
@@ -328,6 +351,7 @@ def verify_2fa_setup(payload: Verify2FASetupIn, db: Session = Depends(get_db)):
         },
     )
     db.commit()
+    invalidate_user(user["id"])
 
     return {
         "success": True,
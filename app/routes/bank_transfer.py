@@ -17,9 +17,7 @@ from typing import Any, Dict, Optional
 
 from app.routes.bank_transfer_helpers import (
     build_epc_style_qr_payload,
-    ensure_bank_transfer_aux_tables,
     qrcode_png_base64,
-    start_bank_transfer_sweep_scheduler,
     sweep_expired_temp_unlocks,
 )
 
@@ -32,7 +30,7 @@ from sqlalchemy.orm import Session
 from app.db import get_db, engine
 from app.validation.contact_email import normalize_contact_email
 from app.routes.admin import _require_jwt
-from app.services.email_service import send_admin_bank_transfer_notification
+from app.services import entitlement_cache, job_queue, migrations
 
 logger = logging.getLogger("bank_transfer")
 
@@ -179,6 +177,7 @@ def _is_pg() -> bool:
     return engine.dialect.name == "postgresql"
 
 
+@migrations.register(9, "bank_transfer_requests")
 def _ensure_bank_transfer_table() -> None:
     """CREATE TABLE + index — SQLAlchemy 2: begin() ile commit garantisi (connect()+commit bazen f405/rollback)."""
     with engine.begin() as conn:
@@ -230,23 +229,6 @@ def _ensure_bank_transfer_table() -> None:
             )
 
 
-try:
-    _ensure_bank_transfer_table()
-    ensure_bank_transfer_aux_tables()
-except Exception as e:
-    logger.exception("bank_transfer table migration (ilk açılış): %s", e)
-
-_bank_sweep_armed = False
-
-
-def _arm_bank_temp_sweep() -> None:
-    global _bank_sweep_armed
-    if _bank_sweep_armed:
-        return
-    _bank_sweep_armed = True
-    start_bank_transfer_sweep_scheduler()
-
-
 def _catalog_entry(content_id: str) -> dict[str, Any]:
     cid = (content_id or "").strip()
     row = BANK_PRODUCT_CATALOG.get(cid)
@@ -330,7 +312,6 @@ def bank_transfer_ready():
 @router.post("/preview")
 def bank_transfer_preview(body: PreviewBody):
     """IBAN + benzersiz açıklama kodu (henüz kayıt yok)."""
-    _arm_bank_temp_sweep()
     cid = body.content_id.strip()
     logger.info(
         "POST /bank-transfer/preview | incoming content_id=%r | len=%s | in_catalog=%s",
@@ -349,19 +330,6 @@ def bank_transfer_preview(body: PreviewBody):
             status_code=400,
             detail=_banking_env_missing_detail(cid, b),
         )
-    try:
-        _ensure_bank_transfer_table()
-    except Exception as e:
-        logger.exception("bank_transfer ensure before preview")
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "error": "bank_transfer_schema_error",
-                "message": str(e),
-                "received_content_id": cid,
-                "supported_content_ids": supported_bank_transfer_content_ids(),
-            },
-        ) from e
     prefix = str(cat["prefix"])
     with engine.connect() as conn:
         code = _generate_unique_transfer_code(conn, prefix)
@@ -524,19 +492,21 @@ async def bank_transfer_submit(
                 },
             )
             rid = int(db.execute(sa_text("SELECT last_insert_rowid()")).scalar() or 0)
+        # Admin e-postası talep satırıyla aynı transaction'da kuyruğa girer (outbox).
+        job_queue.enqueue(
+            "email.admin_bank_transfer",
+            {
+                "request_id": rid,
+                "customer_name": nm,
+                "customer_email": em,
+                "product_name": pname,
+                "content_id": scid,
+                "amount": str(amount),
+                "transfer_code": code,
+            },
+            db=db,
+        )
         db.commit()
-        try:
-            send_admin_bank_transfer_notification(
-                request_id=rid,
-                customer_name=nm,
-                customer_email=em,
-                product_name=pname,
-                content_id=scid,
-                amount=amount,
-                transfer_code=code,
-            )
-        except Exception as mail_exc:
-            logger.warning("Bank transfer admin notify email failed: %s", mail_exc)
     except IntegrityError:
         db.rollback()
         raise HTTPException(
@@ -625,9 +595,7 @@ def bank_transfer_verify(body: VerifyBody, db: Session = Depends(get_db)):
     Hızlı doğrulama: son 10 dk içinde gelen ödeme sinyali (amount + transfer_code) varsa
     kalıcı onay + unlock. Yoksa (pending talep eşleşiyorsa) 15 dk geçici erişim.
     """
-    _arm_bank_temp_sweep()
     sweep_expired_temp_unlocks()
-    ensure_bank_transfer_aux_tables()
 
     code = (body.transfer_code or "").strip().upper()
     try:
@@ -778,7 +746,6 @@ def _log_verify_attempt_isolated(
     outcome: str,
 ) -> None:
     try:
-        ensure_bank_transfer_aux_tables()
         matched_b = matched if _is_pg() else (1 if matched else 0)
         with engine.begin() as conn:
             if _is_pg():
@@ -818,6 +785,11 @@ def _log_verify_attempt_isolated(
 
 
 def _revoke_temp_unlocks_for_request_db(db: Session, request_id: int) -> None:
+    for em, fp in db.execute(
+        sa_text("SELECT email, device_fp FROM bank_transfer_temp_unlocks WHERE request_id = :rid"),
+        {"rid": request_id},
+    ):
+        entitlement_cache.invalidate_after_commit(db, device_fp=fp, email=em)
     if _is_pg():
         db.execute(
             sa_text(
@@ -866,6 +838,7 @@ def approve_bank_transfer_request_core(db: Session, request_id: int) -> dict[str
             else "UPDATE bank_transfer_requests SET status = 'approved', updated_at = CURRENT_TIMESTAMP WHERE id = :id"
         )
         db.execute(sa_text(upd), {"id": request_id})
+        entitlement_cache.invalidate_after_commit(db, email=str(row["email"]))
         db.commit()
     except IntegrityError as e:
         db.rollback()
@@ -891,8 +864,8 @@ def _grant_temp_unlock_15m(
         row = db.execute(
             sa_text("""
             INSERT INTO bank_transfer_temp_unlocks
-            (request_id, email, content_id, transfer_code, device_fp, expires_at)
-            VALUES (:rid, :em, :cid, :tc, :fp, NOW() + INTERVAL '15 minutes')
+            (request_id, email, email_norm, content_id, transfer_code, device_fp, expires_at)
+            VALUES (:rid, :em, LOWER(TRIM(:em)), :cid, :tc, :fp, NOW() + INTERVAL '15 minutes')
             RETURNING expires_at
         """),
             {
@@ -908,8 +881,8 @@ def _grant_temp_unlock_15m(
         db.execute(
             sa_text("""
             INSERT INTO bank_transfer_temp_unlocks
-            (request_id, email, content_id, transfer_code, device_fp, expires_at)
-            VALUES (:rid, :em, :cid, :tc, :fp, datetime('now', '+15 minutes'))
+            (request_id, email, email_norm, content_id, transfer_code, device_fp, expires_at)
+            VALUES (:rid, :em, LOWER(TRIM(:em)), :cid, :tc, :fp, datetime('now', '+15 minutes'))
         """),
             {
                 "rid": request_id,
@@ -922,6 +895,7 @@ def _grant_temp_unlock_15m(
         exp = db.execute(
             sa_text("SELECT expires_at FROM bank_transfer_temp_unlocks WHERE id = last_insert_rowid()")
         ).scalar()
+    entitlement_cache.invalidate_after_commit(db, device_fp=device_fp, email=email)
     db.commit()
     if isinstance(exp, datetime):
         return exp
@@ -947,11 +921,11 @@ def _insert_shopier_unlock(
     db.execute(
         sa_text("""
         INSERT INTO shopier_purchases (
-            content_id, product_id, email, amount, currency, source,
+            content_id, product_id, email, email_norm, amount, currency, source,
             shopier_order_id, status, metadata_json,
             order_number, product_name, product_code, event_type, payment_status, raw_payload
         ) VALUES (
-            :cid, :pid, :email, :amount, 'TRY', 'bank_transfer',
+            :cid, :pid, :email, LOWER(TRIM(:email)), :amount, 'TRY', 'bank_transfer',
             :oid, 'completed', :meta,
             :tcode, :pname, NULL, 'bank_transfer.approved', 'paid', :rawp
         )
@@ -1010,7 +984,6 @@ def admin_record_bank_incoming_signal(
     Banka / entegrasyondan gelen tutar + açıklama kodu kaydı.
     Kullanıcı POST /bank-transfer/verify ile eşleştirirse son 10 dk içindeki kayıt onay tetikler.
     """
-    ensure_bank_transfer_aux_tables()
     code = (body.transfer_code or "").strip().upper()
     if not _TRANSFER_CODE_RE.match(code):
         raise HTTPException(status_code=400, detail="Invalid transfer_code")
@@ -1073,7 +1046,6 @@ def admin_approve_bank_transfer(
     _admin: dict = Depends(_require_jwt),
     db: Session = Depends(get_db),
 ):
-    ensure_bank_transfer_aux_tables()
     out = approve_bank_transfer_request_core(db, request_id)
     logger.info("bank_transfer approved id=%s by admin=%s", request_id, _admin.get("email"))
     return out
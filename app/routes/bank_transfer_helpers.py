@@ -5,7 +5,6 @@ from __future__ import annotations
 import base64
 import io
 import logging
-import os
 import re
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
@@ -16,6 +15,8 @@ from sqlalchemy import text as sa_text
 from sqlalchemy.orm import Session
 
 from app.db import engine
+from app.services import migrations
+from app.services.email_norm import ensure_email_norm_column
 
 logger = logging.getLogger("bank_transfer")
 
@@ -26,6 +27,7 @@ def _is_pg() -> bool:
     return engine.dialect.name == "postgresql"
 
 
+@migrations.register(10, "bank_transfer_aux_tables")
 def ensure_bank_transfer_aux_tables() -> None:
     """incoming_events, verify_attempts, temp_unlocks — idempotent."""
     with engine.begin() as conn:
@@ -128,6 +130,19 @@ def ensure_bank_transfer_aux_tables() -> None:
                 )
             """)
             )
+        ensure_email_norm_column(conn, "bank_transfer_temp_unlocks")
+        conn.execute(
+            sa_text("""
+            CREATE INDEX IF NOT EXISTS ix_bttu_email_norm
+            ON bank_transfer_temp_unlocks (email_norm, revoked)
+        """)
+        )
+        conn.execute(
+            sa_text("""
+            CREATE INDEX IF NOT EXISTS ix_bttu_device
+            ON bank_transfer_temp_unlocks (device_fp, revoked)
+        """)
+        )
 
 
 def build_epc_style_qr_payload(
@@ -201,17 +216,3 @@ def sweep_expired_temp_unlocks() -> int:
     if n:
         logger.info("bank_transfer_temp_unlocks sweep revoked count=%s", n)
     return n
-
-
-def start_bank_transfer_sweep_scheduler() -> None:
-    if os.getenv("BANK_TRANSFER_TEMP_SWEEP", "1").strip().lower() not in ("1", "true", "yes", "on"):
-        return
-    try:
-        from apscheduler.schedulers.background import BackgroundScheduler
-
-        sched = BackgroundScheduler()
-        sched.add_job(sweep_expired_temp_unlocks, "interval", minutes=1, id="bank_temp_sweep")
-        sched.start()
-        logger.info("bank_transfer APScheduler temp sweep started (60s)")
-    except Exception as e:
-        logger.warning("bank_transfer scheduler start failed: %s", e)
\ No newline at end of file
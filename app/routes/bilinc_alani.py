@@ -1,13 +1,14 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 import json
 
 from fastapi import APIRouter, Header, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from app.db import get_db
-from app.services.sanri_orchestrator import run_sanri
+from app.services.sanri_orchestrator import run_sanri, stream_sanri
 
 router = APIRouter(prefix="/bilinc-alani", tags=["bilinc-alani"])
 
@@ -50,7 +51,7 @@ def parse_user_id(raw_value: str, allow_anonymous: bool = False) -> int:
 
 
 @router.post("/ask", response_model=AskResponse)
-def ask(
+async def ask(
     req: AskRequest,
     x_user_id: str = Header(None),
     db: Session = Depends(get_db),
@@ -61,7 +62,7 @@ def ask(
     if not user_message:
         raise HTTPException(status_code=400, detail="EMPTY_MESSAGE")
 
-    return run_sanri(
+    return await run_sanri(
         db=db,
         user_id=user_id,
         user_message=user_message,
@@ -72,6 +73,44 @@ def ask(
     )
 
 
+async def _sse(events: AsyncIterator[tuple[str, dict]]) -> AsyncIterator[str]:
+    async for event, data in events:
+        yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/ask/stream")
+async def ask_stream(
+    req: AskRequest,
+    x_user_id: str = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    /ask'in SSE hali: "delta" olayları metni cümle cümle taşır; nadiren gelen
+    "replace" olayı o ana kadarki metnin tamamının yerine geçer; "done" olayı
+    AskResponse gövdesini (nihai metin dahil) taşır.
+    """
+    user_id = parse_user_id(x_user_id, allow_anonymous=True)
+
+    user_message = (req.message or "").strip()
+    if not user_message:
+        raise HTTPException(status_code=400, detail="EMPTY_MESSAGE")
+
+    events = await stream_sanri(
+        db=db,
+        user_id=user_id,
+        user_message=user_message,
+        session_id=req.session_id,
+        lang=req.lang,
+        system_context=req.system_context,
+        gate_name=req.gate_name,
+    )
+    return StreamingResponse(
+        _sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/memory")
 def get_memory(
     x_user_id: str = Header(None),
@@ -26,6 +26,7 @@ from app.db import get_db
 from app.services.auth import decode_token
 from app.models.billing import Subscription, Purchase, ContentUnlock, UserEntitlement
 from app.models.user import User
+from app.services import entitlement_cache
 from app.services.entitlements import (
     grant_entitlement,
     revoke_subscription_entitlements,
@@ -513,6 +514,7 @@ def use_free_unlock(
 
     user.free_unlock_used = True
     db.commit()
+    entitlement_cache.invalidate_user(user_id)
 
     return {
         "success": True,
@@ -19,7 +19,8 @@ from sqlalchemy import text as sa_text
 from sqlalchemy.orm import Session
 
 from app.db import get_db, engine
-from app.services.auth import decode_token
+from app.services import migrations
+from app.routes.auth import get_current_user
 
 router = APIRouter(tags=["deliverables"])
 admin_router = APIRouter(prefix="/admin", tags=["admin-deliverables"])
@@ -29,6 +30,7 @@ def _is_pg() -> bool:
     return engine.dialect.name == "postgresql"
 
 
+@migrations.register(7, "user_deliverables")
 def _ensure_deliverables_table():
     is_pg = _is_pg()
     with engine.begin() as conn:
@@ -74,12 +76,6 @@ def _ensure_deliverables_table():
             )
 
 
-try:
-    _ensure_deliverables_table()
-except Exception as e:
-    print("[deliverables] migration:", e)
-
-
 def _norm_email(e: str) -> str:
     return (e or "").strip().lower()
 
@@ -96,20 +92,7 @@ def _require_user_jwt(
     authorization: Optional[str] = Header(default=None),
     db: Session = Depends(get_db),
 ):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = authorization.replace("Bearer ", "").strip()
-    payload = decode_token(token)
-    if not payload or not payload.get("sub"):
-        raise HTTPException(status_code=401, detail="Invalid token")
-    uid = int(payload["sub"])
-    row = db.execute(
-        sa_text("SELECT id, email, role FROM users WHERE id = :uid LIMIT 1"),
-        {"uid": uid},
-    ).mappings().first()
-    if not row:
-        raise HTTPException(status_code=401, detail="User not found")
-    return dict(row)
+    return get_current_user(authorization, db)
 
 
 def _require_admin_jwt(
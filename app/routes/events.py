@@ -1,18 +1,17 @@
 # app/routes/events.py
 import uuid
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Header, HTTPException
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
 
-from app.db import get_db
-from app.models.event import Event
 from app.services.auth import decode_token
+from app.services.event_columns import typed_columns
+from app.services.ingest_buffer import event_buffer
 
 router = APIRouter(prefix="/events", tags=["events"])
 
-
 class EventIn(BaseModel):
     session_id: str = "mobile-default"
     action: str
@@ -35,18 +34,20 @@ def _extract_uid(authorization: Optional[str], payload_uid: Optional[str]) -> Op
 @router.post("/log")
 def log_event(
     payload: EventIn,
-    db: Session = Depends(get_db),
     authorization: Optional[str] = Header(default=None),
     x_user_id: Optional[str] = Header(default=None),
 ):
     uid = _extract_uid(authorization, payload.user_id or x_user_id)
-    e = Event(
-        id=str(uuid.uuid4()),
-        user_id=uid,
-        action=payload.action,
-        domain=payload.domain,
-        meta={**payload.meta, "session_id": payload.session_id},
-    )
-    db.add(e)
-    db.commit()
+    meta = {**payload.meta, "session_id": payload.session_id}
+    accepted = event_buffer.add({
+        "id": str(uuid.uuid4()),
+        "user_id": uid,
+        "action": payload.action,
+        "domain": payload.domain,
+        "meta": meta,
+        **typed_columns(payload.action, meta),
+        "created_at": datetime.now(timezone.utc),
+    })
+    if not accepted:
+        raise HTTPException(status_code=503, detail="INGEST_BUSY")
     return {"ok": True}
\ No newline at end of file
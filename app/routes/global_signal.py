@@ -1,17 +1,36 @@
-from fastapi import APIRouter, Request, Query
-from pydantic import BaseModel
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
+"""
+Global sinyal alanı — anonim sinyaller ve gecikmeli "yankı" bildirimleri.
+
+Sinyaller, token ters indeksi ve bildirimler DB'de (app/models/global_signal.py).
+Yankı eşleşmesi: sinyalin token'ları `global_signal_tokens` üzerinde
+`token IN (...) GROUP BY signal_id` ile aranır — yalnızca ortak token'ı
+yeterli olan adaylar döner; skor eskisi gibi |ortak| / max(|A|, |B|).
+Bekleyen sinyaller ECHO_DELAY_MINUTES sonra scheduler işi
+(`global_signal_echoes`) tarafından parça parça işlenir; POST /process-echoes
+aynı işlemciyi elle tetikler.
+"""
+import hashlib
+import json
+import math
 import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
 
-router = APIRouter(prefix="/global-signal", tags=["global-signal"])
+from fastapi import APIRouter, Depends, Query, Request
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models.global_signal import GlobalNotification, GlobalSignal, GlobalSignalToken
 
-GLOBAL_SIGNALS: List[Dict[str, Any]] = []
-GLOBAL_NOTIFICATIONS: List[Dict[str, Any]] = []
+router = APIRouter(prefix="/global-signal", tags=["global-signal"])
 
-MAX_SIGNALS = 5000
-MAX_NOTIFICATIONS = 2000
+MAX_SIGNALS = 5000  # yankı adayları: en yeni bu kadar sinyal
 ECHO_DELAY_MINUTES = 10
+ECHO_MIN_SCORE = 0.25
+ECHO_BATCH = 200
+TOKEN_MAX_LEN = 64  # global_signal_tokens.token
 
 
 class SignalIn(BaseModel):
@@ -56,47 +75,147 @@ def similarity_score(a: str, b: str) -> float:
     return len(overlap) / max(len(ta), len(tb))
 
 
-def find_echo_matches_for_signal(base_signal: dict, signals: list[dict], limit: int = 3):
-    ranked = []
-    base_id = base_signal.get("id")
-    base_text = base_signal.get("text") or ""
+def _index_token(word: str) -> str:
+    # uzun token kesilmez, hash'lenir: eşitlik korunur ("#" normalize_text'ten geçemez)
+    if len(word) <= TOKEN_MAX_LEN:
+        return word
+    return "#" + hashlib.sha1(word.encode("utf-8")).hexdigest()
+
+
+def signal_tokens(text: str) -> list[str]:
+    """Ters indekse yazılan benzersiz token'lar — similarity_score'un kümesiyle birebir."""
+    return list(dict.fromkeys(_index_token(w) for w in tokenize(text)))
+
+
+def utc_now() -> datetime:
+    return datetime.utcnow()
+
 
-    for item in signals:
-        if item.get("id") == base_id:
-            continue
+def _iso(value: datetime) -> str:
+    return value.isoformat() + "Z"
 
-        other_text = item.get("text") or ""
-        score = similarity_score(base_text, other_text)
 
-        if score >= 0.25:
+def _signal_dict(s: GlobalSignal) -> Dict[str, Any]:
+    out = {
+        "id": s.id,
+        "user_id": s.user_id,
+        "text": s.text,
+        "country": s.country,
+        "created_at": _iso(s.created_at),
+        "echo_processed": bool(s.echo_processed),
+    }
+    if s.echo_processed:
+        out["echo_matches"] = json.loads(s.echo_matches_json or "[]")
+    return out
+
+
+def _notification_dict(n: GlobalNotification) -> Dict[str, Any]:
+    return {
+        "id": n.id,
+        "user_id": n.user_id,
+        "signal_id": n.signal_id,
+        "title": n.title,
+        "message": n.message,
+        "items": json.loads(n.items_json or "[]"),
+        "created_at": _iso(n.created_at),
+        "is_read": bool(n.is_read),
+    }
+
+
+# ----------------------------------------------------
+# echo matching
+# ----------------------------------------------------
+
+def find_echo_matches_for_signal(db: Session, signal: GlobalSignal, min_id: int, limit: int = 3) -> List[dict]:
+    tokens = signal_tokens(signal.text)
+    if not tokens:
+        return []
+
+    # skor >= ECHO_MIN_SCORE için: ortak >= ceil(min * |A|) ve |B| <= |A| / min
+    min_overlap = max(1, math.ceil(ECHO_MIN_SCORE * len(tokens)))
+    overlap = func.count(GlobalSignalToken.token)
+    rows = (
+        db.query(GlobalSignal.id, GlobalSignal.text, GlobalSignal.country, GlobalSignal.token_count, overlap)
+        .join(GlobalSignalToken, GlobalSignalToken.signal_id == GlobalSignal.id)
+        .filter(
+            GlobalSignalToken.token.in_(tokens),
+            GlobalSignalToken.signal_id != signal.id,
+            GlobalSignalToken.signal_id > min_id,
+            GlobalSignal.token_count <= len(tokens) / ECHO_MIN_SCORE,
+        )
+        .group_by(GlobalSignal.id, GlobalSignal.text, GlobalSignal.country, GlobalSignal.token_count)
+        .having(overlap >= min_overlap)
+        .all()
+    )
+
+    ranked = []
+    for other_id, other_text, country, token_count, common in rows:
+        score = common / max(len(tokens), token_count or 0)
+        if score >= ECHO_MIN_SCORE:
             ranked.append(
                 {
-                    "signal_id": item.get("id"),
-                    "country": item.get("country") or "UNKNOWN",
+                    "signal_id": other_id,
+                    "country": country or "UNKNOWN",
                     "text": other_text,
                     "score": round(score, 3),
                 }
             )
 
-    ranked.sort(key=lambda x: x["score"], reverse=True)
+    ranked.sort(key=lambda x: (x["score"], x["signal_id"]), reverse=True)
     return ranked[:limit]
 
 
-def utc_now() -> datetime:
-    return datetime.utcnow()
+def _process_batch(db: Session, force: bool) -> tuple[int, List[GlobalNotification]]:
+    q = db.query(GlobalSignal).filter(GlobalSignal.echo_processed.is_(False))
+    if not force:
+        q = q.filter(GlobalSignal.created_at <= utc_now() - timedelta(minutes=ECHO_DELAY_MINUTES))
+    due = q.order_by(GlobalSignal.id.asc()).limit(ECHO_BATCH).with_for_update(skip_locked=True).all()
+    if not due:
+        db.rollback()
+        return 0, []
+
+    max_id = db.query(func.max(GlobalSignal.id)).scalar() or 0
+    min_id = max_id - MAX_SIGNALS
+
+    created = []
+    for signal in due:
+        matches = find_echo_matches_for_signal(db, signal, min_id)
+        signal.echo_processed = True
+        signal.echo_matches_json = json.dumps(matches, ensure_ascii=False)
+
+        if matches:
+            notification = GlobalNotification(
+                user_id=signal.user_id,
+                signal_id=signal.id,
+                title="Your signal echoed.",
+                message="Alanın başka yerlerinde benzer hisler belirdi.",
+                items_json=json.dumps(matches, ensure_ascii=False),
+                created_at=utc_now(),
+                is_read=False,
+            )
+            db.add(notification)
+            created.append(notification)
 
+    db.commit()
+    return len(due), created
 
-def parse_iso_z(value: str) -> datetime:
-    value = (value or "").replace("Z", "")
-    return datetime.fromisoformat(value)
 
+def process_due_echoes(db: Session, force: bool = False) -> List[GlobalNotification]:
+    """Vakti gelen bekleyen sinyalleri ECHO_BATCH'lik parçalarla işler; oluşan bildirimleri döner."""
+    created: List[GlobalNotification] = []
+    while True:
+        processed, batch = _process_batch(db, force)
+        created.extend(batch)
+        if processed < ECHO_BATCH:
+            return created
 
-def already_notified(signal_id: int) -> bool:
-    return any(n.get("signal_id") == signal_id for n in GLOBAL_NOTIFICATIONS)
 
+# ----------------------------------------------------
+# endpoints
+# ----------------------------------------------------
 
 @router.post("/send")
-def send_global_signal(payload: SignalIn, request: Request):
+def send_global_signal(payload: SignalIn, request: Request, db: Session = Depends(get_db)):
     text = (payload.text or "").strip()
     user_id = (payload.user_id or "anonymous").strip()
 
@@ -106,92 +225,71 @@ def send_global_signal(payload: SignalIn, request: Request):
             "error": "EMPTY_SIGNAL"
         }
 
-    signal = {
-        "id": len(GLOBAL_SIGNALS) + 1,
-        "user_id": user_id,
-        "text": text,
-        "country": detect_country_from_request(request),
-        "created_at": utc_now().isoformat() + "Z",
-        "echo_processed": False,
-    }
-
-    GLOBAL_SIGNALS.insert(0, signal)
-    if len(GLOBAL_SIGNALS) > MAX_SIGNALS:
-        GLOBAL_SIGNALS[:] = GLOBAL_SIGNALS[:MAX_SIGNALS]
+    tokens = signal_tokens(text)
+    signal = GlobalSignal(
+        user_id=user_id[:120],
+        text=text,
+        country=detect_country_from_request(request),
+        token_count=len(tokens),
+        echo_processed=False,
+        created_at=utc_now(),
+    )
+    db.add(signal)
+    db.flush()
+    db.add_all(GlobalSignalToken(token=t, signal_id=signal.id) for t in tokens)
+    db.commit()
 
     return {
         "ok": True,
         "message": "Signal received.",
-        "signal": signal
+        "signal": _signal_dict(signal)
     }
 
 
 @router.get("/stream")
-def get_global_stream():
+def get_global_stream(db: Session = Depends(get_db)):
+    rows = db.query(GlobalSignal).order_by(GlobalSignal.id.desc()).limit(100).all()
     return {
         "ok": True,
-        "signals": GLOBAL_SIGNALS[:100]
+        "signals": [_signal_dict(s) for s in rows]
     }
 
 
 @router.post("/process-echoes")
-def process_echoes(force: bool = Query(default=False)):
-    now = utc_now()
-    created_notifications = []
-
-    # oldest-first işle
-    for signal in sorted(GLOBAL_SIGNALS, key=lambda x: x["id"]):
-        if signal.get("echo_processed"):
-            continue
-
-        created_at = parse_iso_z(signal["created_at"])
-        age_ok = now - created_at >= timedelta(minutes=ECHO_DELAY_MINUTES)
-
-        if not age_ok and not force:
-            continue
-
-        matches = find_echo_matches_for_signal(signal, GLOBAL_SIGNALS)
-
-        signal["echo_processed"] = True
-        signal["echo_matches"] = matches
-
-        if matches and not already_notified(signal["id"]):
-            notification = {
-                "id": len(GLOBAL_NOTIFICATIONS) + 1,
-                "user_id": signal["user_id"],
-                "signal_id": signal["id"],
-                "title": "Your signal echoed.",
-                "message": "Alanın başka yerlerinde benzer hisler belirdi.",
-                "items": matches,
-                "created_at": utc_now().isoformat() + "Z",
-                "is_read": False,
-            }
-            GLOBAL_NOTIFICATIONS.insert(0, notification)
-            if len(GLOBAL_NOTIFICATIONS) > MAX_NOTIFICATIONS:
-                GLOBAL_NOTIFICATIONS[:] = GLOBAL_NOTIFICATIONS[:MAX_NOTIFICATIONS]
-            created_notifications.append(notification)
+def process_echoes(force: bool = Query(default=False), db: Session = Depends(get_db)):
+    created_notifications = process_due_echoes(db, force=force)
 
     return {
         "ok": True,
         "created": len(created_notifications),
-        "notifications": created_notifications,
+        "notifications": [_notification_dict(n) for n in created_notifications],
     }
 
 
 @router.get("/notifications")
-def get_notifications(user_id: str = Query(...)):
-    items = [n for n in GLOBAL_NOTIFICATIONS if n.get("user_id") == user_id]
+def get_notifications(user_id: str = Query(...), db: Session = Depends(get_db)):
+    rows = (
+        db.query(GlobalNotification)
+        .filter(GlobalNotification.user_id == user_id)
+        .order_by(GlobalNotification.created_at.desc(), GlobalNotification.id.desc())
+        .limit(20)
+        .all()
+    )
     return {
         "ok": True,
-        "items": items[:20]
+        "items": [_notification_dict(n) for n in rows]
     }
 
 
 @router.post("/notifications/read/{notification_id}")
-def mark_notification_read(notification_id: int):
-    for item in GLOBAL_NOTIFICATIONS:
-        if item.get("id") == notification_id:
-            item["is_read"] = True
-            return {"ok": True}
-
-    return {"ok": False, "error": "NOTIFICATION_NOT_FOUND"}
\ No newline at end of file
+def mark_notification_read(notification_id: int, db: Session = Depends(get_db)):
+    updated = (
+        db.query(GlobalNotification)
+        .filter(GlobalNotification.id == notification_id)
+        .update({GlobalNotification.is_read: True}, synchronize_session=False)
+    )
+    db.commit()
+    if updated:
+        return {"ok": True}
+
+    return {"ok": False, "error": "NOTIFICATION_NOT_FOUND"}
@@ -17,7 +17,8 @@ from app.prompts.kod_okuma_ust_bilinç import (
     build_kod_okuma_user_message,
 )
 from app.routes.auth import get_current_user
-from app.services.ai_service import get_client, generate_kod_okuma_json
+from app.services import llm_cache
+from app.services.ai_service import generate_kod_okuma_json
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/kod-okuma", tags=["kod-okuma"])
@@ -107,7 +108,7 @@ def _coerce_payload(raw: dict) -> dict:
 
 
 @router.post("/ust-bilinç")
-def kod_ust_bilinç(
+async def kod_ust_bilinç(
     body: UstBilinçRequest,
     user=Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -127,14 +128,33 @@ def kod_ust_bilinç(
         module_title=(body.module_title or "").strip(),
     )
 
-    try:
-        client = get_client()
-        raw = generate_kod_okuma_json(
-            client=client,
+    async def _read() -> dict:
+        raw = await generate_kod_okuma_json(
             model=MODEL,
             system_prompt=KOD_OKUMA_UST_BILINC_SYSTEM,
             user_input=user_msg,
         )
+        coerced = _coerce_payload(raw if isinstance(raw, dict) else {})
+        try:
+            return UstBilinçPayload.model_validate(coerced).model_dump()
+        except Exception:
+            return coerced
+
+    key = llm_cache.make_key(
+        "kod_okuma",
+        MODEL,
+        KOD_OKUMA_UST_BILINC_VERSION,
+        body.lesson_title,
+        body.module_title,
+        text,
+    )
+    try:
+        out = await llm_cache.get_or_compute(
+            "kod_okuma",
+            key,
+            _read,
+            cacheable=lambda d: bool(d.get("parca_okumasi")),
+        )
     except Exception as e:
         print("KOD_OKUMA_UBK ERROR =", repr(e))
         raise HTTPException(
@@ -142,13 +162,6 @@ def kod_ust_bilinç(
             detail="Üst bilinç okuması şu an tamamlanamadı. Kısa bir metinle tekrar dene.",
         )
 
-    coerced = _coerce_payload(raw if isinstance(raw, dict) else {})
-    try:
-        validated = UstBilinçPayload.model_validate(coerced)
-        out = validated.model_dump()
-    except Exception:
-        out = coerced
-
     return {
         "ok": True,
         "prompt_version": KOD_OKUMA_UST_BILINC_VERSION,
@@ -6,9 +6,9 @@ from datetime import datetime
 from fastapi import APIRouter, HTTPException, Header, Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from openai import OpenAI
 
 from app.db import get_db
+from app.services import llm_cache, llm_gateway
 from app.services.matrix_role import analyze_matrix_role
 from app.services.user_repo import get_or_create_user
 from app.services.premium_guard_db import ensure_premium, ensure_self_only, ensure_30_days
@@ -24,11 +24,9 @@ MAX_TOKENS = int(os.getenv("SANRI_MAX_TOKENS", "900"))
 SECTION_MAX_TOKENS = int(os.getenv("SANRI_SECTION_MAX_TOKENS", "2800"))
 
 
-def get_client() -> OpenAI:
-    api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
-    if not api_key:
+def _ensure_llm() -> None:
+    if not llm_gateway.is_configured():
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY missing or empty")
-    return OpenAI(api_key=api_key)
 
 
 def _strip_json_fence(raw: str) -> str:
@@ -133,7 +131,7 @@ REQUIRED_SECTION_KEYS = [
 ]
 
 
-def _generate_sections(client: OpenAI, base: dict, name: str, birth_date: str) -> dict:
+async def _generate_sections(base: dict, name: str, birth_date: str) -> dict:
     user_prompt = SECTION_USER_TEMPLATE.format(
         name=name,
         birth_date=birth_date,
@@ -145,34 +143,33 @@ def _generate_sections(client: OpenAI, base: dict, name: str, birth_date: str) -
     )
 
     try:
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
+        raw = await llm_gateway.chat_text(
+            [
                 {"role": "system", "content": SECTION_SYSTEM},
                 {"role": "user", "content": user_prompt},
             ],
+            model=MODEL_NAME,
             temperature=0.78,
             max_tokens=SECTION_MAX_TOKENS,
             response_format={"type": "json_object"},
         )
-        raw = (completion.choices[0].message.content or "").strip()
         raw = _strip_json_fence(raw)
         sections = json.loads(raw)
 
         missing = [k for k in REQUIRED_SECTION_KEYS if not (sections.get(k) or "").strip()]
         if missing:
             _log.warning("[sections] %d missing keys for %s: %s — retrying", len(missing), name, missing)
-            retry = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
+            retry = await llm_gateway.chat_text(
+                [
                     {"role": "system", "content": SECTION_SYSTEM},
                     {"role": "user", "content": user_prompt},
                 ],
+                model=MODEL_NAME,
                 temperature=0.85,
                 max_tokens=SECTION_MAX_TOKENS,
                 response_format={"type": "json_object"},
             )
-            raw2 = _strip_json_fence((retry.choices[0].message.content or "").strip())
+            raw2 = _strip_json_fence(retry)
             retry_data = json.loads(raw2)
             for k in missing:
                 if (retry_data.get(k) or "").strip():
@@ -186,6 +183,27 @@ def _generate_sections(client: OpenAI, base: dict, name: str, birth_date: str) -
         return {}
 
 
+def _sections_complete(sections: dict) -> bool:
+    return bool(sections) and all((sections.get(k) or "").strip() for k in REQUIRED_SECTION_KEYS)
+
+
+async def _cached_sections(base: dict, name: str, birth_date: str) -> dict:
+    """Aynı isim + doğum tarihi için bölümler bir kez üretilir; eksik çıktı saklanmaz."""
+    key = llm_cache.make_key(
+        "matrix_sections",
+        MODEL_NAME,
+        llm_cache.prompt_version(SECTION_SYSTEM + SECTION_USER_TEMPLATE),
+        name,
+        birth_date,
+    )
+    return await llm_cache.get_or_compute(
+        "matrix_sections",
+        key,
+        lambda: _generate_sections(base, name, birth_date),
+        cacheable=_sections_complete,
+    )
+
+
 # ═══════════════════════════════════════════════════════
 # SANRI VOICE — DEEP READING
 # ═══════════════════════════════════════════════════════
@@ -426,7 +444,7 @@ class MatrixRolYorumRequest(BaseModel):
 # ═══════════════════════════════════════════════════════
 
 @router.post("")
-def matrix_rol(req: MatrixRolRequest):
+async def matrix_rol(req: MatrixRolRequest):
     if not (req.name or "").strip():
         raise HTTPException(status_code=400, detail="name is required")
 
@@ -487,8 +505,8 @@ def matrix_rol(req: MatrixRolRequest):
             f"Bugün 1 Adım: {lp_step}."
         )
 
-        client = get_client()
-        sections = _generate_sections(client, base, req.name.strip(), req.birth_date.strip())
+        _ensure_llm()
+        sections = await _cached_sections(base, req.name.strip(), req.birth_date.strip())
 
         return {**base, "teaser": teaser, **sections}
 
@@ -500,7 +518,7 @@ def matrix_rol(req: MatrixRolRequest):
 
 
 @router.post("/deep")
-def matrix_rol_deep(req: MatrixDeepRequest):
+async def matrix_rol_deep(req: MatrixDeepRequest):
     if not (req.name or "").strip():
         raise HTTPException(status_code=400, detail="name is required")
     if req.deep_type not in DEEP_PROMPTS:
@@ -531,18 +549,17 @@ def matrix_rol_deep(req: MatrixDeepRequest):
 
         _log.info("[deep] type=%s name=%s role=%s archetype=%s", req.deep_type, req.name, use_role, use_archetype)
 
-        client = get_client()
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
+        _ensure_llm()
+        raw = await llm_gateway.chat_text(
+            [
                 {"role": "system", "content": DEEP_SYSTEM},
                 {"role": "user", "content": user_prompt},
             ],
+            model=MODEL_NAME,
             temperature=0.78,
             max_tokens=3000,
             response_format={"type": "json_object"},
         )
-        raw = (completion.choices[0].message.content or "").strip()
         raw = _strip_json_fence(raw)
         result = json.loads(raw)
 
@@ -625,14 +642,13 @@ def matrix_rol_yorum(
         "BUGÜN 1 ADIM:\n- (tek cümle)\n"
     )
 
-    client = get_client()
-    completion = client.chat.completions.create(
+    _ensure_llm()
+    yorum = llm_gateway.chat_text_sync(
+        [{"role": "system", "content": system}, {"role": "user", "content": user_prompt}],
         model=MODEL_NAME,
-        messages=[{"role": "system", "content": system}, {"role": "user", "content": user_prompt}],
         temperature=TEMPERATURE,
         max_tokens=MAX_TOKENS,
-    )
-    yorum = (completion.choices[0].message.content or "").strip() or "Buradayım."
+    ) or "Buradayım."
 
     user.last_matrix_deep_analysis = datetime.utcnow()
     db.add(user)
@@ -7,6 +7,7 @@ from sqlalchemy import text
 
 from app.db import get_db
 from app.services.auth import decode_token
+from app.services.memory_compaction import schedule_compaction
 
 router = APIRouter(prefix="/memory", tags=["memory"])
 
@@ -85,6 +86,7 @@ def save_memory(
             "content": payload.content,
         },
     )
+    schedule_compaction(user["id"], db=db)
     db.commit()
 
     return {"status": "ok"}
@@ -8,10 +8,12 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text as sa_text
 
 from app.db import get_db, engine
+from app.services import migrations
 
 router = APIRouter(prefix="/okuma", tags=["okuma"])
 
 
+@migrations.register(4, "okuma_comments_likes")
 def _ensure_tables():
     with engine.connect() as conn:
         conn.execute(sa_text("""
@@ -44,6 +46,7 @@ def _ensure_tables():
         conn.commit()
 
 
+@migrations.register(5, "okuma_views")
 def _ensure_view_table():
     with engine.connect() as conn:
         conn.execute(sa_text("""
@@ -63,13 +66,6 @@ def _ensure_view_table():
         conn.commit()
 
 
-try:
-    _ensure_tables()
-    _ensure_view_table()
-except Exception as e:
-    print(f"[OKUMA] Table migration: {e}")
-
-
 def _ip_hash(request: Request) -> str:
     import hashlib
     client_ip = request.headers.get("x-forwarded-for", request.client.host or "")
@@ -1,17 +1,20 @@
 """Anonymous page view tracking for admin analytics."""
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text as sa_text
+from sqlalchemy import text as sa_text
 
 from app.db import get_db, engine
+from app.services import analytics_rollup, metrics_snapshot, migrations
+from app.services.ingest_buffer import pageview_buffer
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
+@migrations.register(3, "page_views")
 def _ensure_pageview_table():
     with engine.connect() as conn:
         conn.execute(sa_text("""
@@ -35,12 +38,6 @@ def _ensure_pageview_table():
         conn.commit()
 
 
-try:
-    _ensure_pageview_table()
-except Exception as e:
-    print(f"[PAGEVIEW] Table migration: {e}")
-
-
 class PageViewIn(BaseModel):
     path: str
     referrer: Optional[str] = None
@@ -48,7 +45,7 @@ class PageViewIn(BaseModel):
 
 
 @router.post("/pageview")
-def track_pageview(body: PageViewIn, request: Request, db: Session = Depends(get_db)):
+def track_pageview(body: PageViewIn, request: Request):
     import hashlib
     client_ip = request.headers.get("x-forwarded-for", request.client.host or "")
     ip_hash = hashlib.sha256(client_ip.encode()).hexdigest()[:16]
@@ -65,118 +62,32 @@ def track_pageview(body: PageViewIn, request: Request, db: Session = Depends(get
         except Exception:
             pass
 
-    db.execute(sa_text("""
-        INSERT INTO page_views (path, referrer, user_agent, ip_hash, session_id, user_id, created_at)
-        VALUES (:path, :ref, :ua, :ip, :sid, :uid, NOW())
-    """), {
+    # Satır tampona girer; toplu INSERT ingest_buffer flusher'ında.
+    accepted = pageview_buffer.add({
         "path": body.path[:500],
-        "ref": (body.referrer or "")[:1000] or None,
-        "ua": ua,
-        "ip": ip_hash,
-        "sid": (body.session_id or "")[:64] or None,
-        "uid": int(user_id) if user_id else None,
+        "referrer": (body.referrer or "")[:1000] or None,
+        "user_agent": ua,
+        "ip_hash": ip_hash,
+        "session_id": (body.session_id or "")[:64] or None,
+        "user_id": int(user_id) if user_id else None,
+        "created_at": datetime.utcnow(),
     })
-    db.commit()
+    if not accepted:
+        raise HTTPException(status_code=503, detail="INGEST_BUSY")
     return {"ok": True}
 
 
 @router.get("/stats")
 def analytics_stats(db: Session = Depends(get_db)):
-    """Public-safe aggregate stats (no PII)."""
-    now = datetime.now(timezone.utc)
-    s24 = now - timedelta(hours=24)
-    s7d = now - timedelta(days=7)
-    s30d = now - timedelta(days=30)
-
-    total = db.execute(sa_text("SELECT COUNT(*) FROM page_views")).scalar() or 0
-    today = db.execute(sa_text("SELECT COUNT(*) FROM page_views WHERE created_at >= :s"), {"s": s24}).scalar() or 0
-    week = db.execute(sa_text("SELECT COUNT(*) FROM page_views WHERE created_at >= :s"), {"s": s7d}).scalar() or 0
-    month = db.execute(sa_text("SELECT COUNT(*) FROM page_views WHERE created_at >= :s"), {"s": s30d}).scalar() or 0
+    """Public-safe aggregate stats (no PII). Rollup tablolarından okunur (analytics_rollup)."""
+    return analytics_rollup.get_stats(db)
 
-    unique_today = db.execute(sa_text("SELECT COUNT(DISTINCT ip_hash) FROM page_views WHERE created_at >= :s"), {"s": s24}).scalar() or 0
-    unique_week = db.execute(sa_text("SELECT COUNT(DISTINCT ip_hash) FROM page_views WHERE created_at >= :s"), {"s": s7d}).scalar() or 0
-    unique_month = db.execute(sa_text("SELECT COUNT(DISTINCT ip_hash) FROM page_views WHERE created_at >= :s"), {"s": s30d}).scalar() or 0
 
-    top_pages = db.execute(sa_text("""
-        SELECT path, COUNT(*) as c FROM page_views
-        WHERE created_at >= :s GROUP BY path ORDER BY c DESC LIMIT 10
-    """), {"s": s7d}).mappings().all()
-
-    return {
-        "views": {"total": int(total), "today": int(today), "week": int(week), "month": int(month)},
-        "unique_visitors": {"today": int(unique_today), "week": int(unique_week), "month": int(unique_month)},
-        "top_pages": [{"path": r["path"], "views": int(r["c"])} for r in top_pages],
-    }
+@router.get("/retention")
+def retention_stats(request: Request, days: int = 30, fresh: bool = False, db: Session = Depends(get_db)):
+    """Weekly cohort retention based on ip_hash returning visitors (ilk görülme haftasına göre)."""
+    params = {"days": max(1, min(days, 366))}
+    return metrics_snapshot.serve(request, db, "analytics.retention", params, fresh=fresh)
 
 
-@router.get("/retention")
-def retention_stats(days: int = 30, db: Session = Depends(get_db)):
-    """Weekly cohort retention based on ip_hash returning visitors."""
-    now = datetime.now(timezone.utc)
-    since = now - timedelta(days=days)
-
-    cohort_rows = db.execute(sa_text("""
-        WITH visitor_weeks AS (
-            SELECT ip_hash,
-                   DATE_TRUNC('week', MIN(created_at)) AS first_week,
-                   DATE_TRUNC('week', created_at) AS visit_week
-            FROM page_views
-            WHERE created_at >= :since
-            GROUP BY ip_hash, DATE_TRUNC('week', created_at)
-        ),
-        cohorts AS (
-            SELECT first_week,
-                   COUNT(DISTINCT ip_hash) AS cohort_size
-            FROM visitor_weeks
-            GROUP BY first_week
-        ),
-        retention AS (
-            SELECT vw.first_week,
-                   EXTRACT(EPOCH FROM (vw.visit_week - vw.first_week)) / 604800 AS week_num,
-                   COUNT(DISTINCT vw.ip_hash) AS retained
-            FROM visitor_weeks vw
-            GROUP BY vw.first_week, week_num
-        )
-        SELECT c.first_week, c.cohort_size,
-               r.week_num, r.retained
-        FROM cohorts c
-        JOIN retention r ON r.first_week = c.first_week
-        ORDER BY c.first_week, r.week_num
-    """), {"since": since}).mappings().all()
-
-    cohorts = {}
-    for row in cohort_rows:
-        fw = row["first_week"].strftime("%Y-%m-%d") if row["first_week"] else "unknown"
-        if fw not in cohorts:
-            cohorts[fw] = {"cohort_size": int(row["cohort_size"]), "weeks": {}}
-        wn = int(row["week_num"])
-        cohorts[fw]["weeks"][str(wn)] = int(row["retained"])
-
-    returning = db.execute(sa_text("""
-        SELECT COUNT(*) FROM (
-            SELECT ip_hash FROM page_views
-            WHERE created_at >= :since
-            GROUP BY ip_hash HAVING COUNT(DISTINCT DATE_TRUNC('day', created_at)) >= 2
-        ) sub
-    """), {"since": since}).scalar() or 0
-
-    total_unique = db.execute(sa_text("""
-        SELECT COUNT(DISTINCT ip_hash) FROM page_views WHERE created_at >= :since
-    """), {"since": since}).scalar() or 0
-
-    daily_active = db.execute(sa_text("""
-        SELECT DATE_TRUNC('day', created_at)::date AS day,
-               COUNT(DISTINCT ip_hash) AS uniques
-        FROM page_views
-        WHERE created_at >= :since
-        GROUP BY day ORDER BY day
-    """), {"since": since}).mappings().all()
-
-    return {
-        "days": days,
-        "total_unique_visitors": int(total_unique),
-        "returning_visitors": int(returning),
-        "return_rate": round((returning / total_unique * 100), 1) if total_unique > 0 else 0,
-        "daily_active": [{"day": str(r["day"]), "uniques": int(r["uniques"])} for r in daily_active],
-        "cohorts": cohorts,
-    }
+metrics_snapshot.register("analytics.retention")(analytics_rollup.get_retention)
@@ -13,7 +13,8 @@ from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
-from app.db import get_db
+from app.db import get_db, engine
+from app.services import migrations
 from app.services.email_service import send_email, _wrap_email_layout
 
 logger = logging.getLogger("quiz")
@@ -21,16 +22,12 @@ router = APIRouter(prefix="/quiz", tags=["quiz"])
 
 # ─── Ensure table ─────────────────────────────────────────────────
 
-_table_ready = False
-
-def _ensure_table(db: Session):
-    global _table_ready
-    if _table_ready:
-        return
-    try:
-        is_pg = "postgresql" in str(db.bind.url) if hasattr(db, "bind") and db.bind else False
+@migrations.register(6, "quiz_submissions")
+def _ensure_table():
+    is_pg = engine.dialect.name == "postgresql"
+    with engine.begin() as conn:
         if is_pg:
-            db.execute(text("""
+            conn.execute(text("""
                 CREATE TABLE IF NOT EXISTS quiz_submissions (
                     id SERIAL PRIMARY KEY,
                     email VARCHAR(320) NOT NULL,
@@ -47,7 +44,7 @@ def _ensure_table(db: Session):
                 )
             """))
         else:
-            db.execute(text("""
+            conn.execute(text("""
                 CREATE TABLE IF NOT EXISTS quiz_submissions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     email TEXT NOT NULL,
@@ -63,12 +60,6 @@ def _ensure_table(db: Session):
                     created_at TEXT DEFAULT (datetime('now'))
                 )
             """))
-        db.commit()
-        _table_ready = True
-    except Exception as e:
-        logger.warning("quiz table creation (might already exist): %s", e)
-        db.rollback()
-        _table_ready = True
 
 
 # ─── Theme display mapping ────────────────────────────────────────
@@ -173,7 +164,6 @@ class QuizSubmitIn(BaseModel):
 
 @router.post("/submit")
 def submit_quiz(body: QuizSubmitIn, db: Session = Depends(get_db)):
-    _ensure_table(db)
 
     email = body.email.strip().lower()
     if not email or "@" not in email:
@@ -223,7 +213,6 @@ def submit_quiz(body: QuizSubmitIn, db: Session = Depends(get_db)):
 @router.get("/stats")
 def quiz_stats(db: Session = Depends(get_db)):
     """Admin-only basic stats."""
-    _ensure_table(db)
     try:
         total = db.execute(text("SELECT COUNT(*) FROM quiz_submissions")).scalar() or 0
         themes = db.execute(text(
@@ -271,7 +260,6 @@ def all_leads(
     db: Session = Depends(get_db),
 ):
     """Unified view of ALL collected emails across every source."""
-    _ensure_table(db)
 
     table_queries = {
         "users": "SELECT email, name, 'registered' as source, '' as page, '' as theme, created_at FROM users WHERE email IS NOT NULL AND email != ''",
@@ -349,7 +337,6 @@ def all_leads(
 @router.get("/admin/export-emails")
 def export_emails(db: Session = Depends(get_db)):
     """Return all unique emails as a simple list for export."""
-    _ensure_table(db)
     parts = []
     for tbl in ["users", "email_leads", "quiz_submissions", "shopier_purchases"]:
         if _table_exists(db, tbl):
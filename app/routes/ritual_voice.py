@@ -1,28 +1,20 @@
 import os
-import tempfile
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from openai import OpenAI
+from app.services import llm_gateway
 from app.services.ritual_engine import detect_intent, build_ritual
 
 router = APIRouter(prefix="/content", tags=["ritual-engine"])
 
 
-def _get_openai() -> OpenAI:
-    api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
-    if not api_key:
+async def _transcribe_audio(filename: str, data: bytes, lang: str) -> str:
+    if not llm_gateway.is_configured():
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY missing")
-    return OpenAI(api_key=api_key)
-
-
-def _transcribe_audio(file_path: str, lang: str) -> str:
-    client = _get_openai()
-    with open(file_path, "rb") as f:
-        result = client.audio.transcriptions.create(
-            model=os.getenv("OPENAI_WHISPER_MODEL", "gpt-4o-mini-transcribe"),
-            file=f,
-            language=lang if lang in ("tr", "en") else None,
-        )
-    return (getattr(result, "text", None) or "").strip()
+    return await llm_gateway.transcribe(
+        filename,
+        data,
+        model=os.getenv("OPENAI_WHISPER_MODEL", "gpt-4o-mini-transcribe"),
+        language=lang if lang in ("tr", "en") else None,
+    )
 
 
 @router.post("/rituel/voice")
@@ -31,17 +23,11 @@ async def rituel_voice(
     lang: str = Form("tr"),
     ritual_pack_id: str = Form("")
 ):
-    temp_path = None
-
     try:
         suffix = os.path.splitext(file.filename or "rituel.m4a")[1] or ".m4a"
+        content = await file.read()
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            temp_path = tmp.name
-
-        transcript = _transcribe_audio(temp_path, lang)
+        transcript = await _transcribe_audio("rituel" + suffix, content, lang)
 
         if not transcript:
             raise HTTPException(
@@ -63,9 +49,3 @@ async def rituel_voice(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if temp_path:
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
@@ -30,6 +30,9 @@ from app.config.shopier_content_mapping import (
     resolve_content_id_from_title_and_product,
 )
 from app.db import get_db, engine
+from app.services import entitlement_cache, job_queue, keyset, migrations
+from app.services.email_norm import ensure_email_norm_column
+from app.services.user_cache import get_user_row
 from app.validation.contact_email import normalize_contact_email
 from app.services.shopier_rest import (
     get_shopier_order,
@@ -132,6 +135,7 @@ def _webhook_authorized(request: Request, raw_body: bytes) -> bool:
     return False
 
 
+@migrations.register(8, "shopier_purchases_pending_orders")
 def _ensure_tables():
     is_pg = engine.dialect.name == "postgresql"
     with engine.connect() as conn:
@@ -362,12 +366,20 @@ def _ensure_tables():
             CREATE INDEX IF NOT EXISTS ix_po_platform_order
             ON pending_orders (platform_order_id)
         """))
+        # email_norm — LOWER(TRIM(email)) yerine indeksli eşleşme
+        ensure_email_norm_column(conn, "shopier_purchases")
+        ensure_email_norm_column(conn, "pending_orders")
+        for ddl in (
+            "CREATE INDEX IF NOT EXISTS ix_sp_cid_status_email ON shopier_purchases (content_id, status, email_norm)",
+            "CREATE INDEX IF NOT EXISTS ix_sp_cid_status_device ON shopier_purchases (content_id, status, device_fp)",
+            "CREATE INDEX IF NOT EXISTS ix_sp_email_norm_status ON shopier_purchases (email_norm, status)",
+            "CREATE INDEX IF NOT EXISTS ix_po_platform_status ON pending_orders (platform_order_id, status)",
+            "CREATE INDEX IF NOT EXISTS ix_po_email_norm_status ON pending_orders (email_norm, status, created_at)",
+        ):
+            conn.execute(sa_text(ddl))
         conn.commit()
 
 
-_ensure_tables()
-
-
 def _sql_recent_purchase_window() -> str:
     if engine.dialect.name == "postgresql":
         return "created_at > NOW() - INTERVAL '45 days'"
@@ -428,7 +440,7 @@ def _find_matching_pending_order(
             sa_text(f"""
                 SELECT id, email, content_id, product_id, device_fp, platform_order_id
                 FROM pending_orders
-                WHERE LOWER(TRIM(email)) = :em
+                WHERE email_norm = :em
                   AND product_id = :pid
                   AND status = 'pending'
                   AND {window}
@@ -444,7 +456,7 @@ def _find_matching_pending_order(
         sa_text(f"""
             SELECT id, email, content_id, product_id, device_fp, platform_order_id
             FROM pending_orders
-            WHERE LOWER(TRIM(email)) = :em
+            WHERE email_norm = :em
               AND status = 'pending'
               AND {window}
             ORDER BY created_at DESC
@@ -671,11 +683,13 @@ def _log_webhook(db: Session, *, status: str, order_id: str = "", email: str = "
         db.rollback()
     if status == "failed":
         try:
-            from app.services.email_service import send_email
             admin_to = os.getenv("ADMIN_ALERT_EMAIL", "selin@asksanri.com").strip()
-            send_email(admin_to, f"[SANRI] Webhook HATA: {error_detail[:80]}",
-                       f"<p>Webhook basarisiz</p><p>Order: {order_id}</p>"
-                       f"<p>Email: {email}</p><p>Hata: {error_detail}</p>")
+            job_queue.enqueue("email.send", {
+                "to": admin_to,
+                "subject": f"[SANRI] Webhook HATA: {error_detail[:80]}",
+                "html_body": (f"<p>Webhook basarisiz</p><p>Order: {order_id}</p>"
+                              f"<p>Email: {email}</p><p>Hata: {error_detail}</p>"),
+            })
         except Exception:
             pass
 
@@ -839,11 +853,11 @@ async def shopier_webhook(request: Request, db: Session = Depends(get_db)):
         db.execute(
             sa_text("""
                 INSERT INTO shopier_purchases (
-                    content_id, product_id, device_fp, email, amount, currency, source,
+                    content_id, product_id, device_fp, email, email_norm, amount, currency, source,
                     shopier_order_id, status, metadata_json,
                     order_number, product_name, product_code, event_type, payment_status, raw_payload
                 ) VALUES (
-                    :cid, :pid, :fp, :email, :amount, :currency, 'webhook',
+                    :cid, :pid, :fp, :email, LOWER(TRIM(:email)), :amount, :currency, 'webhook',
                     :oid, 'completed', :meta,
                     :ordernum, :pname, :pcode, :ev, :pstat, :rawp
                 )
@@ -865,6 +879,7 @@ async def shopier_webhook(request: Request, db: Session = Depends(get_db)):
                 "rawp": raw_str[:500000] if raw_str else None,
             },
         )
+        entitlement_cache.invalidate_after_commit(db, device_fp=pending_device_fp, email=email_norm)
         db.commit()
     except IntegrityError:
         db.rollback()
@@ -912,10 +927,9 @@ async def shopier_webhook(request: Request, db: Session = Depends(get_db)):
 
     if email_norm:
         try:
-            from app.services.email_service import send_purchase_confirmation
-            send_purchase_confirmation(email_norm, cid)
+            job_queue.enqueue("email.purchase_confirmation", {"to": email_norm, "content_id": cid})
         except Exception as mail_err:
-            logger.warning("Shopier webhook: purchase confirmation email failed email=%s err=%s", email_norm, mail_err)
+            logger.warning("Shopier webhook: purchase confirmation enqueue failed email=%s err=%s", email_norm, mail_err)
 
     _log_webhook(db, status="success", order_id=oid, email=email_norm or "",
                  content_id=cid, amount=amount, pending_match=pending_tag)
@@ -1119,7 +1133,7 @@ def prepare_order(body: PrepareOrderBody, db: Session = Depends(get_db)):
     existing = db.execute(
         sa_text(f"""
             SELECT id FROM pending_orders
-            WHERE LOWER(TRIM(email)) = :em
+            WHERE email_norm = :em
               AND content_id = :cid
               AND status = 'pending'
               AND {_sql_pending_window()}
@@ -1156,18 +1170,18 @@ def prepare_order(body: PrepareOrderBody, db: Session = Depends(get_db)):
         result = db.execute(
             sa_text("""
                 INSERT INTO pending_orders (
-                    email, content_id, product_id, device_fp,
+                    email, email_norm, content_id, product_id, device_fp,
                     platform_order_id, status
                 ) VALUES (
-                    :em, :cid, :pid, :fp, :pk, 'pending'
+                    :em, LOWER(TRIM(:em)), :cid, :pid, :fp, :pk, 'pending'
                 )
                 RETURNING id
             """) if engine.dialect.name == "postgresql" else sa_text("""
                 INSERT INTO pending_orders (
-                    email, content_id, product_id, device_fp,
+                    email, email_norm, content_id, product_id, device_fp,
                     platform_order_id, status
                 ) VALUES (
-                    :em, :cid, :pid, :fp, :pk, 'pending'
+                    :em, LOWER(TRIM(:em)), :cid, :pid, :fp, :pk, 'pending'
                 )
             """),
             {"em": em, "cid": cid, "pid": pid, "fp": fp, "pk": platform_key},
@@ -1233,7 +1247,7 @@ def bind_purchase_to_device(body: BindDeviceBody, db: Session = Depends(get_db))
         sa_text(f"""
         SELECT id, device_fp FROM shopier_purchases
         WHERE content_id = :cid AND status = 'completed'
-          AND LOWER(TRIM(email)) = :em
+          AND email_norm = :em
           AND {recent}
         ORDER BY created_at DESC
         LIMIT 1
@@ -1252,6 +1266,7 @@ def bind_purchase_to_device(body: BindDeviceBody, db: Session = Depends(get_db))
         sa_text("UPDATE shopier_purchases SET device_fp = :fp WHERE id = :id"),
         {"fp": fp, "id": _id},
     )
+    entitlement_cache.invalidate_after_commit(db, device_fp=fp, email=em)
     db.commit()
     logger.info(
         "contact_email_audit received_email=%r stored_email=%r source_flow=%s purchase_id=%s",
@@ -1263,65 +1278,6 @@ def bind_purchase_to_device(body: BindDeviceBody, db: Session = Depends(get_db))
     return {"ok": True}
 
 
-def _row_unlock_for_content(
-    db: Session, content_id: str, params: dict, or_clauses: list
-) -> Any:
-    if not or_clauses:
-        return None
-    where_or = "(" + " OR ".join(or_clauses) + ")"
-    sql = f"""
-        SELECT content_id, amount, currency, created_at
-        FROM shopier_purchases
-        WHERE content_id = :cid AND status = 'completed' AND {where_or}
-        ORDER BY created_at DESC LIMIT 1
-    """
-    p = {"cid": content_id, **params}
-    return db.execute(sa_text(sql), p).first()
-
-
-def _row_temp_unlock_for_content(db: Session, content_id: str, prm: dict) -> Any:
-    """Aktif havale geçici kilidi (shopier satırı yokken erişim)."""
-    from app.routes.bank_transfer_helpers import ensure_bank_transfer_aux_tables
-
-    ensure_bank_transfer_aux_tables()
-    tu_parts: list[str] = []
-    if "fp" in prm:
-        tu_parts.append(
-            "(t.device_fp IS NOT NULL AND TRIM(t.device_fp) != '' AND t.device_fp = :fp)"
-        )
-    if "qemail" in prm:
-        tu_parts.append("LOWER(TRIM(t.email)) = :qemail")
-    if "uemail" in prm:
-        tu_parts.append("LOWER(TRIM(t.email)) = :uemail")
-    if "uid" in prm:
-        tu_parts.append(
-            "EXISTS (SELECT 1 FROM users u WHERE u.id = :uid AND "
-            "COALESCE(u.email, '') LIKE '%@%' AND "
-            "LOWER(TRIM(u.email)) = LOWER(TRIM(t.email)))"
-        )
-    if not tu_parts:
-        return None
-    is_pg = engine.dialect.name == "postgresql"
-    alive = (
-        "t.revoked = false AND t.expires_at > NOW()"
-        if is_pg
-        else "t.revoked = 0 AND datetime(t.expires_at) > datetime('now')"
-    )
-    where_id = "(" + " OR ".join(tu_parts) + ")"
-    sql = f"""
-        SELECT t.content_id, r.amount, 'TRY' AS currency, t.created_at
-        FROM bank_transfer_temp_unlocks t
-        INNER JOIN bank_transfer_requests r ON r.id = t.request_id
-        WHERE t.content_id = :cid AND {alive} AND {where_id}
-        ORDER BY t.created_at DESC LIMIT 1
-    """
-    p: dict = {"cid": content_id}
-    for k in ("fp", "qemail", "uemail", "uid"):
-        if k in prm:
-            p[k] = prm[k]
-    return db.execute(sa_text(sql), p).first()
-
-
 def _auth_user_email(db: Session, authorization: Optional[str]) -> tuple[Optional[int], Optional[str]]:
     if not authorization or not authorization.startswith("Bearer "):
         return None, None
@@ -1332,16 +1288,33 @@ def _auth_user_email(db: Session, authorization: Optional[str]) -> tuple[Optiona
         if not payload or not payload.get("sub"):
             return None, None
         user_id = int(payload["sub"])
-        urow = db.execute(
-            sa_text("SELECT email FROM users WHERE id = :id"),
-            {"id": user_id},
-        ).first()
-        ue = str(urow[0]).strip().lower() if urow and urow[0] else None
+        urow = get_user_row(db, user_id)
+        ue = str(urow["email"]).strip().lower() if urow and urow["email"] else None
         return user_id, ue if ue and "@" in ue else None
     except Exception:
         return None, None
 
 
+def _check_result(row: Any) -> dict:
+    if not row:
+        return {"unlocked": False, "purchase": None}
+
+    content_id_r, amount, currency, created_at = row[0], row[1], row[2], row[3]
+    purchased_at = str(created_at) if created_at else None
+    amt = float(amount) if amount is not None else 0.0
+    purchase = {
+        "content_id": content_id_r,
+        "amount": amt,
+        "currency": str(currency or "TRY"),
+        "purchased_at": purchased_at,
+    }
+    return {
+        "unlocked": True,
+        "purchase": purchase,
+        "purchased_at": purchased_at,
+    }
+
+
 @router.get("/check/{content_id}")
 def check_purchase(
     content_id: str,
@@ -1354,47 +1327,49 @@ def check_purchase(
     if not cid:
         return {"unlocked": False, "purchase": None}
 
-    ors = []
-    prm: dict = {}
+    user_id, user_email = _auth_user_email(db, authorization)
+    row = entitlement_cache.find_unlock(
+        db,
+        cid,
+        device_fp=device_fp,
+        emails=(email, user_email),
+        user_id=user_id,
+    )
+    return _check_result(row)
+
 
-    if device_fp:
-        ors.append("device_fp = :fp")
-        prm["fp"] = device_fp.strip()
+CHECK_BATCH_MAX = int(os.getenv("SHOPIER_CHECK_BATCH_MAX", "200"))
 
-    email_q = (email or "").strip().lower()
-    if email_q and "@" in email_q:
-        ors.append("LOWER(TRIM(email)) = :qemail")
-        prm["qemail"] = email_q
 
-    user_id, user_email = _auth_user_email(db, authorization)
+class CheckBatchBody(BaseModel):
+    content_ids: list[str]
+    device_fp: Optional[str] = ""
+    email: Optional[str] = ""
 
-    if user_id:
-        ors.append("user_id = :uid")
-        prm["uid"] = user_id
-    if user_email:
-        ors.append("LOWER(TRIM(email)) = :uemail")
-        prm["uemail"] = user_email
 
-    row = _row_unlock_for_content(db, cid, prm, ors)
-    if not row:
-        row = _row_temp_unlock_for_content(db, cid, prm)
-    if not row:
-        return {"unlocked": False, "purchase": None}
+@router.post("/check-batch")
+def check_purchase_batch(
+    body: CheckBatchBody,
+    authorization: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
+):
+    """
+    Liste sayfaları için: tek istekte birden çok içerik. Yanıt
+    {"results": {content_id: /check/{content_id} gövdesi}}.
+    """
+    cids = [c.strip() for c in body.content_ids if c and c.strip()]
+    if len(cids) > CHECK_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"En fazla {CHECK_BATCH_MAX} içerik")
 
-    content_id_r, amount, currency, created_at = row[0], row[1], row[2], row[3]
-    purchased_at = str(created_at) if created_at else None
-    amt = float(amount) if amount is not None else 0.0
-    purchase = {
-        "content_id": content_id_r,
-        "amount": amt,
-        "currency": str(currency or "TRY"),
-        "purchased_at": purchased_at,
-    }
-    return {
-        "unlocked": True,
-        "purchase": purchase,
-        "purchased_at": purchased_at,
-    }
+    user_id, user_email = _auth_user_email(db, authorization)
+    rows = entitlement_cache.find_unlocks(
+        db,
+        cids,
+        device_fp=body.device_fp,
+        emails=(body.email, user_email),
+        user_id=user_id,
+    )
+    return {"results": {cid: _check_result(row) for cid, row in rows.items()}}
 
 
 @router.get("/my-purchases")
@@ -1415,11 +1390,11 @@ def my_purchases(
         conditions.append("user_id = :uid")
         params["uid"] = user_id
     if user_email:
-        conditions.append("LOWER(TRIM(email)) = :uemail")
+        conditions.append("email_norm = :uemail")
         params["uemail"] = user_email
     email_q = (email or "").strip().lower()
     if email_q and "@" in email_q and email_q != (user_email or ""):
-        conditions.append("LOWER(TRIM(email)) = :qemail")
+        conditions.append("email_norm = :qemail")
         params["qemail"] = email_q
 
     if not conditions:
@@ -1453,22 +1428,14 @@ def my_purchases(
     ]
     shopier_cids = {p["content_id"] for p in purchases}
 
-    from app.routes.bank_transfer_helpers import ensure_bank_transfer_aux_tables
-
-    ensure_bank_transfer_aux_tables()
     tu_parts: list[str] = []
     if device_fp:
         tu_parts.append(
             "(t.device_fp IS NOT NULL AND TRIM(t.device_fp) != '' AND t.device_fp = :fp)"
         )
-    if user_id:
-        tu_parts.append(
-            "EXISTS (SELECT 1 FROM users u WHERE u.id = :uid AND "
-            "COALESCE(u.email, '') LIKE '%@%' AND "
-            "LOWER(TRIM(u.email)) = LOWER(TRIM(t.email)))"
-        )
     if user_email:
-        tu_parts.append("LOWER(TRIM(t.email)) = :uemail")
+        # user_email zaten users.email'in normalize hali; uid için ayrı alt sorgu gerekmez
+        tu_parts.append("t.email_norm = :uemail")
     if tu_parts:
         is_pg = engine.dialect.name == "postgresql"
         alive = (
@@ -1594,7 +1561,7 @@ async def verify_by_email(body: VerifyByEmailBody, db: Session = Depends(get_db)
         sa_text(f"""
             SELECT id FROM shopier_purchases
             WHERE content_id = :cid AND status = 'completed'
-              AND LOWER(TRIM(email)) = :em
+              AND email_norm = :em
               AND {recent}
             LIMIT 1
         """),
@@ -1645,11 +1612,11 @@ async def verify_by_email(body: VerifyByEmailBody, db: Session = Depends(get_db)
             db.execute(
                 sa_text("""
                     INSERT INTO shopier_purchases (
-                        content_id, product_id, email, amount, currency, source,
+                        content_id, product_id, email, email_norm, amount, currency, source,
                         shopier_order_id, status, metadata_json,
                         order_number, product_name, product_code, event_type, payment_status
                     ) VALUES (
-                        :cid, :pid, :email, :amount, :currency, 'pat_verify',
+                        :cid, :pid, :email, LOWER(TRIM(:email)), :amount, :currency, 'pat_verify',
                         :oid, 'completed', :meta,
                         :ordernum, :pname, :pcode, 'verify_by_email', :pstat
                     )
@@ -1668,6 +1635,7 @@ async def verify_by_email(body: VerifyByEmailBody, db: Session = Depends(get_db)
                     "pstat": pay_status or None,
                 },
             )
+            entitlement_cache.invalidate_after_commit(db, email=em)
             db.commit()
         except IntegrityError:
             db.rollback()
@@ -1704,19 +1672,27 @@ def admin_webhook_logs(
 @router.get("/admin/purchases")
 def admin_purchases(
     x_admin_secret: Optional[str] = Header(default=None),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
     if x_admin_secret != ADMIN_SECRET:
         raise HTTPException(status_code=403, detail="Admin access denied")
 
+    params: dict[str, Any] = {"lim": limit + 1}
+    cur = keyset.decode_cursor(cursor)
+    where = f"WHERE {keyset.after_sql('created_at, id', cur, params)}" if cur else ""
     rows = db.execute(
-        sa_text("""
+        sa_text(f"""
         SELECT id, content_id, product_id, product_name, device_fp, user_id, email,
                amount, currency, source, shopier_order_id, order_number,
                status, payment_status, event_type, created_at
-        FROM shopier_purchases ORDER BY created_at DESC LIMIT 100
-    """)
+        FROM shopier_purchases {where}
+        ORDER BY created_at DESC, id DESC LIMIT :lim
+    """),
+        params,
     ).mappings().all()
+    rows, next_cursor = keyset.page(list(rows), limit, lambda r: (r["created_at"], r["id"]))
 
     total = db.execute(
         sa_text("SELECT COALESCE(SUM(amount), 0) FROM shopier_purchases WHERE status = 'completed'")
@@ -1729,6 +1705,7 @@ def admin_purchases(
         "total_purchases": len(rows),
         "total_email_leads": leads,
         "purchases": [dict(r) for r in rows],
+        "next_cursor": next_cursor,
     }
 
 
@@ -1794,7 +1771,6 @@ def admin_grant_unlock(
     if x_admin_secret != ADMIN_SECRET:
         raise HTTPException(status_code=403, detail="Admin access denied")
 
-    _ensure_tables()
     email_norm = body.email.strip().lower()
     oid = f"manual-admin-{email_norm}-{body.content_id}-{int(__import__('time').time())}"
 
@@ -1802,10 +1778,10 @@ def admin_grant_unlock(
         db.execute(
             sa_text("""
                 INSERT INTO shopier_purchases (
-                    content_id, email, amount, currency, source,
+                    content_id, email, email_norm, amount, currency, source,
                     shopier_order_id, status, metadata_json
                 ) VALUES (
-                    :cid, :email, :amount, 'TRY', 'admin_grant',
+                    :cid, :email, LOWER(TRIM(:email)), :amount, 'TRY', 'admin_grant',
                     :oid, 'completed', :meta
                 )
             """),
@@ -1817,6 +1793,7 @@ def admin_grant_unlock(
                 "meta": json.dumps({"note": body.note, "granted_by": "admin"}, ensure_ascii=False),
             },
         )
+        entitlement_cache.invalidate_after_commit(db, email=email_norm)
         db.commit()
     except IntegrityError:
         db.rollback()
@@ -14,6 +14,7 @@ from app.models.yanki import YankiPost, YankiComment, YankiReaction, YankiReport
 from app.models.sanri_reflection import SanriReflection
 from app.models.notification import YankiNotification
 from app.models.referral import YankiReferral
+from app.services import job_queue, keyset, metric_batch, migrations
 
 router = APIRouter(prefix="/yanki", tags=["yanki"])
 
@@ -21,6 +22,7 @@ AUTO_PUBLISH = os.getenv("YANKI_AUTO_PUBLISH", "true").lower() in ("true", "1",
 
 
 # ── Schema migration for existing tables ──────────────────────────
+@migrations.register(1, "yanki_users_columns")
 def _migrate_yanki_schema():
     """Add new columns to existing tables created by the old raw-SQL DDL."""
 
@@ -89,11 +91,6 @@ def _migrate_yanki_schema():
 
     Base.metadata.create_all(bind=engine)
 
-try:
-    _migrate_yanki_schema()
-except Exception as e:
-    print(f"[YANKI] Schema migration warning: {e}")
-
 
 # ── Pydantic Schemas ──────────────────────────────────────────────
 
@@ -144,6 +141,7 @@ class PostListOut(BaseModel):
     total: int
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 class CommentOut(BaseModel):
     id: int
@@ -156,6 +154,7 @@ class CommentOut(BaseModel):
 class CommentListOut(BaseModel):
     comments: List[CommentOut]
     total: int
+    next_cursor: Optional[str] = None
 
 class ReflectionOut(BaseModel):
     id: int
@@ -200,16 +199,31 @@ REACTION_COL_MAP = {
 # ── Notification helper ────────────────────────────────────────────
 
 def _emit_notification(db: Session, user_id: int, notif_type: str, post_id: int, actor_id: int = None, message: str = None):
+    """Bildirim, çağıranın transaction'ında kuyruğa yazılır (outbox); satır worker'da oluşur."""
     if actor_id and actor_id == user_id:
         return
-    notif = YankiNotification(
-        user_id=user_id,
-        type=notif_type,
-        post_id=post_id,
-        actor_id=actor_id,
-        message=(message or "")[:500] or None,
+    job_queue.enqueue(
+        "yanki.notification",
+        {
+            "user_id": user_id,
+            "type": notif_type,
+            "post_id": post_id,
+            "actor_id": actor_id,
+            "message": (message or "")[:500] or None,
+        },
+        db=db,
     )
-    db.add(notif)
+
+
+@job_queue.register("yanki.notification")
+def _notification_job(db: Session, payload: dict) -> None:
+    db.add(YankiNotification(
+        user_id=payload["user_id"],
+        type=payload["type"],
+        post_id=payload.get("post_id"),
+        actor_id=payload.get("actor_id"),
+        message=payload.get("message"),
+    ))
 
 
 # ── Streak helper ─────────────────────────────────────────────────
@@ -316,26 +330,38 @@ def list_published(
     section: Optional[str] = Query(None),
     limit: int = Query(20, ge=1, le=50),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
+    """cursor verilirse keyset (published_at, id) ile devam eder; offset eski istemciler için."""
     q = db.query(YankiPost).filter(YankiPost.status == "published")
 
     if category and category in VALID_CATEGORIES:
         q = q.filter(YankiPost.category == category)
+    else:
+        category = None
 
     if section == "today":
         q = q.filter(func.date(YankiPost.published_at) == func.current_date())
     elif section == "curated":
         q = q.filter(YankiPost.sanri_note.isnot(None), YankiPost.sanri_note != "")
+    else:
+        section = None
 
-    total = q.count()
-    posts = q.order_by(YankiPost.published_at.desc()).offset(offset).limit(limit).all()
+    total = keyset.cached_total(("yanki.posts", category, section), q.count)
+
+    cur = keyset.decode_cursor(cursor)
+    if cur:
+        q = q.filter(keyset.after((YankiPost.published_at, YankiPost.id), cur))
+    rows = q.order_by(YankiPost.published_at.desc(), YankiPost.id.desc()).offset(0 if cur else offset).limit(limit + 1).all()
+    posts, next_cursor = keyset.page(rows, limit, lambda p: (p.published_at, p.id))
 
     return {
         "posts": [p.to_public_dict() for p in posts],
         "total": total,
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
     }
 
 
@@ -754,6 +780,7 @@ def list_comments(
     post_id: int,
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
     post = (
@@ -764,19 +791,18 @@ def list_comments(
     if not post:
         raise HTTPException(status_code=404, detail="Post bulunamadi.")
 
-    total = db.query(YankiComment).filter(YankiComment.post_id == post_id).count()
-    comments = (
-        db.query(YankiComment)
-        .filter(YankiComment.post_id == post_id)
-        .order_by(YankiComment.created_at.asc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    q = db.query(YankiComment).filter(YankiComment.post_id == post_id)
+    total = keyset.cached_total(("yanki.comments", post_id), q.count)
+    cur = keyset.decode_cursor(cursor)
+    if cur:
+        q = q.filter(keyset.after((YankiComment.created_at, YankiComment.id), cur, desc=False))
+    rows = q.order_by(YankiComment.created_at.asc(), YankiComment.id.asc()).offset(0 if cur else offset).limit(limit + 1).all()
+    comments, next_cursor = keyset.page(rows, limit, lambda c: (c.created_at, c.id))
 
     return {
         "comments": [c.to_dict() for c in comments],
         "total": total,
+        "next_cursor": next_cursor,
     }
 
 
@@ -862,8 +888,8 @@ def sanri_reflect(
 
     source = "api"
     try:
-        from app.services.sanri_orchestrator import run_sanri
-        result = run_sanri(
+        from app.services.sanri_orchestrator import run_sanri_sync
+        result = run_sanri_sync(
             db=db,
             user_id=current_user["id"],
             user_message=prompt_text,
@@ -1066,6 +1092,7 @@ def admin_list_posts(
     status_filter: str = Query("pending_review"),
     limit: int = Query(30, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -1073,10 +1100,14 @@ def admin_list_posts(
         raise HTTPException(status_code=403, detail="Admin only")
 
     q = db.query(YankiPost).filter(YankiPost.status == status_filter)
-    total = q.count()
-    posts = q.order_by(YankiPost.created_at.desc()).offset(offset).limit(limit).all()
+    total = keyset.cached_total(("yanki.admin_posts", status_filter), q.count)
+    cur = keyset.decode_cursor(cursor)
+    if cur:
+        q = q.filter(keyset.after((YankiPost.created_at, YankiPost.id), cur))
+    rows = q.order_by(YankiPost.created_at.desc(), YankiPost.id.desc()).offset(0 if cur else offset).limit(limit + 1).all()
+    posts, next_cursor = keyset.page(rows, limit, lambda p: (p.created_at, p.id))
 
-    return {"posts": [p.to_admin_dict() for p in posts], "total": total}
+    return {"posts": [p.to_admin_dict() for p in posts], "total": total, "next_cursor": next_cursor}
 
 
 # ── ADMIN: Review post ───────────────────────────────────────────
@@ -1123,9 +1154,10 @@ def admin_stats(
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
 
-    stats = {}
-    for st in ["pending_review", "published", "rejected"]:
-        stats[st] = db.query(YankiPost).filter(YankiPost.status == st).count()
+    stats = metric_batch.run_metrics(db, "yanki_posts", [
+        metric_batch.count(st, f"status = '{st}'")
+        for st in ["pending_review", "published", "rejected"]
+    ])
 
     stats["total_reactions"] = db.query(YankiReaction).count()
     stats["total_reports"] = db.query(YankiReport).count()
@@ -10,10 +10,12 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field, field_validator
 from sqlalchemy import desc
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.db import get_db
 from app.models.anlasilma_field import AnlasilmaPresence
 from app.models.yanki import YankiFieldEcho, YankiPost
+from app.services import keyset
 from app.services.field_moderation import moderate_field_text
 
 router = APIRouter(prefix="/yanki/field", tags=["yanki-field"])
@@ -55,9 +57,8 @@ class ShareToFieldOut(BaseModel):
     message: str
 
 
-@router.post("/share", response_model=ShareToFieldOut)
-def share_from_anlasilma(body: ShareToFieldIn, db: Session = Depends(get_db)):
-    """Anlaşılma alanındaki niyeti (aynı metin) kolektif hissel akışa anonim bırak."""
+def _share_precheck(db: Session, body: ShareToFieldIn) -> YankiPost | None:
+    """Oturum / limit kontrolleri; aynı niyet zaten akıştaysa o post'u döndürür."""
     now = _now()
     cutoff = now - timedelta(minutes=PRESENCE_WINDOW_MIN)
 
@@ -94,7 +95,7 @@ def share_from_anlasilma(body: ShareToFieldIn, db: Session = Depends(get_db)):
     if shares_24h >= MAX_SHARES_PER_24H:
         raise HTTPException(status_code=429, detail="Günlük anonim paylaşım sınırına ulaşıldı. Yarın tekrar dene.")
 
-    dup = (
+    return (
         db.query(YankiPost)
         .filter(
             YankiPost.anlasilma_session_id == body.session_id,
@@ -106,18 +107,10 @@ def share_from_anlasilma(body: ShareToFieldIn, db: Session = Depends(get_db)):
         .order_by(desc(YankiPost.created_at))
         .first()
     )
-    if dup:
-        return ShareToFieldOut(ok=True, post_id=dup.id, dedup=True, message="Bu niyet zaten akışta.")
 
-    ok_mod, reason, energy_feel = moderate_field_text(body.text, "share", body.frequency_hz)
-    if not ok_mod:
-        raise HTTPException(status_code=400, detail=reason or "İçerik reddedildi.")
-
-    tags_suffix = ""
-    if body.emotion_tags:
-        tags_suffix = " · " + ", ".join(body.emotion_tags)
-    energy_line = (energy_feel or "sessiz bir yakınlık").strip()[:120] + tags_suffix
 
+def _share_publish(db: Session, body: ShareToFieldIn, energy_line: str) -> YankiPost:
+    now = _now()
     post = YankiPost(
         user_id=None,
         author_mode="anonymous",
@@ -136,6 +129,26 @@ def share_from_anlasilma(body: ShareToFieldIn, db: Session = Depends(get_db)):
     db.add(post)
     db.commit()
     db.refresh(post)
+    return post
+
+
+@router.post("/share", response_model=ShareToFieldOut)
+async def share_from_anlasilma(body: ShareToFieldIn, db: Session = Depends(get_db)):
+    """Anlaşılma alanındaki niyeti (aynı metin) kolektif hissel akışa anonim bırak."""
+    dup = await run_in_threadpool(_share_precheck, db, body)
+    if dup:
+        return ShareToFieldOut(ok=True, post_id=dup.id, dedup=True, message="Bu niyet zaten akışta.")
+
+    ok_mod, reason, energy_feel = await moderate_field_text(body.text, "share", body.frequency_hz)
+    if not ok_mod:
+        raise HTTPException(status_code=400, detail=reason or "İçerik reddedildi.")
+
+    tags_suffix = ""
+    if body.emotion_tags:
+        tags_suffix = " · " + ", ".join(body.emotion_tags)
+    energy_line = (energy_feel or "sessiz bir yakınlık").strip()[:120] + tags_suffix
+
+    post = await run_in_threadpool(_share_publish, db, body, energy_line)
     return ShareToFieldOut(ok=True, post_id=post.id, message="Niyetin kolektif alana düştü — isimsiz.")
 
 
@@ -144,6 +157,7 @@ class FieldStreamOut(BaseModel):
     total: int
     limit: int
     offset: int
+    next_cursor: str | None = None
 
 
 @router.get("/stream", response_model=FieldStreamOut)
@@ -151,6 +165,7 @@ def field_stream(
     frequency_hz: int | None = Query(None),
     limit: int = Query(15, ge=1, le=40),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
     db: Session = Depends(get_db),
 ):
     if frequency_hz is not None and frequency_hz not in ALLOWED_HZ:
@@ -163,8 +178,12 @@ def field_stream(
     if frequency_hz is not None:
         q = q.filter(YankiPost.frequency_hz == frequency_hz)
 
-    total = q.count()
-    rows = q.order_by(YankiPost.published_at.desc()).offset(offset).limit(limit).all()
+    total = keyset.cached_total(("yanki.field_stream", frequency_hz), q.count)
+    cur = keyset.decode_cursor(cursor)
+    if cur:
+        q = q.filter(keyset.after((YankiPost.published_at, YankiPost.id), cur))
+    rows = q.order_by(YankiPost.published_at.desc(), YankiPost.id.desc()).offset(0 if cur else offset).limit(limit + 1).all()
+    rows, next_cursor = keyset.page(rows, limit, lambda p: (p.published_at, p.id))
 
     out = []
     for p in rows:
@@ -173,7 +192,7 @@ def field_stream(
         d["author_mode"] = "anonymous"
         out.append(d)
 
-    return {"posts": out, "total": total, "limit": limit, "offset": offset}
+    return {"posts": out, "total": total, "limit": limit, "offset": offset, "next_cursor": next_cursor}
 
 
 @router.get("/posts/{post_id}")
@@ -204,8 +223,7 @@ class EchoOut(BaseModel):
     echo_id: int
 
 
-@router.post("/posts/{post_id}/echo", response_model=EchoOut)
-def leave_echo(post_id: int, body: EchoIn, db: Session = Depends(get_db)):
+def _echo_precheck(db: Session, post_id: int, body: EchoIn) -> YankiPost:
     post = (
         db.query(YankiPost)
         .filter(
@@ -243,22 +261,33 @@ def leave_echo(post_id: int, body: EchoIn, db: Session = Depends(get_db)):
     )
     if echo_hour >= MAX_ECHOES_PER_HOUR_GLOBAL:
         raise HTTPException(status_code=429, detail="Saatlik yankı sınırı doldu.")
+    return post
 
-    ok_mod, reason, _ = moderate_field_text(body.text, "echo")
-    if not ok_mod:
-        raise HTTPException(status_code=400, detail=reason or "Yankı reddedildi.")
 
+def _echo_publish(db: Session, post: YankiPost, body: EchoIn) -> YankiFieldEcho:
     row = YankiFieldEcho(
-        post_id=post_id,
+        post_id=post.id,
         session_id=body.session_id,
         body=body.text.strip()[:400],
         status="published",
-        created_at=now,
+        created_at=_now(),
     )
     db.add(row)
     post.field_echo_count = int(post.field_echo_count or 0) + 1
     db.commit()
     db.refresh(row)
+    return row
+
+
+@router.post("/posts/{post_id}/echo", response_model=EchoOut)
+async def leave_echo(post_id: int, body: EchoIn, db: Session = Depends(get_db)):
+    post = await run_in_threadpool(_echo_precheck, db, post_id, body)
+
+    ok_mod, reason, _ = await moderate_field_text(body.text, "echo")
+    if not ok_mod:
+        raise HTTPException(status_code=400, detail=reason or "Yankı reddedildi.")
+
+    row = await run_in_threadpool(_echo_publish, db, post, body)
     return EchoOut(ok=True, echo_id=row.id)
 
 
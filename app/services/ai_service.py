@@ -1,43 +1,78 @@
 import json
-import os
 import re
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, Optional
 
-from openai import OpenAI
 from fastapi import HTTPException
 
+from app.services import llm_gateway
 
-def get_client() -> OpenAI:
-    key = (os.getenv("OPENAI_API_KEY") or "").strip()
 
-    if not key:
+def ensure_configured() -> None:
+    if not llm_gateway.is_configured():
         raise HTTPException(status_code=500, detail="OPENAI_KEY_MISSING")
 
-    return OpenAI(api_key=key)
 
+def _sanri_messages(system_prompt: str, user_input: str) -> list[dict]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_input},
+    ]
 
-def generate_sanri_response(
-    client: OpenAI,
+
+async def generate_sanri_response(
     model: str,
     system_prompt: str,
     user_input: str,
+    usage: Optional[dict] = None,
 ) -> str:
-    completion = client.chat.completions.create(
+    """`usage` verilirse prompt/cached/completion token sayılarıyla doldurulur."""
+    ensure_configured()
+    completion = await llm_gateway.chat_completion(
+        _sanri_messages(system_prompt, user_input),
         model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input},
-        ],
         temperature=0.88,
         max_tokens=900,
     )
-
+    if usage is not None:
+        usage.update(llm_gateway.usage_of(completion))
     text_resp = (completion.choices[0].message.content or "").strip()
+    return text_resp or "Sanrı seni duydu."
+
+
+async def stream_sanri_response(
+    model: str,
+    system_prompt: str,
+    user_input: str,
+    usage: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    ensure_configured()
+    async for delta in llm_gateway.chat_stream(
+        _sanri_messages(system_prompt, user_input),
+        model=model,
+        temperature=0.88,
+        max_tokens=900,
+        usage=usage,
+    ):
+        yield delta
 
-    if not text_resp:
-        text_resp = "Sanrı seni duydu."
 
-    return text_resp
+def generate_sanri_response_sync(
+    model: str,
+    system_prompt: str,
+    user_input: str,
+    usage: Optional[dict] = None,
+) -> str:
+    ensure_configured()
+    completion = llm_gateway.chat_completion_sync(
+        _sanri_messages(system_prompt, user_input),
+        model=model,
+        temperature=0.88,
+        max_tokens=900,
+    )
+    if usage is not None:
+        usage.update(llm_gateway.usage_of(completion))
+    text_resp = (completion.choices[0].message.content or "").strip()
+    return text_resp or "Sanrı seni duydu."
 
 
 def _strip_json_fence(raw: str) -> str:
@@ -48,8 +83,7 @@ def _strip_json_fence(raw: str) -> str:
     return t.strip()
 
 
-def generate_kod_okuma_json(
-    client: OpenAI,
+async def generate_kod_okuma_json(
     model: str,
     system_prompt: str,
     user_input: str,
@@ -58,26 +92,20 @@ def generate_kod_okuma_json(
     """
     Üst Bilinç Kodlama — yalnızca JSON nesnesi (OpenAI json_object).
     """
-    kwargs = dict(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input},
-        ],
-        temperature=0.88,
-        max_tokens=max_tokens,
-    )
+    ensure_configured()
+    kwargs = dict(model=model, temperature=0.88, max_tokens=max_tokens)
+    messages = _sanri_messages(system_prompt, user_input)
     try:
-        completion = client.chat.completions.create(
-            **kwargs,
+        raw = await llm_gateway.chat_text(
+            messages,
             response_format={"type": "json_object"},
+            **kwargs,
         )
     except Exception:
-        completion = client.chat.completions.create(**kwargs)
+        raw = await llm_gateway.chat_text(messages, **kwargs)
 
-    raw = (completion.choices[0].message.content or "").strip()
     raw = _strip_json_fence(raw)
     if not raw:
         raise ValueError("EMPTY_COMPLETION")
 
-    return json.loads(raw)
\ No newline at end of file
+    return json.loads(raw)
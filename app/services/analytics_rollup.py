@@ -0,0 +1,284 @@
+"""
+page_views ön-toplamları — /analytics/stats ve /analytics/retention bunları okur.
+
+Zamanlayıcı (lider) her dakika `compact_pageviews` çalıştırır: page_views
+satırları id filigranından (rollup_state) itibaren parça parça okunur ve
+şunlara katlanır:
+
+- pv_rollup_hourly / pv_rollup_daily: görüntülenme + ziyaretçi HLL sketch'i
+- pv_rollup_daily_paths: gün × path görüntülenme
+- pv_rollup_visitors: ip_hash başına ilk hafta, son hafta, son iki farklı gün
+- pv_rollup_retention: (ilk hafta, hafta no) → geri dönen ziyaretçi
+
+Flusher'ın geç commit ettiği satırlar atlanmasın diye SAFETY_LAG_SEC'ten
+yeni satırlarda durulur; raporlar en fazla birkaç dakika geriden gelir.
+Tek yazıcı scheduler lease'i ile garanti; upsert'ler bu yüzden oku-yaz.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.analytics_rollup import (
+    PageViewDaily,
+    PageViewDailyPath,
+    PageViewHourly,
+    PageViewRetentionCell,
+    PageViewVisitor,
+    RollupState,
+)
+from app.services import hll
+from app.services.ingest_buffer import page_views
+
+log = logging.getLogger("sanri.rollup")
+
+CHUNK_ROWS = int(os.getenv("SANRI_ROLLUP_CHUNK_ROWS", "20000"))
+TIME_BUDGET_SEC = float(os.getenv("SANRI_ROLLUP_TIME_BUDGET", "40"))
+SAFETY_LAG_SEC = int(os.getenv("SANRI_ROLLUP_SAFETY_LAG", "120"))
+HOURLY_RETENTION_DAYS = int(os.getenv("SANRI_ROLLUP_HOURLY_DAYS", "3"))
+
+STATE_NAME = "page_views"
+_IN_CHUNK = 500
+
+
+def week_of(day: date) -> date:
+    """Pazartesi başlangıçlı hafta (Postgres DATE_TRUNC('week') ile aynı)."""
+    return day - timedelta(days=day.weekday())
+
+
+# ----------------------------------------------------
+# write: compaction
+# ----------------------------------------------------
+
+def _get_state(db: Session) -> RollupState:
+    state = db.get(RollupState, STATE_NAME)
+    if state is None:
+        state = RollupState(name=STATE_NAME, last_id=0)
+        db.add(state)
+        db.flush()
+    return state
+
+
+def _load_visitors(db: Session, ip_hashes: list[str]) -> dict[str, PageViewVisitor]:
+    out: dict[str, PageViewVisitor] = {}
+    for i in range(0, len(ip_hashes), _IN_CHUNK):
+        part = ip_hashes[i:i + _IN_CHUNK]
+        for v in db.query(PageViewVisitor).filter(PageViewVisitor.ip_hash.in_(part)):
+            out[v.ip_hash] = v
+    return out
+
+
+def _apply_visit(db: Session, visitors: dict, cells: dict, ip: str, day: date) -> None:
+    week = week_of(day)
+    v = visitors.get(ip)
+    if v is None:
+        v = PageViewVisitor(ip_hash=ip, first_week=week, last_week=week, last_day=day, prev_day=None)
+        db.add(v)
+        visitors[ip] = v
+        cells[(week, 0)] += 1
+        return
+    if day > v.last_day:
+        v.prev_day, v.last_day = v.last_day, day
+    if week > v.last_week:
+        v.last_week = week
+        cells[(v.first_week, (week - v.first_week).days // 7)] += 1
+
+
+def _fold_chunk(db: Session, rows: list) -> None:
+    hourly_views: dict[datetime, int] = defaultdict(int)
+    hourly_sk: dict[datetime, bytearray] = {}
+    daily_views: dict[date, int] = defaultdict(int)
+    daily_sk: dict[date, bytearray] = {}
+    path_views: dict[tuple, int] = defaultdict(int)
+    visits: dict[str, set] = defaultdict(set)
+
+    for r in rows:
+        ts = r.created_at
+        hour = ts.replace(minute=0, second=0, microsecond=0)
+        day = ts.date()
+        hourly_views[hour] += 1
+        daily_views[day] += 1
+        path_views[(day, (r.path or "")[:500])] += 1
+        if r.ip_hash:
+            h = hll.hash64(r.ip_hash)
+            hll.add(hourly_sk.setdefault(hour, hll.new()), h)
+            hll.add(daily_sk.setdefault(day, hll.new()), h)
+            visits[r.ip_hash].add(day)
+
+    for hour, n in hourly_views.items():
+        row = db.get(PageViewHourly, hour)
+        if row is None:
+            db.add(PageViewHourly(hour=hour, views=n, visitors_hll=bytes(hourly_sk.get(hour) or hll.new())))
+        else:
+            row.views += n
+            row.visitors_hll = bytes(hll.merge(row.visitors_hll, hourly_sk.get(hour)))
+
+    for day, n in daily_views.items():
+        row = db.get(PageViewDaily, day)
+        if row is None:
+            db.add(PageViewDaily(day=day, views=n, visitors_hll=bytes(daily_sk.get(day) or hll.new())))
+        else:
+            row.views += n
+            row.visitors_hll = bytes(hll.merge(row.visitors_hll, daily_sk.get(day)))
+
+    for (day, path), n in path_views.items():
+        row = db.get(PageViewDailyPath, (day, path))
+        if row is None:
+            db.add(PageViewDailyPath(day=day, path=path, views=n))
+        else:
+            row.views += n
+
+    visitors = _load_visitors(db, list(visits))
+    cells: dict[tuple, int] = defaultdict(int)
+    for ip, days in visits.items():
+        for day in sorted(days):
+            _apply_visit(db, visitors, cells, ip, day)
+
+    for (first_week, week_num), n in cells.items():
+        row = db.get(PageViewRetentionCell, (first_week, week_num))
+        if row is None:
+            db.add(PageViewRetentionCell(first_week=first_week, week_num=week_num, retained=n))
+        else:
+            row.retained += n
+
+
+def compact_pageviews(db: Session) -> int:
+    """Filigrandan sonraki page_views satırlarını rollup'lara kat. Katlanan satır sayısını döner."""
+    started = time.monotonic()
+    cutoff = datetime.utcnow() - timedelta(seconds=SAFETY_LAG_SEC)
+    total = 0
+
+    while time.monotonic() - started < TIME_BUDGET_SEC:
+        state = _get_state(db)
+        rows = db.execute(
+            select(page_views.c.id, page_views.c.path, page_views.c.ip_hash, page_views.c.created_at)
+            .where(page_views.c.id > state.last_id)
+            .order_by(page_views.c.id)
+            .limit(CHUNK_ROWS)
+        ).all()
+
+        ready = []
+        for r in rows:
+            if r.created_at is not None and r.created_at >= cutoff:
+                break
+            ready.append(r)
+        if not ready:
+            db.rollback()
+            break
+
+        _fold_chunk(db, [r for r in ready if r.created_at is not None])
+        state.last_id = int(ready[-1].id)
+        state.updated_at = datetime.utcnow()
+        db.commit()
+        total += len(ready)
+        if len(ready) < len(rows) or len(rows) < CHUNK_ROWS:
+            break
+
+    if total:
+        db.query(PageViewHourly).filter(
+            PageViewHourly.hour < datetime.utcnow() - timedelta(days=HOURLY_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+        db.commit()
+        log.info("pageview rollup folded %d rows in %.1fs", total, time.monotonic() - started)
+    return total
+
+
+# ----------------------------------------------------
+# read
+# ----------------------------------------------------
+
+def _hour_floor(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _merged_count(sketches) -> int:
+    acc: Optional[bytearray] = None
+    for sk in sketches:
+        acc = hll.merge(acc, sk)
+    return hll.count(acc) if acc else 0
+
+
+def get_stats(db: Session) -> dict:
+    now = datetime.utcnow()
+    s24 = _hour_floor(now - timedelta(hours=24))
+    s7d = (now - timedelta(days=7)).date()
+    s30d = (now - timedelta(days=30)).date()
+
+    hourly = db.query(PageViewHourly.views, PageViewHourly.visitors_hll).filter(PageViewHourly.hour >= s24).all()
+    daily = db.query(PageViewDaily.day, PageViewDaily.views, PageViewDaily.visitors_hll).filter(
+        PageViewDaily.day >= s30d
+    ).all()
+    week_rows = [d for d in daily if d.day >= s7d]
+
+    total = db.query(func.coalesce(func.sum(PageViewDaily.views), 0)).scalar() or 0
+
+    top_pages = (
+        db.query(PageViewDailyPath.path, func.sum(PageViewDailyPath.views).label("c"))
+        .filter(PageViewDailyPath.day >= s7d)
+        .group_by(PageViewDailyPath.path)
+        .order_by(func.sum(PageViewDailyPath.views).desc())
+        .limit(10)
+        .all()
+    )
+
+    return {
+        "views": {
+            "total": int(total),
+            "today": sum(int(h.views) for h in hourly),
+            "week": sum(int(d.views) for d in week_rows),
+            "month": sum(int(d.views) for d in daily),
+        },
+        "unique_visitors": {
+            "today": _merged_count(h.visitors_hll for h in hourly),
+            "week": _merged_count(d.visitors_hll for d in week_rows),
+            "month": _merged_count(d.visitors_hll for d in daily),
+        },
+        "top_pages": [{"path": r.path, "views": int(r.c)} for r in top_pages],
+    }
+
+
+def get_retention(db: Session, days: int = 30) -> dict:
+    since = (datetime.utcnow() - timedelta(days=days)).date()
+
+    daily = (
+        db.query(PageViewDaily.day, PageViewDaily.visitors_hll)
+        .filter(PageViewDaily.day >= since)
+        .order_by(PageViewDaily.day)
+        .all()
+    )
+    total_unique = _merged_count(d.visitors_hll for d in daily)
+
+    # son iki farklı ziyaret günü de pencere içindeyse ≥2 gün gelmiştir
+    returning = db.query(func.count()).select_from(PageViewVisitor).filter(
+        PageViewVisitor.prev_day >= since
+    ).scalar() or 0
+
+    cells = (
+        db.query(PageViewRetentionCell)
+        .filter(PageViewRetentionCell.first_week >= week_of(since))
+        .order_by(PageViewRetentionCell.first_week, PageViewRetentionCell.week_num)
+        .all()
+    )
+    cohorts: dict[str, dict] = {}
+    for c in cells:
+        fw = c.first_week.strftime("%Y-%m-%d")
+        entry = cohorts.setdefault(fw, {"cohort_size": 0, "weeks": {}})
+        if c.week_num == 0:
+            entry["cohort_size"] = int(c.retained)
+        entry["weeks"][str(c.week_num)] = int(c.retained)
+
+    return {
+        "days": days,
+        "total_unique_visitors": int(total_unique),
+        "returning_visitors": int(returning),
+        "return_rate": round((returning / total_unique * 100), 1) if total_unique > 0 else 0,
+        "daily_active": [{"day": str(d.day), "uniques": hll.count(d.visitors_hll)} for d in daily],
+        "cohorts": cohorts,
+    }
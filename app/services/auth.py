@@ -1,6 +1,9 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 import os
+import threading
+import time
 
 from jose import jwt, JWTError
 from passlib.context import CryptContext
@@ -11,6 +14,13 @@ SECRET_KEY = os.getenv("JWT_SECRET", "SUPER_SECRET_CHANGE_THIS")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+# doğrulanmış token → claims (exp'e kadar); her istekte HMAC doğrulaması yerine
+TOKEN_CACHE_MAX = int(os.getenv("SANRI_TOKEN_CACHE_MAX", "10000"))
+TOKEN_CACHE_NO_EXP_TTL = 300
+
+_token_lock = threading.Lock()
+_token_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
 
 def hash_password(password: str) -> str:
     safe_password = str(password)[:72]   # 🔥 kritik fix
@@ -36,7 +46,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_token(token: str):
+    now = time.time()
+    with _token_lock:
+        hit = _token_cache.get(token)
+        if hit is not None:
+            if hit[0] > now:
+                _token_cache.move_to_end(token)
+                return dict(hit[1])
+            _token_cache.pop(token, None)
+
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+    exp = claims.get("exp")
+    until = float(exp) if isinstance(exp, (int, float)) else now + TOKEN_CACHE_NO_EXP_TTL
+    with _token_lock:
+        _token_cache[token] = (until, claims)
+        while len(_token_cache) > TOKEN_CACHE_MAX:
+            _token_cache.popitem(last=False)
+    return dict(claims)
\ No newline at end of file
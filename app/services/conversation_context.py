@@ -0,0 +1,176 @@
+"""
+Sanrı konuşma bağlamı — run_sanri'nin LLM öncesi / sonrası DB işi.
+
+Okuma: tek skaler sorgu (premium, bugünkü sayaç, profil, hafıza özeti) + limit
+aşılmadıysa son-tur penceresi. Günlük sayaç istek yolunda `count_turn` ile
+atomik artırılır (UPSERT ... RETURNING) — limit kuyruğun durumuna bağlı değil.
+Yazma: hafıza satırları ve profil tek transaction'da — istek içinde değil,
+job_queue worker'ında ("sanri.save_turn"). Aynı transaction hafıza sıkıştırma
+işini de kuyruğa koyar.
+"""
+import json
+
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+
+from app.services import job_queue
+from app.services.memory_compaction import (
+    MEMORY_TOKEN_BUDGET,
+    NO_MEMORY,
+    RECENT_WINDOW,
+    compose_prompt_memory,
+    load_recent_rows,
+    schedule_compaction,
+)
+from app.services.profile_service import safe_json_load
+
+DAILY_FREE_LIMIT = 10
+MEMORY_LIMIT = RECENT_WINDOW
+
+
+def load_conversation_context(
+    db: Session,
+    user_id: int,
+    memory_limit: int = MEMORY_LIMIT,
+    free_limit: int = DAILY_FREE_LIMIT,
+) -> dict:
+    row = None
+    try:
+        row = db.execute(
+            text("""
+                SELECT
+                    (SELECT is_premium FROM users WHERE id = :uid) AS is_premium,
+                    (SELECT message_count
+                       FROM sanri_daily_counts
+                      WHERE user_id = :uid AND day = CURRENT_DATE) AS daily_count,
+                    (SELECT data
+                       FROM user_profiles
+                      WHERE user_id = :uid
+                      LIMIT 1) AS profile_data,
+                    (SELECT summary
+                       FROM user_memory_summaries
+                      WHERE user_id = :uid) AS memory_summary,
+                    (SELECT memory_line
+                       FROM user_memory_summaries
+                      WHERE user_id = :uid) AS memory_line
+            """),
+            {"uid": user_id},
+        ).mappings().first()
+    except Exception as e:
+        db.rollback()
+        print("SANRI CONTEXT LOAD ERROR =", repr(e))
+
+    is_premium = bool(row.get("is_premium")) if row else False
+    daily_count = int(row.get("daily_count") or 0) if row else 0
+    limited = not is_premium and daily_count >= free_limit
+
+    memory_text = NO_MEMORY
+    if not limited:
+        memory_text = compose_prompt_memory(
+            row.get("memory_summary") if row else None,
+            row.get("memory_line") if row else None,
+            load_recent_rows(db, user_id, limit=memory_limit),
+            budget=MEMORY_TOKEN_BUDGET,
+        )
+
+    return {
+        "is_premium": is_premium,
+        "daily_count": daily_count,
+        "limited": limited,
+        "profile": safe_json_load(row.get("profile_data")) if row else {},
+        "memory_text": memory_text,
+    }
+
+
+def count_turn(db: Session, user_id: int) -> int | None:
+    """Bugünkü sayacı 1 artırır ve yeni değeri döner; DB hatasında None (limit uygulanmaz)."""
+    try:
+        count = db.execute(
+            text("""
+                INSERT INTO sanri_daily_counts (user_id, day, message_count)
+                VALUES (:uid, CURRENT_DATE, 1)
+                ON CONFLICT (user_id, day)
+                DO UPDATE SET message_count = sanri_daily_counts.message_count + 1
+                RETURNING message_count
+            """),
+            {"uid": user_id},
+        ).scalar()
+        db.commit()
+        return int(count)
+    except Exception as e:
+        db.rollback()
+        print("SANRI DAILY COUNT ERROR =", repr(e))
+        return None
+
+
+def _write_turn(
+    db: Session,
+    user_id: int,
+    user_message: str,
+    ai_message: str,
+    runtime_profile: dict,
+) -> None:
+    db.execute(
+        text("""
+            INSERT INTO user_memory (user_id, type, content)
+            VALUES (:uid, 'user', :user_content), (:uid, 'ai', :ai_content)
+        """),
+        {
+            "uid": user_id,
+            "user_content": user_message[:4000],
+            "ai_content": ai_message[:4000],
+        },
+    )
+
+    profile_json = json.dumps(runtime_profile, ensure_ascii=False)
+    updated = db.execute(
+        text("""
+            UPDATE user_profiles
+            SET data = :data,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = :uid
+        """),
+        {"uid": user_id, "data": profile_json},
+    )
+    if not updated.rowcount:
+        db.execute(
+            text("""
+                INSERT INTO user_profiles (user_id, data, updated_at)
+                VALUES (:uid, :data, CURRENT_TIMESTAMP)
+            """),
+            {"uid": user_id, "data": profile_json},
+        )
+
+    schedule_compaction(user_id, db=db)
+
+
+@job_queue.register("sanri.save_turn")
+def _save_turn_job(db: Session, payload: dict) -> None:
+    _write_turn(
+        db,
+        int(payload["user_id"]),
+        payload.get("user_message") or "",
+        payload.get("ai_message") or "",
+        payload.get("runtime_profile") or {},
+    )
+
+
+def enqueue_conversation_turn(
+    user_id: int,
+    user_message: str,
+    ai_message: str,
+    runtime_profile: dict,
+) -> None:
+    """Yanıt döndükten sonra yazılacak turu kuyruğa koy (kendi session'ı ile)."""
+    try:
+        job_queue.enqueue(
+            "sanri.save_turn",
+            {
+                "user_id": user_id,
+                "user_message": user_message[:4000],
+                "ai_message": ai_message[:4000],
+                "runtime_profile": runtime_profile,
+            },
+        )
+    except Exception as e:
+        print("SANRI TURN ENQUEUE ERROR =", repr(e))
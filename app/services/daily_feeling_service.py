@@ -97,8 +97,7 @@ def _generate_feeling_text(agg):
     tags_str = ", ".join(agg["top_tags"][:3]) if agg["top_tags"] else "sessizlik"
 
     try:
-        from app.services.ai_service import get_client
-        client = get_client()
+        from app.services import llm_gateway
         model = (os.getenv("OPENAI_MODEL") or "gpt-4o-mini").strip()
 
         prompt = (
@@ -112,17 +111,15 @@ def _generate_feeling_text(agg):
             f"Tone: intuitive, personal, gently provocative but soft."
         )
 
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
+        raw = llm_gateway.chat_text_sync(
+            [
                 {"role": "system", "content": "Return JSON only. No markdown."},
                 {"role": "user", "content": prompt},
             ],
+            model=model,
             temperature=0.7,
             max_tokens=200,
         )
-
-        raw = (resp.choices[0].message.content or "").strip()
         raw = re.sub(r"^```(?:json)?\s*", "", raw)
         raw = re.sub(r"```\s*$", "", raw).strip()
         obj = json.loads(raw)
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app.models.content import DailyStream, WeeklySymbol
-from app.services.ai_service import get_client
+from app.services import llm_gateway
 import os
 
 
@@ -36,7 +36,6 @@ def generate_daily(lang: str) -> dict:
     """
     LLM’den JSON üretir.
     """
-    client = get_client()
     model = (os.getenv("OPENAI_MODEL") or "gpt-4o-mini").strip()
 
     prompt = (
@@ -54,17 +53,15 @@ def generate_daily(lang: str) -> dict:
         "No markdown. No backticks.\n"
     )
 
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[
+    raw = llm_gateway.chat_text_sync(
+        [
             {"role": "system", "content": "Return JSON only."},
             {"role": "user", "content": prompt},
         ],
+        model=model,
         temperature=0.7,
         max_tokens=900,
     )
-
-    raw = (completion.choices[0].message.content or "").strip()
     j = ensure_json_obj(raw)
 
     # normalize
@@ -76,7 +73,6 @@ def generate_daily(lang: str) -> dict:
     return {"title": title, "short": short, "message": message, "tags": tags}
 
 def generate_weekly(lang: str) -> dict:
-    client = get_client()
     model = (os.getenv("OPENAI_MODEL") or "gpt-4o-mini").strip()
 
     prompt = (
@@ -94,17 +90,15 @@ def generate_weekly(lang: str) -> dict:
         "No markdown. No backticks.\n"
     )
 
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[
+    raw = llm_gateway.chat_text_sync(
+        [
             {"role": "system", "content": "Return JSON only."},
             {"role": "user", "content": prompt},
         ],
+        model=model,
         temperature=0.75,
         max_tokens=1100,
     )
-
-    raw = (completion.choices[0].message.content or "").strip()
     j = ensure_json_obj(raw)
 
     title = str(j.get("title") or "").strip() or ("Haftanın Sembolü" if lang=="tr" else "Symbol of the Week")
@@ -0,0 +1,30 @@
+"""
+email_norm kolonu — satın alma / havale eşleşmelerinde indeksli e-posta araması.
+
+`LOWER(TRIM(email)) = :em` düz indeks kullanamaz; her kontrol tabloyu tarar.
+Tablolar bunun yerine yazımda `email_norm = LOWER(TRIM(:email))` ile doldurulan
+saklı bir kolon taşır ve sorgular `email_norm = :em` ile indekse iner.
+Parametre tarafı her zaman `.strip().lower()` edilmiş olmalı.
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.db import engine
+
+
+def ensure_email_norm_column(conn: Connection, table: str) -> None:
+    """Kolonu ekler ve boş kalan geçmiş satırları doldurur (idempotent)."""
+    if engine.dialect.name == "postgresql":
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS email_norm VARCHAR(255)"))
+    else:
+        cols = {r[1] for r in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if "email_norm" not in cols:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN email_norm VARCHAR(255)"))
+    conn.execute(
+        text(f"""
+            UPDATE {table} SET email_norm = LOWER(TRIM(email))
+            WHERE email_norm IS NULL AND email IS NOT NULL
+        """)
+    )
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from app.services.job_queue import PermanentJobError, register as register_job
+
 logger = logging.getLogger("email")
 
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -280,3 +282,34 @@ def send_admin_bank_transfer_notification(
   <p style="margin:20px 0 0;"><a href="{safe(admin_link)}" style="color:#c4a7ff;">Admin — Banka ödemeleri</a></p>
 </body></html>"""
     return send_email(to_addr, subj, body)
+
+
+# ----------------------------------------------------
+# job_queue handlers — istek içinde değil, worker'da gönderim
+# ----------------------------------------------------
+
+def email_configured() -> bool:
+    return bool(RESEND_API_KEY or (SMTP_USER and SMTP_PASS))
+
+
+def _require_sent(ok: bool) -> None:
+    if ok:
+        return
+    if not email_configured():
+        raise PermanentJobError("no email provider configured")
+    raise RuntimeError("email send failed")
+
+
+@register_job("email.send")
+def _send_email_job(db: Session, payload: dict) -> None:
+    _require_sent(send_email(payload["to"], payload["subject"], payload["html_body"]))
+
+
+@register_job("email.purchase_confirmation")
+def _purchase_confirmation_job(db: Session, payload: dict) -> None:
+    _require_sent(send_purchase_confirmation(payload["to"], payload["content_id"]))
+
+
+@register_job("email.admin_bank_transfer")
+def _admin_bank_transfer_job(db: Session, payload: dict) -> None:
+    _require_sent(send_admin_bank_transfer_notification(**payload))
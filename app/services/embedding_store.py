@@ -0,0 +1,348 @@
+"""
+Embedding deposu — metin hash'i → vektör, toplu (batched) API çağrılarıyla.
+
+Anahtar: sha256(model, boşlukları sadeleştirilmiş metin). Katmanlar:
+  1. süreç içi LRU (float32 ndarray, SANRI_EMBED_CACHE_MAX_ENTRIES)
+  2. embedding_cache tablosu (float32 bayt) — restart ve worker'lar arası isabet
+
+Önbellekte olmayan metinler model başına açık bir batch'e düşer; batch
+BATCH_WINDOW_MS dolunca ya da BATCH_MAX girdiye ulaşınca tek bir
+`embeddings.create(input=[...])` çağrısıyla çözülür. Aynı metni bekleyen
+eşzamanlı istekler aynı future'ı paylaşır (tek API girdisi).
+
+Async yol event loop thread'inde çalışır; batch/in-flight tabloları yalnızca
+oradan değiştirilir. Event loop dışındaki kod (scheduler job'ları, sync
+handler'lar) `embed_sync` / `embed_many_sync` kullanır — batch'siz, aynı
+önbellek katmanlarıyla. Dönen vektörler salt okunurdur; değiştirmeden önce
+kopyalayın.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal
+from app.models.embedding_cache import EmbeddingCache
+from app.services import llm_gateway
+
+log = logging.getLogger("sanri.embeddings")
+
+DEFAULT_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small").strip()
+MAX_ENTRIES = int(os.getenv("SANRI_EMBED_CACHE_MAX_ENTRIES", "4096"))
+TTL_SEC = int(os.getenv("SANRI_EMBED_CACHE_TTL", str(30 * 24 * 3600)))
+DB_TIER_ENABLED = os.getenv("SANRI_EMBED_CACHE_DB", "1").strip() not in ("0", "false", "")
+BATCH_WINDOW_SEC = float(os.getenv("SANRI_EMBED_BATCH_WINDOW_MS", "15")) / 1000.0
+BATCH_MAX = int(os.getenv("SANRI_EMBED_BATCH_MAX", "64"))
+
+
+def clean_text(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+
+def text_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{clean_text(text)}".encode("utf-8")).hexdigest()
+
+
+def _frozen(values: Iterable[float]) -> np.ndarray:
+    vec = np.asarray(values, dtype=np.float32)
+    vec.flags.writeable = False
+    return vec
+
+
+# ----------------------------------------------------
+# stats
+# ----------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "api_calls": 0,
+    "api_texts": 0,
+    "evictions": 0,
+}
+
+
+def _bump(field: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[field] += n
+
+
+def get_stats() -> dict:
+    """/health/embeddings için."""
+    with _stats_lock:
+        s = dict(_stats)
+    hits = s["memory_hits"] + s["db_hits"] + s["coalesced"]
+    total = hits + s["misses"]
+    return {
+        "entries": len(_memory),
+        "max_entries": MAX_ENTRIES,
+        "db_tier": DB_TIER_ENABLED,
+        "batch_window_ms": BATCH_WINDOW_SEC * 1000,
+        "avg_batch_size": round(s["api_texts"] / s["api_calls"], 2) if s["api_calls"] else None,
+        "hit_rate": round(hits / total, 4) if total else None,
+        **s,
+    }
+
+
+# ----------------------------------------------------
+# tier 1 — in-process LRU
+# ----------------------------------------------------
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+
+def _mem_get(key: str) -> Optional[np.ndarray]:
+    with _lock:
+        vec = _memory.get(key)
+        if vec is not None:
+            _memory.move_to_end(key)
+        return vec
+
+
+def _mem_set(key: str, vec: np.ndarray) -> None:
+    with _lock:
+        _memory[key] = vec
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_ENTRIES:
+            _memory.popitem(last=False)
+            _bump("evictions")
+
+
+# ----------------------------------------------------
+# tier 2 — DB
+# ----------------------------------------------------
+
+def _db_get_many(keys: list[str]) -> dict[str, np.ndarray]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(EmbeddingCache)
+            .filter(
+                EmbeddingCache.text_hash.in_(keys),
+                EmbeddingCache.expires_at > datetime.utcnow(),
+            )
+            .all()
+        )
+        return {r.text_hash: _frozen(np.frombuffer(r.vector, dtype="<f4")) for r in rows}
+    except Exception as exc:
+        db.rollback()
+        log.warning("embedding cache DB read failed: %s", exc)
+        return {}
+    finally:
+        db.close()
+
+
+def _db_set_many(model: str, vectors: dict[str, np.ndarray]) -> None:
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for key, vec in vectors.items():
+            db.merge(
+                EmbeddingCache(
+                    text_hash=key,
+                    model=model,
+                    dim=int(vec.size),
+                    vector=np.asarray(vec, dtype="<f4").tobytes(),
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=TTL_SEC),
+                )
+            )
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        log.warning("embedding cache DB write failed: %s", exc)
+    finally:
+        db.close()
+
+
+def purge_expired() -> int:
+    """Süresi dolmuş DB kayıtlarını sil (scheduler job'ı)."""
+    db = SessionLocal()
+    try:
+        n = (
+            db.query(EmbeddingCache)
+            .filter(EmbeddingCache.expires_at <= datetime.utcnow())
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return int(n or 0)
+    finally:
+        db.close()
+
+
+def _check_count(vectors: list, texts: list) -> None:
+    """Sağlayıcı eksik vektör dönerse zip sessizce kısalır; bekleyenler asılı kalmasın."""
+    if len(vectors) != len(texts):
+        raise RuntimeError(f"embedding provider returned {len(vectors)} vectors for {len(texts)} texts")
+
+
+# ----------------------------------------------------
+# batching (event loop thread)
+# ----------------------------------------------------
+
+class _Batch:
+    def __init__(self, model: str, loop: asyncio.AbstractEventLoop) -> None:
+        self.model = model
+        self.loop = loop
+        self.items: dict[str, tuple[str, asyncio.Future]] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+_batches: dict[str, _Batch] = {}
+_inflight: dict[str, asyncio.Future] = {}
+_flushing: set[asyncio.Task] = set()
+
+
+def _enqueue(model: str, key: str, text: str) -> asyncio.Future:
+    loop = asyncio.get_running_loop()
+    batch = _batches.get(model)
+    if batch is None or batch.loop is not loop:
+        batch = _batches[model] = _Batch(model, loop)
+        batch.timer = loop.call_later(BATCH_WINDOW_SEC, _start_flush, batch)
+    fut = loop.create_future()
+    batch.items[key] = (text, fut)
+    _inflight[key] = fut
+    if len(batch.items) >= BATCH_MAX:
+        batch.timer.cancel()
+        _start_flush(batch)
+    return fut
+
+
+def _start_flush(batch: _Batch) -> None:
+    if _batches.get(batch.model) is batch:
+        del _batches[batch.model]
+    task = batch.loop.create_task(_flush(batch))
+    _flushing.add(task)
+    task.add_done_callback(_flushing.discard)
+
+
+async def _flush(batch: _Batch) -> None:
+    items = batch.items
+    try:
+        found = await run_in_threadpool(_db_get_many, list(items)) if DB_TIER_ENABLED else {}
+        _bump("db_hits", len(found))
+        missing = [k for k in items if k not in found]
+        fresh: dict[str, np.ndarray] = {}
+        if missing:
+            _bump("misses", len(missing))
+            _bump("api_calls")
+            _bump("api_texts", len(missing))
+            vectors = await llm_gateway.embed_many([items[k][0] for k in missing], model=batch.model)
+            _check_count(vectors, missing)
+            fresh = {k: _frozen(v) for k, v in zip(missing, vectors)}
+        for key, vec in {**found, **fresh}.items():
+            _mem_set(key, vec)
+            fut = items[key][1]
+            if not fut.done():
+                fut.set_result(vec)
+        unresolved = [fut for _, fut in items.values() if not fut.done()]
+        if unresolved:
+            raise RuntimeError(f"embedding batch left {len(unresolved)} texts unresolved")
+    except Exception as exc:
+        for _, fut in items.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        return
+    finally:
+        for key, (_, fut) in items.items():
+            if _inflight.get(key) is fut:
+                del _inflight[key]
+
+    if fresh and DB_TIER_ENABLED:
+        await run_in_threadpool(_db_set_many, batch.model, fresh)
+
+
+# ----------------------------------------------------
+# public API
+# ----------------------------------------------------
+
+async def embed_many(texts: list[str], *, model: Optional[str] = None) -> list[Optional[np.ndarray]]:
+    """Her metin için vektör (boş metin → None); sıra korunur."""
+    model = model or DEFAULT_MODEL
+    out: list[Optional[np.ndarray]] = [None] * len(texts)
+    waiting: dict[str, asyncio.Future] = {}
+    slots: list[tuple[int, str]] = []
+    for i, raw in enumerate(texts):
+        text = clean_text(raw)
+        if not text:
+            continue
+        key = text_key(model, text)
+        vec = _mem_get(key)
+        if vec is not None:
+            _bump("memory_hits")
+            out[i] = vec
+            continue
+        if key not in waiting:
+            fut = _inflight.get(key)
+            if fut is not None:
+                _bump("coalesced")
+            else:
+                fut = _enqueue(model, key, text)
+            waiting[key] = fut
+        slots.append((i, key))
+
+    for i, key in slots:
+        # shield: bir isteğin iptali paylaşılan future'ı diğerleri için iptal etmesin
+        out[i] = await asyncio.shield(waiting[key])
+    return out
+
+
+async def embed(text: str, *, model: Optional[str] = None) -> Optional[np.ndarray]:
+    return (await embed_many([text], model=model))[0]
+
+
+def embed_many_sync(texts: list[str], *, model: Optional[str] = None) -> list[Optional[np.ndarray]]:
+    model = model or DEFAULT_MODEL
+    out: list[Optional[np.ndarray]] = [None] * len(texts)
+    todo: dict[str, str] = {}
+    slots: list[tuple[int, str]] = []
+    for i, raw in enumerate(texts):
+        text = clean_text(raw)
+        if not text:
+            continue
+        key = text_key(model, text)
+        vec = _mem_get(key)
+        if vec is not None:
+            _bump("memory_hits")
+            out[i] = vec
+            continue
+        todo[key] = text
+        slots.append((i, key))
+
+    if todo:
+        found = _db_get_many(list(todo)) if DB_TIER_ENABLED else {}
+        _bump("db_hits", len(found))
+        missing = [k for k in todo if k not in found]
+        fresh: dict[str, np.ndarray] = {}
+        if missing:
+            _bump("misses", len(missing))
+            _bump("api_calls")
+            _bump("api_texts", len(missing))
+            vectors = llm_gateway.embed_many_sync([todo[k] for k in missing], model=model)
+            _check_count(vectors, missing)
+            fresh = {k: _frozen(v) for k, v in zip(missing, vectors)}
+        for key, vec in {**found, **fresh}.items():
+            _mem_set(key, vec)
+        if fresh and DB_TIER_ENABLED:
+            _db_set_many(model, fresh)
+        resolved = {**found, **fresh}
+        for i, key in slots:
+            out[i] = resolved.get(key)
+    return out
+
+
+def embed_sync(text: str, *, model: Optional[str] = None) -> Optional[np.ndarray]:
+    return embed_many_sync([text], model=model)[0]
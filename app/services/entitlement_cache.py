@@ -0,0 +1,269 @@
+"""
+Erişim önbelleği — içerik görüntülemelerinde tekrar eden erişim sorgularını keser.
+
+İki tür kayıt tutulur (süreç içi, TTL'li):
+
+- "user:<id>": entitlements.check_access manifesti (content_access hariç).
+- "fp:<device_fp>", "email:<e>", "uid:<id>": kimlik başına erişim kümesi —
+  tamamlanmış shopier_purchases satırları (content_id → en yeni satır) ve
+  aktif havale geçici kilitleri (content_id → expires_at ile).
+
+Boş sonuçlar NEGATIVE_TTL_SEC kadar tutulur; satın alma başka bir süreçte
+yazılsa bile "kilitli" yanıtı uzun süre yapışmaz. Yazım yolları
+`invalidate_after_commit` ile ilgili anahtarları commit sonrası düşürür
+(job_queue outbox'ı ile aynı after_commit deseni).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.db import engine
+
+log = logging.getLogger("sanri.entitlements")
+
+TTL_SEC = float(os.getenv("SANRI_ENTITLEMENT_CACHE_TTL", "60"))
+NEGATIVE_TTL_SEC = float(os.getenv("SANRI_ENTITLEMENT_CACHE_NEGATIVE_TTL", "5"))
+MAX_ENTRIES = int(os.getenv("SANRI_ENTITLEMENT_CACHE_MAX_ENTRIES", "20000"))
+
+_MISSING = object()
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _norm_email(email: Optional[str]) -> Optional[str]:
+    e = (email or "").strip().lower()
+    return e if "@" in e else None
+
+
+def _norm_fp(device_fp: Optional[str]) -> Optional[str]:
+    fp = (device_fp or "").strip()
+    return fp or None
+
+
+def identity_keys(
+    device_fp: Optional[str] = None,
+    email: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> list[str]:
+    keys = []
+    if _norm_fp(device_fp):
+        keys.append(f"fp:{_norm_fp(device_fp)}")
+    if _norm_email(email):
+        keys.append(f"email:{_norm_email(email)}")
+    if user_id:
+        keys.append(f"uid:{int(user_id)}")
+        keys.append(f"user:{int(user_id)}")
+    return keys
+
+
+# ----------------------------------------------------
+# store
+# ----------------------------------------------------
+
+def get(key: str) -> Any:
+    now = time.monotonic()
+    with _lock:
+        hit = _entries.get(key)
+        if hit is None or hit[0] <= now:
+            if hit is not None:
+                _entries.pop(key, None)
+            _stats["misses"] += 1
+            return _MISSING
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return hit[1]
+
+
+def put(key: str, value: Any, ttl: float) -> None:
+    if ttl <= 0:
+        return
+    with _lock:
+        _entries[key] = (time.monotonic() + ttl, value)
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def get_or_load(key: str, load: Callable[[], Any], ttl_of: Callable[[Any], float]) -> Any:
+    value = get(key)
+    if value is _MISSING:
+        value = load()
+        put(key, value, ttl_of(value))
+    return value
+
+
+def invalidate(keys: Iterable[str]) -> None:
+    with _lock:
+        for key in keys:
+            if _entries.pop(key, None) is not None:
+                _stats["invalidations"] += 1
+
+
+def invalidate_user(user_id: Optional[int]) -> None:
+    if user_id:
+        invalidate(identity_keys(user_id=user_id))
+
+
+_PENDING_KEY = "_entitlement_invalidations"
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    keys = session.info.pop(_PENDING_KEY, None)
+    if keys:
+        invalidate(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def invalidate_after_commit(
+    db: Session,
+    device_fp: Optional[str] = None,
+    email: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> None:
+    """Yazımla aynı transaction'da çağrılır; anahtarlar commit'ten sonra düşer."""
+    keys = identity_keys(device_fp=device_fp, email=email, user_id=user_id)
+    if keys:
+        db.info.setdefault(_PENDING_KEY, set()).update(keys)
+
+
+def get_cache_stats() -> dict:
+    with _lock:
+        return {"entries": len(_entries), "ttl_sec": TTL_SEC, **_stats}
+
+
+# ----------------------------------------------------
+# identity access sets (shopier_purchases + havale geçici kilitleri)
+# ----------------------------------------------------
+
+def _aware(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _load_identity(db: Session, kind: str, value: Any) -> dict:
+    purchase_where = {
+        "fp": "device_fp = :v",
+        "email": "email_norm = :v",
+        "uid": "user_id = :v",
+    }[kind]
+    purchases: dict[str, tuple] = {}
+    for r in db.execute(
+        text(f"""
+            SELECT content_id, amount, currency, created_at
+            FROM shopier_purchases
+            WHERE status = 'completed' AND {purchase_where}
+            ORDER BY created_at
+        """),
+        {"v": value},
+    ):
+        purchases[r[0]] = tuple(r)  # en yeni satır kalır
+
+    temp: dict[str, list] = {}
+    temp_where = {
+        "fp": "t.device_fp IS NOT NULL AND TRIM(t.device_fp) != '' AND t.device_fp = :v",
+        "email": "t.email_norm = :v",
+    }.get(kind)
+    if temp_where:
+        not_revoked = "t.revoked = false" if engine.dialect.name == "postgresql" else "t.revoked = 0"
+        for r in db.execute(
+            text(f"""
+                SELECT t.content_id, r.amount, 'TRY' AS currency, t.created_at, t.expires_at
+                FROM bank_transfer_temp_unlocks t
+                INNER JOIN bank_transfer_requests r ON r.id = t.request_id
+                WHERE {not_revoked} AND {temp_where}
+            """),
+            {"v": value},
+        ):
+            exp = _aware(r[4])
+            if exp is not None and exp > datetime.now(timezone.utc):
+                temp.setdefault(r[0], []).append((tuple(r[:4]), exp))
+
+    return {"purchases": purchases, "temp": temp}
+
+
+def _identity_ttl(access: dict) -> float:
+    if not access["purchases"] and not access["temp"]:
+        return NEGATIVE_TTL_SEC
+    ttl = TTL_SEC
+    for rows in access["temp"].values():
+        for _, exp in rows:
+            ttl = min(ttl, (exp - datetime.now(timezone.utc)).total_seconds())
+    return ttl
+
+
+def identity_access(db: Session, kind: str, value: Any) -> dict:
+    return get_or_load(f"{kind}:{value}", lambda: _load_identity(db, kind, value), _identity_ttl)
+
+
+def find_unlocks(
+    db: Session,
+    content_ids: Iterable[str],
+    device_fp: Optional[str] = None,
+    emails: Iterable[Optional[str]] = (),
+    user_id: Optional[int] = None,
+) -> dict[str, Optional[tuple]]:
+    """
+    content_id → (content_id, amount, currency, created_at) ya da None. Önce
+    tamamlanmış satın alma, yoksa aktif geçici kilit; birden çok kimlikte en
+    yenisi. Kimlik başına tek (önbellekli) küme okunur, içerik sayısından bağımsız.
+    """
+    content_ids = list(dict.fromkeys(content_ids))
+    idents: list[tuple[str, Any]] = []
+    if _norm_fp(device_fp):
+        idents.append(("fp", _norm_fp(device_fp)))
+    for e in emails:
+        if _norm_email(e) and ("email", _norm_email(e)) not in idents:
+            idents.append(("email", _norm_email(e)))
+    if user_id:
+        idents.append(("uid", int(user_id)))
+    if not idents:
+        return {cid: None for cid in content_ids}
+
+    sets = [identity_access(db, kind, value) for kind, value in idents]
+    now = datetime.now(timezone.utc)
+
+    def _latest(rows: list[tuple]) -> Optional[tuple]:
+        rows = [r for r in rows if r is not None]
+        return max(rows, key=lambda r: _aware(r[3]) or datetime.min.replace(tzinfo=timezone.utc)) if rows else None
+
+    out: dict[str, Optional[tuple]] = {}
+    for cid in content_ids:
+        row = _latest([s["purchases"].get(cid) for s in sets])
+        if row is None:
+            row = _latest([r for s in sets for r, exp in s["temp"].get(cid, []) if exp > now])
+        out[cid] = row
+    return out
+
+
+def find_unlock(
+    db: Session,
+    content_id: str,
+    device_fp: Optional[str] = None,
+    emails: Iterable[Optional[str]] = (),
+    user_id: Optional[int] = None,
+) -> Optional[tuple]:
+    return find_unlocks(db, [content_id], device_fp=device_fp, emails=emails, user_id=user_id)[content_id]
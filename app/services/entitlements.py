@@ -20,6 +20,7 @@ from sqlalchemy.orm import Session
 
 from app.models.billing import UserEntitlement, ContentUnlock, Subscription
 from app.models.user import User
+from app.services import entitlement_cache, user_cache
 
 logger = logging.getLogger("entitlements")
 
@@ -97,6 +98,7 @@ def grant_entitlement(
             existing.purchase_id = purchase_id
         db.commit()
         db.refresh(existing)
+        entitlement_cache.invalidate_user(user_id)
         return existing
 
     ent = UserEntitlement(
@@ -114,6 +116,7 @@ def grant_entitlement(
     db.refresh(ent)
 
     _sync_user_premium_flag(db, user_id)
+    entitlement_cache.invalidate_user(user_id)
 
     return ent
 
@@ -140,6 +143,7 @@ def revoke_entitlement(
 
     db.commit()
     _sync_user_premium_flag(db, user_id)
+    entitlement_cache.invalidate_user(user_id)
 
 
 def revoke_subscription_entitlements(db: Session, user_id: int, stripe_subscription_id: str):
@@ -159,13 +163,48 @@ def revoke_subscription_entitlements(db: Session, user_id: int, stripe_subscript
         ent.revoked_at = now
     db.commit()
     _sync_user_premium_flag(db, user_id)
+    entitlement_cache.invalidate_user(user_id)
 
 
 def check_access(db: Session, user_id: int, content_id: Optional[str] = None) -> dict:
     """
     The single source of truth for user access.
     Returns a full access manifest consumed by the frontend.
+
+    Manifest kullanıcı başına entitlement_cache'te tutulur; içerik kontrolü
+    önbellekteki küme üzerinde sözlük araması.
     """
+    manifest, unlocked, has_access_all = entitlement_cache.get_or_load(
+        f"user:{int(user_id)}",
+        lambda: _load_access(db, user_id),
+        _access_ttl,
+    )
+
+    content_access = None
+    if content_id:
+        if has_access_all:
+            content_access = {"has_access": True, "reason": "premium"}
+        elif content_id in unlocked:
+            content_access = {"has_access": True, "reason": "unlocked"}
+        else:
+            content_access = {"has_access": False, "reason": "locked"}
+
+    return {**manifest, "content_access": content_access}
+
+
+def _access_ttl(cached: tuple) -> float:
+    manifest, _, _ = cached
+    if not manifest["entitlements"]:
+        return entitlement_cache.NEGATIVE_TTL_SEC
+    ttl = entitlement_cache.TTL_SEC
+    now = datetime.now(timezone.utc)
+    for e in manifest["entitlements"]:
+        if e["expires_at"]:
+            ttl = min(ttl, (datetime.fromisoformat(e["expires_at"]) - now).total_seconds())
+    return ttl
+
+
+def _load_access(db: Session, user_id: int) -> tuple[dict, frozenset, bool]:
     now = datetime.now(timezone.utc)
 
     user = db.query(User).filter(User.id == user_id).first()
@@ -205,15 +244,6 @@ def check_access(db: Session, user_id: int, content_id: Optional[str] = None) ->
             if len(parts) == 3:
                 unlocked_content_ids.add(parts[2])
 
-    content_access = None
-    if content_id:
-        if has_premium or has_weekly:
-            content_access = {"has_access": True, "reason": "premium"}
-        elif content_id in unlocked_content_ids:
-            content_access = {"has_access": True, "reason": "unlocked"}
-        else:
-            content_access = {"has_access": False, "reason": "locked"}
-
     active_sub = (
         db.query(Subscription)
         .filter(
@@ -231,7 +261,7 @@ def check_access(db: Session, user_id: int, content_id: Optional[str] = None) ->
             if premium_until is None or exp > premium_until:
                 premium_until = exp
 
-    return {
+    manifest = {
         "is_premium": has_premium or has_weekly,
         "plan": "premium" if has_premium else "weekly" if has_weekly else "free",
         "premium_until": _iso_utc(premium_until),
@@ -254,8 +284,8 @@ def check_access(db: Session, user_id: int, content_id: Optional[str] = None) ->
             "current_period_end": active_sub.current_period_end.isoformat() if active_sub.current_period_end else None,
             "cancel_at_period_end": active_sub.cancel_at_period_end,
         } if active_sub else None,
-        "content_access": content_access,
     }
+    return manifest, frozenset(unlocked_content_ids), has_premium or has_weekly
 
 
 def sync_external_entitlements(
@@ -305,6 +335,7 @@ def sync_external_entitlements(
 
     db.commit()
     _sync_user_premium_flag(db, user_id)
+    entitlement_cache.invalidate_user(user_id)
 
 
 def grant_content_unlock(
@@ -362,3 +393,4 @@ def _sync_user_premium_flag(db: Session, user_id: int):
             user.plan = "free"
             user.premium_source = None
         db.commit()
+        user_cache.invalidate_user(user_id)
@@ -0,0 +1,199 @@
+"""
+events tablosunun tipli kolonları — session_id, screen, duration_sec.
+
+Oturum analitiği (admin_sessions) bu anahtarları meta JSON'undan her satırda
+parse etmek yerine indeksli kolonlardan okur.
+
+- Yazım: /events/log satırı `typed_columns(action, meta)` ile doldurur.
+- Şema: `ensure_event_columns` eksik kolon/indeksleri ekler (göç 11).
+- Geçmiş satırlar: `backfill_typed_columns` zamanlayıcıdan (lider) çağrılır,
+  created_at pencereleri halinde ilerler; imleç rollup_state'te tutulur.
+  İmleç "şimdi"ye yetiştiğinde (yeni satırlar zaten tipli yazılıyor) durum
+  BACKFILL_DONE olarak işaretlenir ve iş kendini takvimden çıkarır.
+
+Yedek anahtarlar eski sorguların okuduğu yerlerle sınırlıdır: `page` yalnızca
+screen_view/page_view'da ekran adıdır, `seconds` yalnızca time_spent'in
+süresidir (heartbeat `duration_sec` taşır).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db import engine
+from app.models.analytics_rollup import RollupState
+from app.services import migrations
+
+log = logging.getLogger("sanri.events")
+
+BACKFILL_WINDOW_HOURS = int(os.getenv("SANRI_EVENTS_BACKFILL_WINDOW_HOURS", "6"))
+BACKFILL_TIME_BUDGET = float(os.getenv("SANRI_EVENTS_BACKFILL_TIME_BUDGET", "40"))
+
+# rollup_state.last_id burada epoch dakikası olarak tutulur (int4 sınırına takılmaz)
+BACKFILL_STATE = "events_typed_columns"
+
+# imleç için "tamamlandı" değeri (int4 üst sınırı — hiçbir dakika buna ulaşmaz)
+BACKFILL_DONE = 2**31 - 1
+
+# eski meta->> sorgularının yedek anahtarları okuduğu action'lar
+PAGE_FALLBACK_ACTIONS = frozenset({"screen_view", "page_view"})
+SECONDS_ACTIONS = frozenset({"time_spent"})
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_str(value: Any, limit: int) -> Optional[str]:
+    if value is None:
+        return None
+    s = str(value).strip()
+    return s[:limit] or None
+
+
+def typed_columns(action: Optional[str], meta: Any) -> dict:
+    if isinstance(meta, str):
+        try:
+            meta = json.loads(meta)
+        except ValueError:
+            meta = None
+    if not isinstance(meta, dict):
+        return {"session_id": None, "screen": None, "duration_sec": None}
+    screen = meta.get("screen")
+    if screen is None and action in PAGE_FALLBACK_ACTIONS:
+        screen = meta.get("page")
+    duration_key = "seconds" if action in SECONDS_ACTIONS else "duration_sec"
+    return {
+        "session_id": _as_str(meta.get("session_id"), 128),
+        "screen": _as_str(screen, 255),
+        "duration_sec": _as_float(meta.get(duration_key)),
+    }
+
+
+# ----------------------------------------------------
+# schema
+# ----------------------------------------------------
+
+@migrations.register(11, "events_typed_columns")
+def ensure_event_columns() -> None:
+    is_pg = engine.dialect.name == "postgresql"
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text(
+                "SELECT 1 FROM information_schema.tables WHERE table_name = 'events'"
+                if is_pg
+                else "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events'"
+            )
+        ).first()
+        if not exists:
+            return  # create_all tabloyu kolonlarıyla birlikte kurar
+
+        for col, typ in (
+            ("session_id", "VARCHAR(128)"),
+            ("screen", "VARCHAR(255)"),
+            ("duration_sec", "DOUBLE PRECISION" if is_pg else "REAL"),
+        ):
+            if is_pg:
+                conn.execute(text(f"ALTER TABLE events ADD COLUMN IF NOT EXISTS {col} {typ}"))
+            else:
+                cols = {r[1] for r in conn.execute(text("PRAGMA table_info(events)"))}
+                if col not in cols:
+                    conn.execute(text(f"ALTER TABLE events ADD COLUMN {col} {typ}"))
+
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_events_action_created ON events (action, created_at)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_events_created ON events (created_at)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_events_user_created ON events (user_id, created_at)"))
+
+
+# ----------------------------------------------------
+# backfill
+# ----------------------------------------------------
+
+def _to_minutes(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int((ts - _EPOCH).total_seconds() // 60)
+
+
+def _from_minutes(minutes: int) -> datetime:
+    return _EPOCH + timedelta(minutes=minutes)
+
+
+def backfill_done(db: Session) -> bool:
+    state = db.get(RollupState, BACKFILL_STATE)
+    return state is not None and state.last_id >= BACKFILL_DONE
+
+
+def backfill_typed_columns(db: Session) -> int:
+    """Tipli kolonları boş, meta'sı dolu satırları pencere pencere doldurur. Güncellenen satır sayısını döner."""
+    started = time.monotonic()
+    state = db.get(RollupState, BACKFILL_STATE)
+    if state is not None and state.last_id >= BACKFILL_DONE:
+        return 0
+    if state is None:
+        oldest = db.execute(text("SELECT MIN(created_at) FROM events")).scalar()
+        if oldest is None:
+            # tablo boş: bundan sonraki her satır yazımda tipli gelir
+            db.add(RollupState(name=BACKFILL_STATE, last_id=BACKFILL_DONE))
+            db.commit()
+            return 0
+        if isinstance(oldest, str):
+            oldest = datetime.fromisoformat(oldest)
+        state = RollupState(name=BACKFILL_STATE, last_id=_to_minutes(oldest))
+        db.add(state)
+        db.commit()
+
+    now_min = _to_minutes(datetime.now(timezone.utc))
+    step = BACKFILL_WINDOW_HOURS * 60
+    updated = 0
+
+    while state.last_id < now_min and time.monotonic() - started < BACKFILL_TIME_BUDGET:
+        lo = state.last_id
+        hi = min(lo + step, now_min)
+        rows = db.execute(
+            text("""
+                SELECT id, action, meta FROM events
+                WHERE created_at >= :lo AND created_at < :hi
+                  AND meta IS NOT NULL
+                  AND session_id IS NULL AND screen IS NULL AND duration_sec IS NULL
+            """),
+            {"lo": _from_minutes(lo), "hi": _from_minutes(hi)},
+        ).all()
+
+        params = []
+        for event_id, action, meta in rows:
+            cols = typed_columns(action, meta)
+            if any(v is not None for v in cols.values()):
+                params.append({"id": event_id, **cols})
+        if params:
+            db.execute(
+                text("""
+                    UPDATE events
+                    SET session_id = :session_id, screen = :screen, duration_sec = :duration_sec
+                    WHERE id = :id
+                """),
+                params,
+            )
+        state.last_id = hi
+        db.commit()
+        updated += len(params)
+
+    if updated:
+        log.info("events typed-column backfill: %d rows, cursor=%s", updated, _from_minutes(state.last_id))
+    if state.last_id >= now_min:
+        state.last_id = BACKFILL_DONE
+        db.commit()
+        log.info("events typed-column backfill complete")
+    return updated
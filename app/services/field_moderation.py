@@ -6,10 +6,12 @@ import os
 import re
 from typing import Literal
 
-from openai import OpenAI
+from app.services import llm_cache, llm_gateway
 
 Kind = Literal["share", "echo"]
 
+MODERATION_CACHE_TTL = 24 * 3600
+
 
 def _heuristic_block(text: str, kind: Kind) -> tuple[bool, str]:
     t = (text or "").strip()
@@ -44,27 +46,7 @@ def _heuristic_block(text: str, kind: Kind) -> tuple[bool, str]:
     return False, ""
 
 
-def _client() -> OpenAI | None:
-    key = (os.getenv("OPENAI_API_KEY") or "").strip()
-    if not key:
-        return None
-    return OpenAI(api_key=key)
-
-
-def moderate_field_text(text: str, kind: Kind, frequency_hz: int | None = None) -> tuple[bool, str, str | None]:
-    """
-    Returns (allowed, user_message, energy_feel).
-    energy_feel only filled for kind=='share' when AI runs.
-    """
-    blocked, reason = _heuristic_block(text, kind)
-    if blocked:
-        return False, reason, None
-
-    client = _client()
-    if not client:
-        return True, "", "nötr bir titreşim" if kind == "share" else None
-
-    model = os.getenv("OPENAI_MODEL", "gpt-4.1-mini").strip()
+def _moderation_messages(text: str, kind: Kind, frequency_hz: int | None) -> list[dict]:
     if kind == "share":
         sys = """Sen içerik moderatörüsün. Türkçe kısa niyet metinlerini değerlendir.
 Sadece geçerli JSON döndür (başka metin yok):
@@ -81,25 +63,64 @@ Sadece geçerli JSON döndür:
  "reason_tr": "reddedildiyse kısa Türkçe sebep, yoksa boş string"}
 Yankı derin, kısa ve saygılı olmalı; hakaret, reklam, boş tekrar yasak."""
         user = f"Yankı metni:\n{text.strip()[:400]}"
+    return [{"role": "system", "content": sys}, {"role": "user", "content": user}]
+
+
+def _parse_verdict(raw: str, kind: Kind) -> tuple[bool, str, str | None]:
+    data = json.loads(raw) if raw.startswith("{") else {}
+    if not data:
+        m = re.search(r"\{[\s\S]*\}", raw)
+        if m:
+            data = json.loads(m.group(0))
+    allow = bool(data.get("allow", True)) and not data.get("spam") and not data.get("low_quality")
+    reason = (data.get("reason_tr") or "").strip()
+    energy = (data.get("energy_feel") or "").strip() if kind == "share" else None
+    if not allow:
+        return False, reason or "Bu metin alana uygun görülmedi.", energy
+    return True, "", energy or "sessiz bir yakınlık"
+
+
+def _model() -> str:
+    return os.getenv("OPENAI_MODEL", "gpt-4.1-mini").strip()
+
+
+def _passthrough(kind: Kind) -> tuple[bool, str, str | None]:
+    return True, "", "nötr bir titreşim" if kind == "share" else None
+
+
+async def moderate_field_text(text: str, kind: Kind, frequency_hz: int | None = None) -> tuple[bool, str, str | None]:
+    """
+    Returns (allowed, user_message, energy_feel).
+    energy_feel only filled for kind=='share' when AI runs.
+    """
+    blocked, reason = _heuristic_block(text, kind)
+    if blocked:
+        return False, reason, None
+
+    if not llm_gateway.is_configured():
+        return _passthrough(kind)
+
+    model = _model()
+    messages = _moderation_messages(text, kind, frequency_hz)
+    key = llm_cache.make_key(
+        "field_moderation",
+        model,
+        llm_cache.prompt_version(messages[0]["content"]),
+        kind,
+        frequency_hz if kind == "share" else "",
+        text,
+        casefold=True,  # karar harf büyüklüğüne bağlı değil
+    )
+    cached = await llm_cache.lookup("field_moderation", key)
+    if cached is not None:
+        return tuple(cached)
 
     try:
-        comp = client.chat.completions.create(
-            model=model,
-            temperature=0.2,
-            max_tokens=200,
-            messages=[{"role": "system", "content": sys}, {"role": "user", "content": user}],
-        )
-        raw = (comp.choices[0].message.content or "").strip()
-        data = json.loads(raw) if raw.startswith("{") else {}
-        if not data:
-            m = re.search(r"\{[\s\S]*\}", raw)
-            if m:
-                data = json.loads(m.group(0))
-        allow = bool(data.get("allow", True)) and not data.get("spam") and not data.get("low_quality")
-        reason = (data.get("reason_tr") or "").strip()
-        energy = (data.get("energy_feel") or "").strip() if kind == "share" else None
-        if not allow:
-            return False, reason or "Bu metin alana uygun görülmedi.", energy
-        return True, "", energy or "sessiz bir yakınlık"
+        raw = await llm_gateway.chat_text(messages, model=model, temperature=0.2, max_tokens=200)
+        verdict = _parse_verdict(raw, kind)
     except Exception:
-        return True, "", "nötr bir titreşim" if kind == "share" else None
+        return _passthrough(kind)
+
+    await llm_cache.store("field_moderation", key, list(verdict), ttl_sec=MODERATION_CACHE_TTL)
+    return verdict
+
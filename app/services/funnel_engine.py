@@ -0,0 +1,151 @@
+"""
+Funnel motoru — veri olarak tanımlanan funnel'ları funnel_events üzerinde tek
+taramada hesaplar.
+
+Funnel tanımı (bkz. app/routes/funnel.py FUNNELS):
+
+    {
+        "steps": [("page_view", "role_page_view"), ("action", ("a", "b")), ...],
+        "extras": [("share_click", "okuma_share_click")],   # sadece ham sayım
+        "rates": {"view_to_form": ("page_view", "form_start"), ...},
+    }
+
+Adım olayı tek bir event_type ya da alternatiflerin tuple'ıdır. Satırlar
+created_at sırasıyla akıtılır; her session_id için funnel başına "sıradaki adım"
+tutulur, olay o adımla eşleşirse oturum bir adım ilerler. Böylece ham olay
+sayılarının yanında sıralı, oturum bazlı dönüşüm de aynı taramada çıkar.
+session_id'siz olaylar yalnızca ham sayımlara girer.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.funnel_event import FunnelEvent
+
+STREAM_CHUNK = 5000
+
+
+def _as_tuple(events) -> tuple:
+    return tuple(events) if isinstance(events, (tuple, list)) else (events,)
+
+
+def funnel_event_types(funnel: dict) -> set[str]:
+    out: set[str] = set()
+    for _, events in [*funnel["steps"], *funnel.get("extras", [])]:
+        out.update(_as_tuple(events))
+    return out
+
+
+def validate_funnels(funnels: dict[str, dict], valid_events: Iterable[str]) -> None:
+    valid = set(valid_events)
+    for name, funnel in funnels.items():
+        unknown = funnel_event_types(funnel) - valid
+        if unknown:
+            raise ValueError(f"funnel {name!r} uses unknown events: {sorted(unknown)}")
+        labels = {label for label, _ in [*funnel["steps"], *funnel.get("extras", [])]}
+        for rate, (a, b) in funnel.get("rates", {}).items():
+            if a not in labels or b not in labels:
+                raise ValueError(f"funnel {name!r} rate {rate!r} refers to an unknown step")
+
+
+def _rate(a: int, b: int) -> float:
+    return round((b / a) * 100, 1) if a > 0 else 0.0
+
+
+def _hour(ts: Optional[datetime]) -> Optional[int]:
+    if ts is None:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.hour
+
+
+def compute_funnels(db: Session, since: datetime, funnels: dict[str, dict], only_listed: bool = False) -> dict:
+    """
+    funnel_events'i bir kez tarar. only_listed=True ise yalnızca funnel'larda
+    geçen olay türleri okunur (tek funnel detayı için).
+    """
+    names = list(funnels)
+    step_of: dict[str, list[tuple[int, int]]] = {}
+    for fi, name in enumerate(names):
+        for si, (_, events) in enumerate(funnels[name]["steps"]):
+            for et in _as_tuple(events):
+                step_of.setdefault(et, []).append((fi, si))
+    reached = [[0] * len(funnels[n]["steps"]) for n in names]
+
+    q = (
+        select(
+            FunnelEvent.session_id,
+            FunnelEvent.event_type,
+            FunnelEvent.source,
+            FunnelEvent.device_type,
+            FunnelEvent.created_at,
+        )
+        .where(FunnelEvent.created_at >= since)
+        .order_by(FunnelEvent.created_at, FunnelEvent.id)
+    )
+    if only_listed:
+        wanted = set()
+        for funnel in funnels.values():
+            wanted |= funnel_event_types(funnel)
+        q = q.where(FunnelEvent.event_type.in_(sorted(wanted)))
+
+    counts: Counter = Counter()
+    sources: Counter = Counter()
+    devices: Counter = Counter()
+    hourly: Counter = Counter()
+    progress: dict[str, list[int]] = {}
+
+    for sid, et, source, device, created_at in db.execute(q.execution_options(yield_per=STREAM_CHUNK)):
+        counts[et] += 1
+        sources[source or "unknown"] += 1
+        devices[device or "unknown"] += 1
+        hr = _hour(created_at)
+        if hr is not None:
+            hourly[hr] += 1
+
+        hits = step_of.get(et)
+        if not hits or not sid:
+            continue
+        state = progress.get(sid)
+        if state is None:
+            state = progress[sid] = [0] * len(names)
+        for fi, si in hits:
+            if state[fi] == si:
+                reached[fi][si] += 1
+                state[fi] = si + 1
+
+    results = {}
+    for fi, name in enumerate(names):
+        funnel = funnels[name]
+        raw = {
+            label: sum(counts.get(et, 0) for et in _as_tuple(events))
+            for label, events in [*funnel["steps"], *funnel.get("extras", [])]
+        }
+        rates = {rate: _rate(raw[a], raw[b]) for rate, (a, b) in funnel.get("rates", {}).items()}
+        first = reached[fi][0] if reached[fi] else 0
+        sessions = [
+            {
+                "step": label,
+                "sessions": n,
+                "from_prev": 100.0 if si == 0 else _rate(reached[fi][si - 1], n),
+                "from_start": _rate(first, n),
+            }
+            for si, ((label, _), n) in enumerate(zip(funnel["steps"], reached[fi]))
+        ]
+        results[name] = {"counts": raw, "rates": rates, "sessions": sessions}
+
+    return {
+        "funnels": results,
+        "event_counts": dict(counts),
+        "sources": dict(sources.most_common(10)),
+        "devices": dict(devices),
+        "hourly": dict(sorted(hourly.items())),
+        "total_events": sum(counts.values()),
+        "funnel_sessions": len(progress),
+    }
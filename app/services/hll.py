@@ -0,0 +1,55 @@
+"""
+Küçük HyperLogLog — ziyaretçi sayımı için birleştirilebilir sketch.
+
+p=11 → 2048 register (bayt başına bir register, ~%2.3 standart hata).
+Girdi 64 bitlik hash; page_views.ip_hash zaten sha256 önekidir.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+
+P = 11
+M = 1 << P
+_ALPHA = 0.7213 / (1 + 1.079 / M)
+_MASK64 = (1 << 64) - 1
+
+
+def new() -> bytearray:
+    return bytearray(M)
+
+
+def hash64(value: str) -> int:
+    v = (value or "").strip().lower()
+    if len(v) >= 16:
+        try:
+            return int(v[:16], 16)
+        except ValueError:
+            pass
+    return int.from_bytes(hashlib.sha256(v.encode("utf-8")).digest()[:8], "big")
+
+
+def add(regs: bytearray, h: int) -> None:
+    idx = h >> (64 - P)
+    w = (h << P) & _MASK64
+    rank = (64 - P + 1) if w == 0 else (64 - w.bit_length() + 1)
+    if rank > regs[idx]:
+        regs[idx] = rank
+
+
+def merge(a, b) -> bytearray:
+    if not a:
+        return bytearray(b or new())
+    if not b:
+        return bytearray(a)
+    return bytearray(map(max, a, b))
+
+
+def count(regs) -> int:
+    if not regs:
+        return 0
+    est = _ALPHA * M * M / sum(2.0 ** -r for r in regs)
+    zeros = regs.count(0)
+    if est <= 2.5 * M and zeros:
+        est = M * math.log(M / zeros)
+    return int(round(est))
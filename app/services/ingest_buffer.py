@@ -0,0 +1,205 @@
+"""
+Tampon'lu analitik yazımı — /analytics/pageview, /funnel/event(s), /events/log.
+
+İstek yolu satırı yalnızca belleğe ekler. Tek bir flusher thread her
+FLUSH_INTERVAL_MS'de ya da bir tampon BATCH_SIZE satıra ulaştığında tamponları
+çok satırlı INSERT (executemany → psycopg2 execute_values) ile tek
+transaction'da yazar.
+
+- Geri basınç: tampon MAX_PENDING'e ulaşırsa `add` flusher'ı uyandırır ve
+  BACKPRESSURE_WAIT_SEC kadar yer açılmasını bekler; açılmazsa False döner
+  (çağıran 503 verir).
+- Bağlantı hatasında (OperationalError/InterfaceError) satırlar tampona geri
+  konur, sonraki turda yeniden denenir.
+- Diğer hatalarda (DataError, IntegrityError, ...) parti ikiye bölünerek
+  yeniden yazılır; tek başına da yazılamayan satır loglanıp düşer
+  (`dead_lettered`). Tek bir bozuk satır tamponu tıkayamaz.
+- Kapanışta `stop_flusher` kalan her şeyi yazar.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import DateTime, Integer, String, column, table
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from app.db import engine
+from app.models.event import Event
+from app.models.funnel_event import FunnelEvent
+
+log = logging.getLogger("sanri.ingest")
+
+BATCH_SIZE = int(os.getenv("SANRI_INGEST_BATCH_SIZE", "500"))
+FLUSH_INTERVAL_MS = int(os.getenv("SANRI_INGEST_FLUSH_MS", "1000"))
+MAX_PENDING = int(os.getenv("SANRI_INGEST_MAX_PENDING", "20000"))
+BACKPRESSURE_WAIT_SEC = float(os.getenv("SANRI_INGEST_BACKPRESSURE_WAIT", "0.5"))
+
+# page_views için ORM modeli yok (tablo pageview.py'de CREATE TABLE ile kurulur)
+page_views = table(
+    "page_views",
+    column("id", Integer),
+    column("path", String),
+    column("referrer", String),
+    column("user_agent", String),
+    column("ip_hash", String),
+    column("session_id", String),
+    column("user_id", Integer),
+    column("created_at", DateTime),
+)
+
+
+def _transient(exc: Exception) -> bool:
+    if isinstance(exc, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(exc, DBAPIError) and bool(exc.connection_invalidated)
+
+
+class IngestBuffer:
+    def __init__(self, name: str, target) -> None:
+        self.name = name
+        self.target = target
+        self._rows: list[dict] = []
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self.stats = {"accepted": 0, "flushed": 0, "rejected": 0, "flushes": 0, "errors": 0, "dead_lettered": 0}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, row: dict) -> bool:
+        return self.add_many([row])
+
+    def add_many(self, rows: list[dict]) -> bool:
+        if not rows:
+            return True
+        deadline = time.monotonic() + BACKPRESSURE_WAIT_SEC
+        with self._space:
+            while len(self._rows) + len(rows) > MAX_PENDING:
+                _wake.set()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["rejected"] += len(rows)
+                    return False
+                self._space.wait(remaining)
+            self._rows.extend(rows)
+            self.stats["accepted"] += len(rows)
+            if len(self._rows) >= BATCH_SIZE:
+                _wake.set()
+        return True
+
+    def _insert(self, rows: list[dict]) -> None:
+        with engine.begin() as conn:
+            for i in range(0, len(rows), BATCH_SIZE):
+                conn.execute(self.target.insert(), rows[i:i + BATCH_SIZE])
+
+    def _insert_isolating(self, rows: list[dict], retry: list[dict]) -> int:
+        """Partiyi ikiye bölerek yazar; yazılan satır sayısını döner. Geçici hatada kalanlar `retry`'a."""
+        if retry:
+            retry.extend(rows)
+            return 0
+        try:
+            self._insert(rows)
+            return len(rows)
+        except Exception as exc:
+            if _transient(exc):
+                retry.extend(rows)
+                return 0
+            if len(rows) == 1:
+                with self._lock:
+                    self.stats["dead_lettered"] += 1
+                log.warning("ingest %s dropped row %r: %s", self.name, rows[0], exc)
+                return 0
+        mid = len(rows) // 2
+        return self._insert_isolating(rows[:mid], retry) + self._insert_isolating(rows[mid:], retry)
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._rows = self._rows, []
+        if not batch:
+            return 0
+        retry: list[dict] = []
+        try:
+            self._insert(batch)
+            written = len(batch)
+        except Exception as exc:
+            with self._lock:
+                self.stats["errors"] += 1
+            if _transient(exc):
+                retry = batch
+                written = 0
+            else:
+                log.warning("ingest flush %s failed, isolating bad rows: %s", self.name, exc)
+                written = self._insert_isolating(batch, retry)
+        with self._space:
+            if retry:
+                # sıra korunur; sığmayan en eski satırlar düşer
+                self._rows = (retry + self._rows)[-MAX_PENDING:]
+            self.stats["flushed"] += written
+            self.stats["flushes"] += 1
+            self._space.notify_all()
+        if retry:
+            log.warning("ingest flush %s failed (%d rows kept)", self.name, len(retry))
+        return written
+
+
+pageview_buffer = IngestBuffer("page_views", page_views)
+funnel_buffer = IngestBuffer("funnel_events", FunnelEvent.__table__)
+event_buffer = IngestBuffer("events", Event.__table__)
+
+BUFFERS = (pageview_buffer, funnel_buffer, event_buffer)
+
+
+# ----------------------------------------------------
+# flusher
+# ----------------------------------------------------
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def flush_all() -> int:
+    return sum(buf.flush() for buf in BUFFERS)
+
+
+def _flush_loop() -> None:
+    while not _stop.is_set():
+        _wake.wait(FLUSH_INTERVAL_MS / 1000)
+        _wake.clear()
+        try:
+            flush_all()
+        except Exception as e:
+            print("INGEST FLUSH ERROR =", repr(e))
+
+
+def start_flusher() -> None:
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_flush_loop, name="sanri-ingest", daemon=True)
+    _thread.start()
+
+
+def stop_flusher(timeout: float = 5.0) -> None:
+    """Kapanışta: döngüyü durdur, kalan satırları yaz."""
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
+    flush_all()
+
+
+def get_ingest_stats() -> dict:
+    return {
+        "batch_size": BATCH_SIZE,
+        "flush_interval_ms": FLUSH_INTERVAL_MS,
+        "max_pending": MAX_PENDING,
+        "buffers": {buf.name: {"pending": len(buf), **buf.stats} for buf in BUFFERS},
+    }
@@ -1,23 +1,11 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import Dict, Any
-from openai import OpenAI
 
 import os
 import json
 
-
-# ---------------------------------------------------
-# OPENAI CLIENT
-# ---------------------------------------------------
-
-def get_openai_client():
-    api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
-
-    if not api_key:
-        return None
-
-    return OpenAI(api_key=api_key)
+from app.services import llm_gateway
 
 
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
@@ -75,16 +63,13 @@ Konuşma:
 {joined}
 """
 
-    client = get_openai_client()
-
-    if client is None:
+    if not llm_gateway.is_configured():
         return {}
 
     try:
 
-        resp = client.chat.completions.create(
-            model=MODEL,
-            messages=[
+        return _safe_json(llm_gateway.chat_text_sync(
+            [
                 {
                     "role": "system",
                     "content": "Analyze the user's consciousness pattern."
@@ -94,13 +79,10 @@ Konuşma:
                     "content": prompt
                 },
             ],
+            model=MODEL,
             temperature=0.5,
             max_tokens=300,
-        )
-
-        txt = resp.choices[0].message.content or ""
-
-        return _safe_json(txt)
+        ))
 
     except Exception as e:
         print("INSIGHT ERROR:", e)
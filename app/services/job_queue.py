@@ -0,0 +1,334 @@
+"""
+Süreç içi iş kuyruğu — DB tabanlı kalıcı outbox + worker thread'leri.
+
+Handler'lar yan etkileri (hafıza/profil yazımı, bildirim, e-posta) doğrudan
+yapmak yerine `enqueue` ile kuyruğa koyar ve hemen döner.
+
+- enqueue(kind, payload, db=db): iş satırı çağıranın transaction'ına eklenir;
+  iş yalnızca iş verisiyle birlikte commit edilirse görünür (outbox).
+  db verilmezse kendi session'ı ile hemen commit edilir.
+- Worker'lar satırı iyimser UPDATE ile sahiplenir (çoklu süreç güvenli),
+  handler'ı ve "done" işaretini aynı transaction'da commit eder.
+- Hata: üstel geri çekilme ile yeniden denenir; max_attempts dolunca veya
+  PermanentJobError ile "dead" (dead-letter) olur.
+- Kilitli kalan "running" satırlar (süreç öldü) LEASE_SEC sonra geri alınır;
+  denemesi dolmuş olanlar "dead" olur. Geri alınmış bir çalışmanın sonucu
+  yazılmaz (`_finish` yalnızca kilidi hâlâ tutan worker için günceller).
+
+İş türleri modül yüklenirken `@register("tür")` ile kaydedilir; handler
+imzası `handler(db, payload)`.
+"""
+from __future__ import annotations
+
+import importlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.background_job import BackgroundJob
+
+log = logging.getLogger("sanri.jobs")
+
+WORKER_COUNT = int(os.getenv("SANRI_JOB_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("SANRI_JOB_POLL_INTERVAL", "2"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("SANRI_JOB_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SEC = float(os.getenv("SANRI_JOB_RETRY_BASE", "5"))
+RETRY_CAP_SEC = float(os.getenv("SANRI_JOB_RETRY_CAP", "900"))
+LEASE_SEC = int(os.getenv("SANRI_JOB_LEASE_SEC", "600"))
+DONE_RETENTION_DAYS = int(os.getenv("SANRI_JOB_DONE_RETENTION_DAYS", "7"))
+
+Handler = Callable[[Session, dict], None]
+
+# Worker başlamadan önce yüklenir; @register çağrıları bu modüllerde.
+HANDLER_MODULES = (
+    "app.services.conversation_context",
+    "app.services.memory_compaction",
+    "app.services.email_service",
+    "app.routes.yanki",
+)
+
+
+class PermanentJobError(Exception):
+    """Yeniden denemenin anlamı yok — iş doğrudan dead-letter'a gider."""
+
+
+_handlers: dict[str, Handler] = {}
+
+
+def register(kind: str) -> Callable[[Handler], Handler]:
+    def deco(fn: Handler) -> Handler:
+        _handlers[kind] = fn
+        return fn
+    return deco
+
+
+# ----------------------------------------------------
+# enqueue
+# ----------------------------------------------------
+
+_wake = threading.Event()
+_ENQUEUED_FLAG = "_jobs_enqueued"
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop(_ENQUEUED_FLAG, False):
+        _wake.set()
+
+
+def enqueue(
+    kind: str,
+    payload: dict,
+    *,
+    db: Optional[Session] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    delay_sec: float = 0,
+) -> None:
+    job = BackgroundJob(
+        kind=kind,
+        payload=json.dumps(payload, ensure_ascii=False, default=str),
+        status="pending",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_sec),
+    )
+    if db is not None:
+        db.add(job)
+        db.info[_ENQUEUED_FLAG] = True
+        return
+
+    own = SessionLocal()
+    try:
+        own.add(job)
+        own.info[_ENQUEUED_FLAG] = True
+        own.commit()
+    except Exception:
+        own.rollback()
+        raise
+    finally:
+        own.close()
+
+
+# ----------------------------------------------------
+# worker
+# ----------------------------------------------------
+
+_stop = threading.Event()
+_threads: list[threading.Thread] = []
+_reap_lock = threading.Lock()
+_last_reap = 0.0
+
+
+def _retry_delay(attempts: int) -> float:
+    return random.uniform(0.5, 1.0) * min(RETRY_CAP_SEC, RETRY_BASE_SEC * (2 ** max(0, attempts - 1)))
+
+
+def _reap_stale(db: Session) -> None:
+    """Süreci ölen worker'ın "running" bıraktığı işleri geri kuyruğa al; denemesi dolanlar dead."""
+    global _last_reap
+    with _reap_lock:
+        if time.monotonic() - _last_reap < 60:
+            return
+        _last_reap = time.monotonic()
+    now = datetime.utcnow()
+    res = db.execute(
+        text("""
+            UPDATE background_jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'pending' END,
+                finished_at = CASE WHEN attempts >= max_attempts THEN :now ELSE finished_at END,
+                last_error = CASE WHEN attempts >= max_attempts THEN :err ELSE last_error END,
+                locked_by = NULL, locked_at = NULL
+            WHERE status = 'running' AND locked_at < :cutoff
+        """),
+        {"now": now, "err": f"lease expired after {LEASE_SEC}s", "cutoff": now - timedelta(seconds=LEASE_SEC)},
+    )
+    db.commit()
+    if res.rowcount:
+        log.warning("reaped %d stale jobs", res.rowcount)
+
+
+def _claim(db: Session, worker: str) -> Optional[BackgroundJob]:
+    now = datetime.utcnow()
+    row = db.execute(
+        text("""
+            SELECT id FROM background_jobs
+            WHERE status = 'pending' AND run_after <= :now
+            ORDER BY run_after, id
+            LIMIT 1
+        """),
+        {"now": now},
+    ).first()
+    if not row:
+        return None
+
+    claimed = db.execute(
+        text("""
+            UPDATE background_jobs
+            SET status = 'running', locked_by = :worker, locked_at = :now,
+                attempts = attempts + 1
+            WHERE id = :id AND status = 'pending'
+        """),
+        {"id": row[0], "worker": worker, "now": now},
+    )
+    db.commit()
+    if claimed.rowcount != 1:
+        # başka bir worker kaptı
+        return None
+    return db.get(BackgroundJob, row[0])
+
+
+def _finish(db: Session, job_id: int, worker: str, **fields: Any) -> bool:
+    """Yalnızca işi hâlâ bu worker tutuyorsa günceller; geri alınmışsa False."""
+    sets = ", ".join(f"{k} = :{k}" for k in fields)
+    res = db.execute(
+        text(f"""
+            UPDATE background_jobs SET {sets}, locked_by = NULL, locked_at = NULL
+            WHERE id = :id AND locked_by = :worker AND status = 'running'
+        """),
+        {"id": job_id, "worker": worker, **fields},
+    )
+    return res.rowcount == 1
+
+
+def _run_job(db: Session, job: BackgroundJob, worker: str) -> None:
+    job_id, kind, attempts, max_attempts = job.id, job.kind, job.attempts, job.max_attempts
+    handler = _handlers.get(kind)
+    try:
+        if handler is None:
+            raise PermanentJobError(f"no handler registered for {kind!r}")
+        handler(db, json.loads(job.payload or "{}"))
+        if _finish(db, job_id, worker, status="done", finished_at=datetime.utcnow(), last_error=None):
+            db.commit()
+        else:
+            # kira doldu ve iş geri alındı: yan etkiler yeni sahibinde yeniden çalışır
+            db.rollback()
+            log.warning("job %s #%s lost its lease, result discarded", kind, job_id)
+        return
+    except Exception as exc:
+        db.rollback()
+        failure = exc
+
+    err = repr(failure)[:2000]
+    if isinstance(failure, PermanentJobError) or attempts >= max_attempts:
+        log.error("job %s #%s dead after %d attempts: %s", kind, job_id, attempts, err)
+        _finish(db, job_id, worker, status="dead", finished_at=datetime.utcnow(), last_error=err)
+    else:
+        delay = _retry_delay(attempts)
+        log.warning("job %s #%s failed (attempt %d), retry in %.0fs: %s", kind, job_id, attempts, delay, err)
+        _finish(
+            db,
+            job_id,
+            worker,
+            status="pending",
+            run_after=datetime.utcnow() + timedelta(seconds=delay),
+            last_error=err,
+        )
+    db.commit()
+
+
+def _run_one(worker: str) -> bool:
+    db = SessionLocal()
+    try:
+        _reap_stale(db)
+        job = _claim(db, worker)
+        if job is None:
+            return False
+        _run_job(db, job, worker)
+        return True
+    finally:
+        db.close()
+
+
+def _worker_loop(worker: str) -> None:
+    while not _stop.is_set():
+        try:
+            ran = _run_one(worker)
+        except Exception as e:
+            print("JOB WORKER ERROR =", repr(e))
+            ran = False
+        if not ran:
+            _wake.wait(POLL_INTERVAL)
+            _wake.clear()
+
+
+def start_workers(count: int = WORKER_COUNT) -> None:
+    if _threads or count <= 0:
+        return
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    _stop.clear()
+    prefix = uuid.uuid4().hex[:6]
+    for i in range(count):
+        t = threading.Thread(
+            target=_worker_loop,
+            args=(f"{prefix}-{i}",),
+            name=f"sanri-jobs-{i}",
+            daemon=True,
+        )
+        t.start()
+        _threads.append(t)
+    log.info("job workers started: %d", count)
+
+
+def stop_workers(timeout: float = 5.0) -> None:
+    _stop.set()
+    _wake.set()
+    for t in _threads:
+        t.join(timeout=timeout)
+    _threads.clear()
+
+
+# ----------------------------------------------------
+# maintenance / health
+# ----------------------------------------------------
+
+def purge_finished(db: Session) -> int:
+    res = db.execute(
+        text("DELETE FROM background_jobs WHERE status = 'done' AND finished_at < :cutoff"),
+        {"cutoff": datetime.utcnow() - timedelta(days=DONE_RETENTION_DAYS)},
+    )
+    db.commit()
+    return int(res.rowcount or 0)
+
+
+def get_queue_stats(db: Session) -> dict:
+    """Herkese açık /health/jobs özeti — hata metni (last_error) yalnızca loglarda."""
+    rows = db.execute(
+        text("SELECT kind, status, COUNT(*) AS n FROM background_jobs GROUP BY kind, status")
+    ).mappings().all()
+    by_kind: dict[str, dict[str, int]] = {}
+    totals: dict[str, int] = {}
+    for r in rows:
+        by_kind.setdefault(r["kind"], {})[r["status"]] = int(r["n"])
+        totals[r["status"]] = totals.get(r["status"], 0) + int(r["n"])
+
+    dead = db.execute(
+        text("""
+            SELECT id, kind, attempts, finished_at
+            FROM background_jobs
+            WHERE status = 'dead'
+            ORDER BY id DESC
+            LIMIT 10
+        """)
+    ).mappings().all()
+
+    return {
+        "workers": sum(1 for t in _threads if t.is_alive()),
+        "registered": sorted(_handlers),
+        "totals": totals,
+        "by_kind": by_kind,
+        "recent_dead": [
+            {**dict(r), "finished_at": r["finished_at"].isoformat() if hasattr(r["finished_at"], "isoformat") else r["finished_at"]}
+            for r in dead
+        ],
+    }
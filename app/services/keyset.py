@@ -0,0 +1,132 @@
+"""
+Keyset (cursor) sayfalama — OFFSET yerine son görülen satırdan devam.
+
+Liste uçları `?cursor=` alır; cursor son satırın sıralama anahtarıdır
+(ör. (published_at, id)) ve opak bir base64 dizgesi olarak döner:
+
+    q = q.filter(keyset.after((YankiPost.published_at, YankiPost.id), cur))
+    rows = q.order_by(YankiPost.published_at.desc(), YankiPost.id.desc()).limit(limit + 1).all()
+    items, next_cursor = keyset.page(rows, limit, lambda p: (p.published_at, p.id))
+
+Sorgu (a, id) < (:a, :id) satır karşılaştırmasıdır; (filtre..., a, id)
+bileşik indeksiyle 1. sayfa ile 500. sayfa aynı maliyettedir. Toplam sayı
+her kaydırmada yeniden hesaplanmaz: `cached_total` COUNT'u COUNT_CACHE_TTL_SEC
+boyunca tutar (yaklaşık toplam).
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import inspect, text, tuple_
+
+from app.db import engine
+from app.services import migrations
+
+COUNT_CACHE_TTL_SEC = float(os.getenv("SANRI_COUNT_CACHE_TTL", "60"))
+COUNT_CACHE_MAX = 512
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int = 2) -> Optional[tuple]:
+    """None → ilk sayfa. Bozuk cursor → 400."""
+    if not cursor:
+        return None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != size:
+            raise ValueError("cursor size")
+        return tuple(
+            datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v
+            for v in raw
+        )
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after(cols: Sequence[Any], values: tuple, desc: bool = True):
+    """ORM filtresi: sıralamada `values`'tan sonra gelen satırlar."""
+    left = tuple_(*cols)
+    right = tuple_(*values)
+    return left < right if desc else left > right
+
+
+def after_sql(cols: str, values: tuple, params: dict, desc: bool = True) -> str:
+    """Ham SQL karşılığı: "(created_at, id) < (:k0, :k1)"; değerleri params'a yazar."""
+    names = []
+    for i, v in enumerate(values):
+        params[f"k{i}"] = v
+        names.append(f":k{i}")
+    return f"({cols}) {'<' if desc else '>'} ({', '.join(names)})"
+
+
+def page(rows: list, limit: int, key: Callable[[Any], Sequence[Any]]) -> tuple[list, Optional[str]]:
+    """limit + 1 satır çekilmiş listeyi keser; devamı varsa sonraki cursor'ı döner."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+# ----------------------------------------------------
+# indexes — (filtre..., sıralama, id)
+# ----------------------------------------------------
+
+_INDEXES = {
+    "ix_yanki_posts_status_pub_id": ("yanki_posts", "status, published_at, id"),
+    "ix_yanki_posts_status_cat_pub_id": ("yanki_posts", "status, category, published_at, id"),
+    "ix_yanki_posts_status_created_id": ("yanki_posts", "status, created_at, id"),
+    "ix_yanki_posts_status_src_pub_id": ("yanki_posts", "status, post_source, published_at, id"),
+    "ix_yanki_comments_post_created_id": ("yanki_comments", "post_id, created_at, id"),
+    "ix_events_created_id": ("events", "created_at, id"),
+    "ix_memories_created_id": ("memories", "created_at, id"),
+    "ix_users_created_id": ("users", "created_at, id"),
+    "ix_sp_created_id": ("shopier_purchases", "created_at, id"),
+}
+
+
+@migrations.register(13, "keyset_pagination_indexes")
+def _keyset_indexes():
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        if insp.has_table("yanki_posts"):
+            # published_at NULL olan yayınlar satır karşılaştırmasında kaybolur
+            conn.execute(text("""
+                UPDATE yanki_posts SET published_at = COALESCE(reviewed_at, created_at)
+                WHERE status = 'published' AND published_at IS NULL
+            """))
+        for name, (table, cols) in _INDEXES.items():
+            if insp.has_table(table):
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+
+
+# ----------------------------------------------------
+# approximate totals
+# ----------------------------------------------------
+
+_lock = threading.Lock()
+_totals: dict[tuple, tuple[float, int]] = {}
+
+
+def cached_total(key: tuple, count: Callable[[], int]) -> int:
+    now = time.monotonic()
+    with _lock:
+        hit = _totals.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+    value = int(count() or 0)
+    with _lock:
+        if len(_totals) >= COUNT_CACHE_MAX:
+            _totals.clear()
+        _totals[key] = (now + COUNT_CACHE_TTL_SEC, value)
+    return value
@@ -0,0 +1,225 @@
+"""
+LLM yanıt önbelleği — girdisine göre fiilen deterministik prompt'lar için.
+
+Anahtar: sha256(namespace, model, prompt sürümü, normalize edilmiş girdi).
+Girdide yalnızca boşluklar normalize edilir — isim gibi çıktıya giren
+parçalarda büyük/küçük harf korunur ("AYŞE" ≠ "ayşe", "Işık" ≠ "ışık").
+casefold=True yalnızca harfin sonucu değiştirmediği yerlerde (ör. moderasyon).
+Katmanlar:
+  1. süreç içi LRU (TTL'li, SANRI_LLM_CACHE_MAX_ENTRIES)
+  2. llm_response_cache tablosu — restart sonrası da isabet eder
+
+Önbellek hatası hiçbir zaman isteği düşürmez; sadece loglanır.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal
+from app.models.llm_cache import LLMResponseCache
+
+log = logging.getLogger("sanri.llm_cache")
+
+MAX_ENTRIES = int(os.getenv("SANRI_LLM_CACHE_MAX_ENTRIES", "2048"))
+DEFAULT_TTL_SEC = int(os.getenv("SANRI_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+DB_TIER_ENABLED = os.getenv("SANRI_LLM_CACHE_DB", "1").strip() not in ("0", "false", "")
+
+_MISSING = object()
+
+
+def normalize_input(value: Any, casefold: bool = False) -> str:
+    out = re.sub(r"\s+", " ", str(value or "")).strip()
+    return out.casefold() if casefold else out
+
+
+def prompt_version(prompt: str) -> str:
+    """Sürüm sabiti olmayan prompt'lar için: metin değişince anahtar da değişir."""
+    return hashlib.sha256((prompt or "").encode("utf-8")).hexdigest()[:12]
+
+
+def make_key(namespace: str, model: str, version: str, *parts: Any, casefold: bool = False) -> str:
+    payload = json.dumps(
+        [namespace, model, version, [normalize_input(p, casefold) for p in parts]],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------------------------------------------
+# stats
+# ----------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+def _bump(namespace: str, field: str) -> None:
+    with _stats_lock:
+        ns = _stats.setdefault(
+            namespace, {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        )
+        ns[field] += 1
+
+
+def get_stats() -> dict:
+    """/health/llm-cache için."""
+    with _stats_lock:
+        namespaces = {}
+        for name, s in _stats.items():
+            hits = s["memory_hits"] + s["db_hits"]
+            total = hits + s["misses"]
+            namespaces[name] = {**s, "hit_rate": round(hits / total, 4) if total else None}
+    return {
+        "entries": len(_memory),
+        "max_entries": MAX_ENTRIES,
+        "db_tier": DB_TIER_ENABLED,
+        "namespaces": namespaces,
+    }
+
+
+# ----------------------------------------------------
+# tier 1 — in-process LRU
+# ----------------------------------------------------
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, tuple[datetime, str, Any]]" = OrderedDict()
+
+
+def _mem_get(key: str) -> Any:
+    with _lock:
+        item = _memory.get(key)
+        if item is None:
+            return _MISSING
+        expires_at, _, value = item
+        if expires_at <= datetime.utcnow():
+            del _memory[key]
+            return _MISSING
+        _memory.move_to_end(key)
+        return value
+
+
+def _mem_set(key: str, namespace: str, value: Any, expires_at: datetime) -> None:
+    with _lock:
+        _memory[key] = (expires_at, namespace, value)
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_ENTRIES:
+            _, (_, evicted_ns, _) = _memory.popitem(last=False)
+            _bump(evicted_ns, "evictions")
+
+
+# ----------------------------------------------------
+# tier 2 — DB
+# ----------------------------------------------------
+
+def _db_get(key: str) -> tuple[Any, Optional[datetime]]:
+    db = SessionLocal()
+    try:
+        row = db.get(LLMResponseCache, key)
+        if row is None:
+            return _MISSING, None
+        if row.expires_at <= datetime.utcnow():
+            db.delete(row)
+            db.commit()
+            return _MISSING, None
+        return json.loads(row.value_json), row.expires_at
+    except Exception as exc:
+        db.rollback()
+        log.warning("LLM cache DB read failed: %s", exc)
+        return _MISSING, None
+    finally:
+        db.close()
+
+
+def _db_set(key: str, namespace: str, value: Any, expires_at: datetime) -> None:
+    db = SessionLocal()
+    try:
+        db.merge(
+            LLMResponseCache(
+                cache_key=key,
+                namespace=namespace,
+                value_json=json.dumps(value, ensure_ascii=False),
+                created_at=datetime.utcnow(),
+                expires_at=expires_at,
+            )
+        )
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        log.warning("LLM cache DB write failed: %s", exc)
+    finally:
+        db.close()
+
+
+def purge_expired() -> int:
+    """Süresi dolmuş DB kayıtlarını sil (scheduler job'ı)."""
+    db = SessionLocal()
+    try:
+        n = (
+            db.query(LLMResponseCache)
+            .filter(LLMResponseCache.expires_at <= datetime.utcnow())
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return int(n or 0)
+    finally:
+        db.close()
+
+
+# ----------------------------------------------------
+# public API
+# ----------------------------------------------------
+
+async def lookup(namespace: str, key: str) -> Any:
+    """Değer ya da None."""
+    value = _mem_get(key)
+    if value is not _MISSING:
+        _bump(namespace, "memory_hits")
+        return value
+    if DB_TIER_ENABLED:
+        value, expires_at = await run_in_threadpool(_db_get, key)
+        if value is not _MISSING:
+            _mem_set(key, namespace, value, expires_at)
+            _bump(namespace, "db_hits")
+            return value
+    _bump(namespace, "misses")
+    return None
+
+
+async def store(namespace: str, key: str, value: Any, ttl_sec: Optional[int] = None) -> None:
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl_sec or DEFAULT_TTL_SEC)
+    _mem_set(key, namespace, value, expires_at)
+    if DB_TIER_ENABLED:
+        await run_in_threadpool(_db_set, key, namespace, value, expires_at)
+    _bump(namespace, "stores")
+
+
+async def get_or_compute(
+    namespace: str,
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    *,
+    ttl_sec: Optional[int] = None,
+    cacheable: Callable[[Any], bool] = bool,
+) -> Any:
+    """
+    Önbellekte varsa döndür; yoksa compute() ile üret ve cacheable(value)
+    doğruysa sakla (boş / eksik LLM çıktısı saklanmaz).
+    """
+    value = await lookup(namespace, key)
+    if value is not None:
+        return value
+    value = await compute()
+    if cacheable(value):
+        await store(namespace, key, value, ttl_sec)
+    return value
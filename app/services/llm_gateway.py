@@ -0,0 +1,362 @@
+"""
+Paylaşılan LLM geçidi — tüm OpenAI çağrıları buradan geçer.
+
+- Süreç başına tek AsyncOpenAI + tek OpenAI istemcisi (httpx keep-alive havuzu).
+- Model başına eşzamanlılık sınırı (semaphore).
+- Timeout + jitter'lı üstel geri çekilme ile yeniden deneme.
+
+Async handler'lar `chat_text` / `chat_stream` / `embed` / `transcribe` kullanır; event loop
+dışında çalışan kod (scheduler job'ları, sync handler'lar) `*_sync`
+varyantlarını kullanır. Async istemci event loop'a bağlıdır; thread'lerden
+`asyncio.run` ile çağrılmamalı.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+
+log = logging.getLogger("sanri.llm")
+
+T = TypeVar("T")
+
+DEFAULT_MODEL = (os.getenv("OPENAI_MODEL") or "gpt-4.1-mini").strip()
+REQUEST_TIMEOUT = float(os.getenv("SANRI_LLM_TIMEOUT", "60"))
+CONNECT_TIMEOUT = float(os.getenv("SANRI_LLM_CONNECT_TIMEOUT", "10"))
+MAX_RETRIES = int(os.getenv("SANRI_LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("SANRI_LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("SANRI_LLM_BACKOFF_CAP", "8"))
+MAX_CONNECTIONS = int(os.getenv("SANRI_LLM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("SANRI_LLM_MAX_KEEPALIVE", "20"))
+DEFAULT_CONCURRENCY = int(os.getenv("SANRI_LLM_CONCURRENCY", "16"))
+
+_RETRYABLE = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+def _parse_model_limits(raw: str) -> dict[str, int]:
+    """"gpt-4.1-mini=24,text-embedding-3-small=32" -> {model: limit}"""
+    out: dict[str, int] = {}
+    for part in (raw or "").split(","):
+        name, _, val = part.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            out[name] = max(1, int(val.strip()))
+        except ValueError:
+            continue
+    return out
+
+
+MODEL_CONCURRENCY = _parse_model_limits(os.getenv("SANRI_LLM_MODEL_CONCURRENCY", ""))
+
+
+class LLMNotConfigured(RuntimeError):
+    """OPENAI_API_KEY tanımlı değil."""
+
+
+# ----------------------------------------------------
+# clients
+# ----------------------------------------------------
+
+_lock = threading.Lock()
+_async_client: Optional[AsyncOpenAI] = None
+_sync_client: Optional[OpenAI] = None
+
+
+def _api_key() -> str:
+    return (os.getenv("OPENAI_API_KEY") or "").strip()
+
+
+def is_configured() -> bool:
+    return bool(_api_key())
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE)
+
+
+def get_async_client() -> AsyncOpenAI:
+    global _async_client
+    key = _api_key()
+    if not key:
+        raise LLMNotConfigured("OPENAI_API_KEY missing")
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = AsyncOpenAI(
+                    api_key=key,
+                    max_retries=0,
+                    timeout=_timeout(),
+                    http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+                )
+    return _async_client
+
+
+def get_sync_client() -> OpenAI:
+    global _sync_client
+    key = _api_key()
+    if not key:
+        raise LLMNotConfigured("OPENAI_API_KEY missing")
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = OpenAI(
+                    api_key=key,
+                    max_retries=0,
+                    timeout=_timeout(),
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+                )
+    return _sync_client
+
+
+async def aclose() -> None:
+    """Shutdown'da havuzları kapat."""
+    global _async_client, _sync_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        try:
+            await client.close()
+        except Exception as exc:
+            log.warning("LLM async client close failed: %s", exc)
+    sync_client, _sync_client = _sync_client, None
+    if sync_client is not None:
+        try:
+            sync_client.close()
+        except Exception as exc:
+            log.warning("LLM sync client close failed: %s", exc)
+
+
+# ----------------------------------------------------
+# concurrency + retry
+# ----------------------------------------------------
+
+_async_sems: dict[str, asyncio.Semaphore] = {}
+_sync_sems: dict[str, threading.BoundedSemaphore] = {}
+
+
+def _limit_for(model: str) -> int:
+    return MODEL_CONCURRENCY.get(model, DEFAULT_CONCURRENCY)
+
+
+def _async_sem(model: str) -> asyncio.Semaphore:
+    sem = _async_sems.get(model)
+    if sem is None:
+        sem = _async_sems.setdefault(model, asyncio.Semaphore(_limit_for(model)))
+    return sem
+
+
+def _sync_sem(model: str) -> threading.BoundedSemaphore:
+    sem = _sync_sems.get(model)
+    if sem is None:
+        with _lock:
+            sem = _sync_sems.setdefault(model, threading.BoundedSemaphore(_limit_for(model)))
+    return sem
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter: U(0, min(cap, base * 2^attempt))
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+async def _run(model: str, op: Callable[[], Awaitable[T]], *, locked: bool = False) -> T:
+    """locked=True: çağıran semaphore'u zaten tutuyor (stream)."""
+    attempt = 0
+    while True:
+        try:
+            if locked:
+                return await op()
+            async with _async_sem(model):
+                return await op()
+        except _RETRYABLE as exc:
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            log.warning("LLM %s retry %d in %.2fs: %s", model, attempt + 1, delay, exc)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+def _run_sync(model: str, op: Callable[[], T]) -> T:
+    attempt = 0
+    while True:
+        try:
+            with _sync_sem(model):
+                return op()
+        except _RETRYABLE as exc:
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            log.warning("LLM %s retry %d in %.2fs: %s", model, attempt + 1, delay, exc)
+            attempt += 1
+            time.sleep(delay)
+
+
+def _chat_kwargs(
+    messages: list[dict],
+    model: str,
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    response_format: Optional[dict],
+    timeout: Optional[float],
+) -> dict[str, Any]:
+    kwargs: dict[str, Any] = {"model": model, "messages": messages}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    return kwargs
+
+
+def _content(completion: Any) -> str:
+    return (completion.choices[0].message.content or "").strip()
+
+
+def usage_of(completion: Any) -> dict:
+    """prompt / cached / completion token sayıları (sağlayıcı döndürmediyse 0)."""
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "cached_tokens": int(getattr(details, "cached_tokens", 0) or 0),
+        "completion_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
+    }
+
+
+# ----------------------------------------------------
+# async API
+# ----------------------------------------------------
+
+async def chat_completion(
+    messages: list[dict],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[dict] = None,
+    timeout: Optional[float] = None,
+) -> Any:
+    model = model or DEFAULT_MODEL
+    client = get_async_client()
+    kwargs = _chat_kwargs(messages, model, temperature, max_tokens, response_format, timeout)
+    return await _run(model, lambda: client.chat.completions.create(**kwargs))
+
+
+async def chat_text(messages: list[dict], **kwargs: Any) -> str:
+    return _content(await chat_completion(messages, **kwargs))
+
+
+async def chat_stream(
+    messages: list[dict],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout: Optional[float] = None,
+    usage: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    """
+    Token akışı. Yeniden deneme yalnızca bağlantı kurulurken yapılır; ilk
+    parça geldikten sonraki hatalar çağırana iletilir. Semaphore akış
+    boyunca tutulur. `usage` verilirse son parçadaki token sayılarıyla doldurulur.
+    """
+    model = model or DEFAULT_MODEL
+    client = get_async_client()
+    kwargs = _chat_kwargs(messages, model, temperature, max_tokens, None, timeout)
+    kwargs["stream"] = True
+    if usage is not None:
+        kwargs["stream_options"] = {"include_usage": True}
+    async with _async_sem(model):
+        stream = await _run(model, lambda: client.chat.completions.create(**kwargs), locked=True)
+        try:
+            async for chunk in stream:
+                if usage is not None and getattr(chunk, "usage", None) is not None:
+                    usage.update(usage_of(chunk))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            await stream.close()
+
+
+async def embed(text: str, *, model: str) -> list[float]:
+    client = get_async_client()
+    r = await _run(model, lambda: client.embeddings.create(model=model, input=text))
+    return list(r.data[0].embedding)
+
+
+async def embed_many(texts: list[str], *, model: str) -> list[list[float]]:
+    """Tek istekte birden çok girdi; sonuç sırası `texts` ile aynı."""
+    client = get_async_client()
+    r = await _run(model, lambda: client.embeddings.create(model=model, input=texts))
+    return [list(d.embedding) for d in sorted(r.data, key=lambda d: d.index)]
+
+
+async def transcribe(filename: str, data: bytes, *, model: str, language: Optional[str] = None) -> str:
+    client = get_async_client()
+    result = await _run(
+        model,
+        lambda: client.audio.transcriptions.create(model=model, file=(filename, data), language=language),
+    )
+    return (getattr(result, "text", None) or "").strip()
+
+
+# ----------------------------------------------------
+# sync API (scheduler / thread context)
+# ----------------------------------------------------
+
+def chat_completion_sync(
+    messages: list[dict],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[dict] = None,
+    timeout: Optional[float] = None,
+) -> Any:
+    model = model or DEFAULT_MODEL
+    client = get_sync_client()
+    kwargs = _chat_kwargs(messages, model, temperature, max_tokens, response_format, timeout)
+    return _run_sync(model, lambda: client.chat.completions.create(**kwargs))
+
+
+def chat_text_sync(messages: list[dict], **kwargs: Any) -> str:
+    return _content(chat_completion_sync(messages, **kwargs))
+
+
+def embed_sync(text: str, *, model: str) -> list[float]:
+    client = get_sync_client()
+    r = _run_sync(model, lambda: client.embeddings.create(model=model, input=text))
+    return list(r.data[0].embedding)
+
+
+def embed_many_sync(texts: list[str], *, model: str) -> list[list[float]]:
+    client = get_sync_client()
+    r = _run_sync(model, lambda: client.embeddings.create(model=model, input=texts))
+    return [list(d.embedding) for d in sorted(r.data, key=lambda d: d.index)]
@@ -0,0 +1,295 @@
+"""
+Anlaşılma eşleştiricisi — /api/anlasilma/chat/queue için atomik eşleşme.
+
+Eskiden chat_queue bekleyen eşi `SELECT ... ORDER BY last_seen_at` ile bulup
+odayı ayrı bir adımda kilitsiz yaratıyordu; iki istek aynı eşi kapabiliyordu.
+İki motor (SANRI_MATCHMAKER, varsayılan: Postgres'te "postgres", aksi halde
+"memory"):
+
+- memory: frekans başına FIFO (deque + session → sıra tablosu). Frekans
+  kilidi altında aktif oda kontrolü, eş seçimi ve oda INSERT'i tek adımdır;
+  kuyruk tabloları ayrıca kısa bir global kilitle korunur. Tek worker'lık
+  kurulumlar içindir — kuyruk süreç içidir.
+- postgres: frekans başına `pg_advisory_xact_lock` ile aynı frekanstaki
+  kuyruk işlemleri worker'lar arasında sıraya girer; en eski bekleyen
+  `FOR UPDATE SKIP LOCKED` ile talep edilir, oda aynı transaction'da yazılır.
+  (frequency_hz, wants_chat, last_seen_at) indeksiyle baştan okuma.
+
+Her iki motorda da kilit alındıktan sonra çağıranın satırı yeniden okunur ve
+aktif oda kontrolü tekrarlanır: aynı oturumun eşzamanlı ikinci isteği, o
+arada eşleşmiş olan oturumu kuyruğa geri koyamaz; mevcut odayı döner.
+
+MATCH_CANDIDATES > 1 ise kuyruk başındaki o kadar aday presence_index
+benzerliğine göre sıralanır (varsayılan 1 = saf FIFO).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import inspect, or_, text
+from sqlalchemy.orm import Session
+
+from app.db import engine
+from app.models.anlasilma_field import AnlasilmaChatRoom, AnlasilmaPresence
+from app.services import migrations, presence_index
+
+log = logging.getLogger("sanri.matchmaker")
+
+ENGINE = (os.getenv("SANRI_MATCHMAKER") or "").strip() or (
+    "postgres" if engine.dialect.name == "postgresql" else "memory"
+)
+MATCH_CANDIDATES = max(1, int(os.getenv("SANRI_MATCH_CANDIDATES", "1")))
+# pg_advisory_xact_lock(int4, int4) ad alanı — "anma"
+LOCK_NS = 0x616E6D61
+
+_stats = {"paired": 0, "waiting": 0, "expired": 0}
+
+
+@migrations.register(15, "anlasilma_presence_queue_index")
+def _queue_index():
+    if not inspect(engine).has_table("anlasilma_presence"):
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_anlasilma_presence_queue "
+            "ON anlasilma_presence (frequency_hz, wants_chat, last_seen_at)"
+        ))
+
+
+def _pick(hz: int, session_id: str, candidates: list[str]) -> str:
+    if len(candidates) == 1:
+        return candidates[0]
+    return presence_index.rank(hz, session_id, candidates)[0]
+
+
+def active_room(db: Session, session_id: str, hz: int) -> Optional[AnlasilmaChatRoom]:
+    return (
+        db.query(AnlasilmaChatRoom)
+        .filter(
+            AnlasilmaChatRoom.is_active.is_(True),
+            AnlasilmaChatRoom.frequency_hz == hz,
+            or_(
+                AnlasilmaChatRoom.session_a == session_id,
+                AnlasilmaChatRoom.session_b == session_id,
+            ),
+        )
+        .first()
+    )
+
+
+def _new_room(a: str, b: str, hz: int, now: datetime) -> AnlasilmaChatRoom:
+    sa, sb = sorted([a, b])
+    return AnlasilmaChatRoom(session_a=sa, session_b=sb, frequency_hz=hz, created_at=now, is_active=True)
+
+
+# ----------------------------------------------------
+# memory engine
+# ----------------------------------------------------
+
+class _FrequencyQueue:
+    """order: (session_id, seq) FIFO; waiting: session_id → (seq, expires_mono). Geçersiz kayıtlar tembel temizlenir."""
+
+    def __init__(self) -> None:
+        self.order: deque[tuple[str, int]] = deque()
+        self.waiting: dict[str, tuple[int, float]] = {}
+        self.seq = 0
+
+    def _valid(self, session_id: str, seq: int, now: float) -> bool:
+        entry = self.waiting.get(session_id)
+        return entry is not None and entry[0] == seq and entry[1] > now
+
+    def head(self, exclude: str, k: int, now: float) -> list[str]:
+        while self.order and not self._valid(*self.order[0], now):
+            session_id, seq = self.order.popleft()
+            entry = self.waiting.get(session_id)
+            if entry is not None and entry[0] == seq:
+                del self.waiting[session_id]
+                _stats["expired"] += 1
+        out = []
+        for session_id, seq in self.order:
+            if len(out) >= k:
+                break
+            if session_id != exclude and self._valid(session_id, seq, now):
+                out.append(session_id)
+        return out
+
+    def add(self, session_id: str, expires: float, front: bool = False) -> None:
+        entry = self.waiting.get(session_id)
+        if entry is not None and not front:
+            # yeniden sıraya giren yerini korur, süresi uzar
+            self.waiting[session_id] = (entry[0], expires)
+            return
+        self.seq += 1
+        self.waiting[session_id] = (self.seq, expires)
+        if front:
+            self.order.appendleft((session_id, self.seq))
+        else:
+            self.order.append((session_id, self.seq))
+
+    def remove(self, session_id: str) -> None:
+        self.waiting.pop(session_id, None)
+
+
+_lock = threading.Lock()
+_queues: dict[int, _FrequencyQueue] = {}
+_session_hz: dict[str, int] = {}
+_hz_locks: dict[int, threading.Lock] = {}
+
+
+def _hz_lock(hz: int) -> threading.Lock:
+    with _lock:
+        lock = _hz_locks.get(hz)
+        if lock is None:
+            lock = _hz_locks[hz] = threading.Lock()
+        return lock
+
+
+def _queue_memory(db: Session, me: AnlasilmaPresence, hz: int, now: datetime, wait_sec: float) -> Optional[tuple[int, Optional[str]]]:
+    with _hz_lock(hz):
+        db.refresh(me)
+        existing = active_room(db, me.session_id, hz)
+        if existing is not None:
+            leave(me.session_id)
+            me.wants_chat = False
+            db.commit()
+            return existing.id, None
+
+        mono = time.monotonic()
+        with _lock:
+            prev = _session_hz.get(me.session_id)
+            if prev is not None and prev != hz and prev in _queues:
+                _queues[prev].remove(me.session_id)
+            q = _queues.setdefault(hz, _FrequencyQueue())
+            candidates = q.head(me.session_id, MATCH_CANDIDATES, mono)
+            peer = _pick(hz, me.session_id, candidates) if candidates else None
+            if peer is not None:
+                q.remove(peer)
+                q.remove(me.session_id)
+                _session_hz.pop(peer, None)
+                _session_hz.pop(me.session_id, None)
+                _stats["paired"] += 1
+            else:
+                q.add(me.session_id, mono + wait_sec)
+                _session_hz[me.session_id] = hz
+                _stats["waiting"] += 1
+
+        if peer is None:
+            me.wants_chat = True
+            me.last_seen_at = now
+            db.commit()
+            return None
+
+        room = _new_room(me.session_id, peer, hz, now)
+        try:
+            db.add(room)
+            me.wants_chat = False
+            db.query(AnlasilmaPresence).filter(AnlasilmaPresence.session_id == peer).update(
+                {AnlasilmaPresence.wants_chat: False}, synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            with _lock:
+                # eş kuyruğun başına döner; bu istek hata alır ve yeniden dener
+                _queues[hz].add(peer, time.monotonic() + wait_sec, front=True)
+                _session_hz[peer] = hz
+            raise
+        return room.id, peer
+
+
+def leave(session_id: str) -> None:
+    """Oturum kuyruktan çıkar (ör. /enter ile yeniden giriş)."""
+    if ENGINE != "memory":
+        return
+    with _lock:
+        hz = _session_hz.pop(session_id, None)
+        if hz is not None and hz in _queues:
+            _queues[hz].remove(session_id)
+
+
+# ----------------------------------------------------
+# postgres engine
+# ----------------------------------------------------
+
+def _queue_postgres(db: Session, me: AnlasilmaPresence, hz: int, now: datetime, cutoff: datetime) -> Optional[tuple[int, Optional[str]]]:
+    db.execute(text("SELECT pg_advisory_xact_lock(:ns, :hz)"), {"ns": LOCK_NS, "hz": hz})
+    me = (
+        db.query(AnlasilmaPresence)
+        .filter(AnlasilmaPresence.session_id == me.session_id)
+        .populate_existing()
+        .with_for_update()
+        .one()
+    )
+    existing = active_room(db, me.session_id, hz)
+    if existing is not None:
+        me.wants_chat = False
+        db.commit()
+        return existing.id, None
+
+    rows = (
+        db.query(AnlasilmaPresence)
+        .filter(
+            AnlasilmaPresence.frequency_hz == hz,
+            AnlasilmaPresence.wants_chat.is_(True),
+            AnlasilmaPresence.session_id != me.session_id,
+            AnlasilmaPresence.last_seen_at >= cutoff,
+        )
+        .order_by(AnlasilmaPresence.last_seen_at.asc())
+        .limit(MATCH_CANDIDATES)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not rows:
+        me.wants_chat = True
+        me.last_seen_at = now
+        db.commit()
+        with _lock:
+            _stats["waiting"] += 1
+        return None
+
+    by_session = {r.session_id: r for r in rows}
+    peer = by_session[_pick(hz, me.session_id, list(by_session))]
+    room = _new_room(me.session_id, peer.session_id, hz, now)
+    db.add(room)
+    me.wants_chat = False
+    peer.wants_chat = False
+    db.commit()
+    with _lock:
+        _stats["paired"] += 1
+    return room.id, peer.session_id
+
+
+# ----------------------------------------------------
+# public API
+# ----------------------------------------------------
+
+def queue(
+    db: Session,
+    me: AnlasilmaPresence,
+    hz: int,
+    now: datetime,
+    cutoff: datetime,
+) -> Optional[tuple[int, Optional[str]]]:
+    """
+    Eşleşirse (room_id, peer_session_id); oturum zaten aktif bir odadaysa
+    (room_id, None); yoksa None — oturum kuyrukta bekler.
+    """
+    if ENGINE == "postgres":
+        return _queue_postgres(db, me, hz, now, cutoff)
+    return _queue_memory(db, me, hz, now, (now - cutoff).total_seconds())
+
+
+def get_matchmaker_stats() -> dict:
+    with _lock:
+        return {
+            "engine": ENGINE,
+            "candidates": MATCH_CANDIDATES,
+            "waiting_now": {hz: len(q.waiting) for hz, q in _queues.items()},
+            **_stats,
+        }
@@ -0,0 +1,208 @@
+"""
+Sanrı hafıza sıkıştırma — kullanıcı başına kayan özet + küçük son-tur penceresi.
+
+Prompt'a giren hafıza: özet + tekrar eden tema satırı + son RECENT_WINDOW
+user_memory satırı, MEMORY_TOKEN_BUDGET ile sınırlı.
+
+Kayıttan sonra arka planda (job_queue "memory.compact"): pencerenin dışına düşen ve henüz katlanmamış
+satırlar COMPACT_MIN_ROWS kadar biriktiğinde özete katlanır. Tema sayaçları
+memory_engine anahtar kelimeleriyle (LLM'siz) birikir; özet metni LLM ile,
+LLM yoksa/başarısızsa çıkarımsal olarak güncellenir.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from collections import Counter
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.memory import UserMemorySummary
+from app.services import job_queue, llm_gateway
+from app.services.memory_engine import count_patterns, summarize_pattern_counts
+from app.services.profile_service import safe_json_load
+
+log = logging.getLogger("sanri.memory")
+
+RECENT_WINDOW = int(os.getenv("SANRI_MEMORY_RECENT_ROWS", "6"))
+COMPACT_MIN_ROWS = int(os.getenv("SANRI_MEMORY_COMPACT_MIN_ROWS", "8"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("SANRI_MEMORY_TOKEN_BUDGET", "600"))
+SUMMARY_MODEL = (os.getenv("SANRI_MEMORY_SUMMARY_MODEL") or os.getenv("OPENAI_MODEL") or "gpt-4.1-mini").strip()
+
+RECENT_ROW_CHARS = 400
+SUMMARY_MAX_CHARS = 1200
+COMPACT_LLM_ROWS = 40  # özet modeline giden en fazla yeni satır
+COMPACT_SCAN_LIMIT = 2000  # tek turda taranan en fazla katlanmamış satır
+
+NO_MEMORY = "No prior memory."
+
+SUMMARY_SYSTEM = """You maintain Sanri's long-term memory about one user.
+Merge the PREVIOUS SUMMARY with the NEW CONVERSATION LINES into one updated summary.
+- Keep concrete facts the user shared (names, places, decisions, recurring struggles, wishes).
+- Keep what Sanri already reflected back only if it matters for continuity.
+- Drop greetings, filler and repeated content.
+- Write in the user's language, third person, plain prose, no lists.
+- Maximum 120 words."""
+
+
+# ----------------------------------------------------
+# read: prompt memory
+# ----------------------------------------------------
+
+def load_recent_rows(db: Session, user_id: int, limit: int = RECENT_WINDOW) -> list[dict]:
+    try:
+        rows = db.execute(
+            text("""
+                SELECT type, content
+                FROM user_memory
+                WHERE user_id = :uid
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            """),
+            {"uid": user_id, "limit": limit},
+        ).mappings().all()
+        return [dict(r) for r in reversed(rows)]
+    except Exception as e:
+        db.rollback()
+        print("SANRI MEMORY LOAD ERROR =", repr(e))
+        return []
+
+
+def compose_prompt_memory(
+    summary: str | None,
+    memory_line: str | None,
+    recent_rows: list[dict],
+    budget: int = MEMORY_TOKEN_BUDGET,
+) -> str:
+    """
+    Özet bütçenin en fazla yarısını alır; kalan bütçe son satırlara
+    yeniden eskiye doğru doldurulur.
+    """
+    # ~4 karakter / token; tiktoken bağımlılığı olmadan bütçe için yeterli
+    budget_chars = max(0, budget) * 4
+
+    head: list[str] = []
+    summary = (summary or "").strip()
+    if summary:
+        head.append("SUMMARY: " + summary)
+    if memory_line:
+        head.append(memory_line.strip())
+    head_text = "\n".join(head)[: budget_chars // 2]
+
+    remaining = budget_chars - len(head_text)
+    recent: list[str] = []
+    for row in reversed(recent_rows):
+        content = str(row.get("content") or "").strip()
+        if not content:
+            continue
+        line = f"{str(row.get('type') or 'memory').strip()}: {content[:RECENT_ROW_CHARS]}"
+        if len(line) + 1 > remaining:
+            break
+        recent.append(line)
+        remaining -= len(line) + 1
+    recent.reverse()
+
+    parts = [p for p in (head_text, "\n".join(recent)) if p]
+    return "\n".join(parts).strip() or NO_MEMORY
+
+
+# ----------------------------------------------------
+# write: compaction
+# ----------------------------------------------------
+
+def _extractive_summary(previous: str, rows: list[dict]) -> str:
+    user_lines = [
+        " ".join(str(r.get("content") or "").split())[:160]
+        for r in rows
+        if str(r.get("type") or "") == "user" and str(r.get("content") or "").strip()
+    ]
+    merged = " | ".join(filter(None, [previous.strip(), *user_lines[-6:]]))
+    # en yeni kısım korunur
+    return merged[-SUMMARY_MAX_CHARS:]
+
+
+def _summarize(previous: str, rows: list[dict]) -> str:
+    if not llm_gateway.is_configured():
+        return _extractive_summary(previous, rows)
+
+    lines = "\n".join(
+        f"{str(r.get('type') or 'memory')}: {str(r.get('content') or '').strip()[:RECENT_ROW_CHARS]}"
+        for r in rows[-COMPACT_LLM_ROWS:]
+    )
+    try:
+        out = llm_gateway.chat_text_sync(
+            [
+                {"role": "system", "content": SUMMARY_SYSTEM},
+                {
+                    "role": "user",
+                    "content": f"PREVIOUS SUMMARY:\n{previous or '-'}\n\nNEW CONVERSATION LINES:\n{lines}",
+                },
+            ],
+            model=SUMMARY_MODEL,
+            temperature=0.2,
+            max_tokens=300,
+        )
+    except Exception as e:
+        log.warning("memory summary LLM failed: %s", e)
+        out = ""
+    return (out or _extractive_summary(previous, rows))[:SUMMARY_MAX_CHARS]
+
+
+def compact_user_memory(db: Session, user_id: int) -> bool:
+    """Son pencere dışındaki katlanmamış satırları özete kat. Katlama yapıldıysa True."""
+    state = db.get(UserMemorySummary, user_id)
+    last_id = int(state.last_memory_id or 0) if state else 0
+
+    rows = db.execute(
+        text("""
+            SELECT id, type, content
+            FROM user_memory
+            WHERE user_id = :uid AND id > :last_id
+            ORDER BY id DESC
+            LIMIT :limit
+        """),
+        {"uid": user_id, "last_id": last_id, "limit": COMPACT_SCAN_LIMIT + RECENT_WINDOW},
+    ).mappings().all()
+
+    # Son RECENT_WINDOW satır prompt'a olduğu gibi girer; onlar katlanmaz.
+    rows = [dict(r) for r in reversed(rows)][: max(0, len(rows) - RECENT_WINDOW)]
+    if len(rows) < COMPACT_MIN_ROWS:
+        return False
+
+    counts = Counter(safe_json_load(state.pattern_counts) if state else {})
+    counts.update(count_patterns([{"message": r.get("content") or ""} for r in rows]))
+    patterns = summarize_pattern_counts(counts)
+
+    summary = _summarize(state.summary if state else "", rows)
+
+    if state is None:
+        state = UserMemorySummary(user_id=user_id, folded_rows=0)
+        db.add(state)
+    state.summary = summary
+    state.memory_line = patterns["memory_line"] if patterns["dominant_pattern"] else None
+    state.pattern_counts = dict(counts)
+    state.last_memory_id = int(rows[-1]["id"])
+    state.folded_rows = int(state.folded_rows or 0) + len(rows)
+    db.commit()
+
+    log.info("memory compacted user=%s rows=%d summary_chars=%d", user_id, len(rows), len(summary))
+    return True
+
+
+# ----------------------------------------------------
+# background
+# ----------------------------------------------------
+
+@job_queue.register("memory.compact")
+def _compact_job(db: Session, payload: dict) -> None:
+    compact_user_memory(db, int(payload["user_id"]))
+
+
+def schedule_compaction(user_id: int, db: Session | None = None) -> None:
+    """Kayıt sonrası çağrılır; db verilirse iş, çağıranın transaction'ıyla birlikte yazılır."""
+    try:
+        uid = int(user_id)
+    except (TypeError, ValueError):
+        return
+    job_queue.enqueue("memory.compact", {"user_id": uid}, db=db)
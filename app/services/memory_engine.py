@@ -20,8 +20,8 @@ def _normalize(text: str) -> str:
     return (text or "").strip().lower()
 
 
-def extract_patterns(history: list[dict[str, Any]]) -> list[str]:
-    hits: list[str] = []
+def count_patterns(history: list[dict[str, Any]]) -> Counter:
+    hits: Counter = Counter()
 
     for item in history:
         text = _normalize(
@@ -30,14 +30,22 @@ def extract_patterns(history: list[dict[str, Any]]) -> list[str]:
 
         for tag, variants in KEYWORD_MAP.items():
             if any(v in text for v in variants):
-                hits.append(tag)
+                hits[tag] += 1
+
+    return hits
+
 
-    counts = Counter(hits)
-    return [tag for tag, _ in counts.most_common(5)]
+def extract_patterns(history: list[dict[str, Any]]) -> list[str]:
+    return [tag for tag, _ in count_patterns(history).most_common(5)]
 
 
 def build_memory_summary(history: list[dict[str, Any]]) -> dict[str, Any]:
-    patterns = extract_patterns(history)
+    return summarize_pattern_counts(count_patterns(history))
+
+
+def summarize_pattern_counts(counts: Counter) -> dict[str, Any]:
+    """build_memory_summary ile aynı şekil; birikmiş sayaçlardan (ör. hafıza özeti)."""
+    patterns = [tag for tag, _ in counts.most_common(5)]
 
     dominant = patterns[0] if patterns else ""
     secondary = patterns[1:3] if len(patterns) > 1 else []
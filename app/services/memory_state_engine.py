@@ -2,13 +2,10 @@ import json
 import os
 from typing import Any, Dict, List
 
-from openai import OpenAI
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-
-def _client() -> OpenAI:
-    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from app.services import llm_gateway
 
 
 def _model() -> str:
@@ -84,17 +81,15 @@ Konuşma geçmişi:
 {joined}
 """.strip()
 
-    res = _client().chat.completions.create(
-        model=_model(),
-        messages=[
+    raw = llm_gateway.chat_text_sync(
+        [
             {"role": "system", "content": "Sadece geçerli JSON üret."},
             {"role": "user", "content": prompt},
         ],
+        model=_model(),
         temperature=0.4,
         max_tokens=350,
     )
-
-    raw = (res.choices[0].message.content or "").strip()
     obj = _safe_json(raw)
 
     final = {
@@ -0,0 +1,93 @@
+"""
+Metric batch — tek tablo üzerindeki koşullu sayım/toplamları tek SELECT'te toplar.
+
+Admin panoları aynı tabloyu her metrik için ayrı ayrı taramak yerine metrik
+listesini buraya verir:
+
+    run_metrics(db, "users", [
+        count("total"),
+        count("premium", "is_premium = TRUE"),
+        count("new_24h", "created_at >= :s24"),
+    ], {"s24": s24})
+
+Postgres'te `AGG(...) FILTER (WHERE ...)`, diğer dialect'lerde (SQLite)
+`AGG(CASE WHEN ... THEN ... END)` üretilir. Koşullar ve ifadeler ham SQL'dir —
+yalnızca sabit metin verin, kullanıcı girdisi her zaman bind parametresiyle.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db import engine
+
+_INT_AGGS = {"count", "count_distinct"}
+
+
+def count(name: str, where: Optional[str] = None) -> dict:
+    return {"name": name, "agg": "count", "expr": None, "where": where}
+
+
+def count_distinct(name: str, expr: str, where: Optional[str] = None) -> dict:
+    return {"name": name, "agg": "count_distinct", "expr": expr, "where": where}
+
+
+def total(name: str, expr: str, where: Optional[str] = None) -> dict:
+    return {"name": name, "agg": "sum", "expr": expr, "where": where}
+
+
+def avg(name: str, expr: str, where: Optional[str] = None) -> dict:
+    return {"name": name, "agg": "avg", "expr": expr, "where": where}
+
+
+def _compile(metric: dict, is_pg: bool) -> str:
+    agg, expr, where = metric["agg"], metric["expr"], metric["where"]
+
+    if is_pg or not where:
+        base = {
+            "count": "COUNT(*)",
+            "count_distinct": f"COUNT(DISTINCT {expr})",
+            "sum": f"SUM({expr})",
+            "avg": f"AVG({expr})",
+        }[agg]
+        if where:
+            base = f"{base} FILTER (WHERE {where})"
+    else:
+        base = {
+            "count": f"SUM(CASE WHEN {where} THEN 1 ELSE 0 END)",
+            "count_distinct": f"COUNT(DISTINCT CASE WHEN {where} THEN {expr} END)",
+            "sum": f"SUM(CASE WHEN {where} THEN {expr} END)",
+            "avg": f"AVG(CASE WHEN {where} THEN {expr} END)",
+        }[agg]
+
+    return f"COALESCE({base}, 0) AS {metric['name']}"
+
+
+def build_metrics_sql(table: str, metrics: list[dict], where: Optional[str] = None) -> str:
+    is_pg = engine.dialect.name == "postgresql"
+    cols = ",\n       ".join(_compile(m, is_pg) for m in metrics)
+    sql = f"SELECT {cols}\nFROM {table}"
+    if where:
+        sql += f"\nWHERE {where}"
+    return sql
+
+
+def run_metrics(
+    db: Session,
+    table: str,
+    metrics: list[dict],
+    params: Optional[dict] = None,
+    where: Optional[str] = None,
+) -> dict:
+    """
+    Tabloyu bir kez tarar; {metrik adı: değer} döner. count → int, sum/avg → float.
+    `where` tüm metriklere ortak ön filtredir (indeksli aralık için).
+    """
+    row = db.execute(text(build_metrics_sql(table, metrics, where)), params or {}).mappings().first() or {}
+    out = {}
+    for m in metrics:
+        value = row.get(m["name"]) or 0
+        out[m["name"]] = int(value) if m["agg"] in _INT_AGGS else float(value)
+    return out
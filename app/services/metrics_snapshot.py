@@ -0,0 +1,201 @@
+"""
+Admin metrik snapshot'ları — ağır pano yüklerini önceden hesaplanmış halde sunar.
+
+Her pano hesaplayıcısı `@register("ad")` ile kaydedilir; imza
+`compute(db, **params) -> dict`. `serve` isteği (ad, parametreler) anahtarıyla
+süreç içi depodan yanıtlar:
+
+- ilk istek (veya ?fresh=1) senkron hesaplar ve depolar;
+- arka plan thread'i son IDLE_SEC içinde okunmuş anahtarları her REFRESH_SEC'te
+  yeniden hesaplar, okunmayanları bırakır;
+- gövde JSON byte'ları bir kez üretilir; ETag = gövde hash'i. If-None-Match
+  eşleşirse 304 döner.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+
+log = logging.getLogger("sanri.snapshot")
+
+REFRESH_SEC = float(os.getenv("SANRI_SNAPSHOT_REFRESH_SEC", "60"))
+IDLE_SEC = float(os.getenv("SANRI_SNAPSHOT_IDLE_SEC", "900"))
+MAX_KEYS = int(os.getenv("SANRI_SNAPSHOT_MAX_KEYS", "256"))
+
+Compute = Callable[..., dict]
+
+_computers: dict[str, Compute] = {}
+
+
+def register(name: str) -> Callable[[Compute], Compute]:
+    def deco(fn: Compute) -> Compute:
+        _computers[name] = fn
+        return fn
+    return deco
+
+
+# ----------------------------------------------------
+# store
+# ----------------------------------------------------
+
+_lock = threading.Lock()
+_store: dict[tuple, dict] = {}
+_stats = {"hits": 0, "misses": 0, "fresh": 0, "not_modified": 0, "refreshes": 0, "errors": 0}
+
+
+def _key(name: str, params: dict) -> tuple:
+    return (name, tuple(sorted(params.items())))
+
+
+def _compute(db: Session, name: str, params: dict) -> dict:
+    payload = jsonable_encoder(_computers[name](db, **params))
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return {
+        "name": name,
+        "params": params,
+        "body": body,
+        "etag": '"' + hashlib.sha256(body).hexdigest()[:20] + '"',
+        "computed_at": time.time(),
+        "last_access": time.time(),
+    }
+
+
+def _put(key: tuple, entry: dict) -> None:
+    with _lock:
+        _store[key] = entry
+        if len(_store) > MAX_KEYS:
+            oldest = min(_store, key=lambda k: _store[k]["last_access"])
+            _store.pop(oldest, None)
+
+
+def _bump(field: str) -> None:
+    with _lock:
+        _stats[field] += 1
+
+
+def serve(
+    request: Request,
+    db: Session,
+    name: str,
+    params: Optional[dict] = None,
+    fresh: bool = False,
+) -> Response:
+    params = dict(params or {})
+    key = _key(name, params)
+
+    with _lock:
+        entry = None if fresh else _store.get(key)
+        if entry is not None:
+            entry["last_access"] = time.time()
+
+    if entry is None:
+        _bump("fresh" if fresh else "misses")
+        entry = _compute(db, name, params)
+        _put(key, entry)
+    else:
+        _bump("hits")
+
+    headers = {
+        "ETag": entry["etag"],
+        "Cache-Control": "private, no-cache",
+        "X-Snapshot-Age": str(int(time.time() - entry["computed_at"])),
+    }
+    if_none_match = request.headers.get("if-none-match") or ""
+    if entry["etag"] in [t.strip() for t in if_none_match.split(",")]:
+        _bump("not_modified")
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+
+def invalidate(name: Optional[str] = None) -> None:
+    with _lock:
+        for key in [k for k in _store if name is None or k[0] == name]:
+            _store.pop(key, None)
+
+
+# ----------------------------------------------------
+# background refresh
+# ----------------------------------------------------
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def refresh_due() -> int:
+    now = time.time()
+    with _lock:
+        for key in [k for k, e in _store.items() if now - e["last_access"] > IDLE_SEC]:
+            _store.pop(key, None)
+        due = [(k, e["name"], e["params"]) for k, e in _store.items() if now - e["computed_at"] >= REFRESH_SEC]
+
+    done = 0
+    for key, name, params in due:
+        db = SessionLocal()
+        try:
+            entry = _compute(db, name, params)
+        except Exception as e:
+            db.rollback()
+            _bump("errors")
+            log.warning("snapshot refresh %s %s failed: %s", name, params, e)
+            continue
+        finally:
+            db.close()
+        with _lock:
+            old = _store.get(key)
+            if old is None:
+                continue  # bu arada boşa düştü
+            entry["last_access"] = old["last_access"]
+            _store[key] = entry
+            _stats["refreshes"] += 1
+        done += 1
+    return done
+
+
+def _refresh_loop() -> None:
+    while not _stop.wait(min(REFRESH_SEC, 15)):
+        try:
+            refresh_due()
+        except Exception as e:
+            print("SNAPSHOT REFRESH ERROR =", repr(e))
+
+
+def start_refresher() -> None:
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_refresh_loop, name="sanri-snapshots", daemon=True)
+    _thread.start()
+
+
+def stop_refresher(timeout: float = 5.0) -> None:
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
+
+
+def get_snapshot_stats() -> dict[str, Any]:
+    now = time.time()
+    with _lock:
+        return {
+            "refresh_sec": REFRESH_SEC,
+            "registered": sorted(_computers),
+            **_stats,
+            "entries": [
+                {"name": e["name"], "params": e["params"], "age_sec": int(now - e["computed_at"])}
+                for e in _store.values()
+            ],
+        }
@@ -0,0 +1,117 @@
+"""
+Şema göçleri — ham SQL tablo/kolon/indeks DDL'i için tek seferlik kayıt defteri.
+
+Route modülleri eskiden `CREATE TABLE IF NOT EXISTS` / `ALTER TABLE`'ı import
+anında ya da istek başına çalıştırıyordu. Artık her DDL fonksiyonu
+`@register(version, name)` ile kaydolur; `run_migrations()` açılışta
+(main `_startup`, create_all'dan sonra) bir kez çağrılır:
+
+- uygulanan sürümler `schema_migrations` tablosunda tutulur, her sürüm bir
+  kez çalışır;
+- Postgres'te `pg_advisory_lock` ile worker'lar sıraya girer — ilk gelen
+  uygular, diğerleri kilidi alınca yapılacak iş bulamaz;
+- göçler sürüm sırasıyla çalışır; hata veren sürüm kaydedilmez, loglanır ve
+  bir sonraki açılışta yeniden denenir (tablolar birbirinden bağımsız olduğu
+  için diğer sürümler devam eder — eski try/print davranışıyla aynı).
+
+Yeni şema değişikliği = yeni sürüm numarası. Uygulanmış bir göçü
+değiştirmeyin; mevcut tabanlı göçler IF NOT EXISTS ile idempotenttir.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable
+
+from sqlalchemy import text
+
+from app.db import engine
+
+log = logging.getLogger("sanri.migrations")
+
+# pg_advisory_lock anahtarı (int8) — "sanri-mg"
+LOCK_KEY = 0x73616E72692D6D67
+
+Migration = Callable[[], None]
+
+_migrations: dict[int, tuple[str, Migration]] = {}
+
+
+def register(version: int, name: str) -> Callable[[Migration], Migration]:
+    def deco(fn: Migration) -> Migration:
+        if version in _migrations and _migrations[version][1] is not fn:
+            raise ValueError(f"migration {version} already registered as {_migrations[version][0]!r}")
+        _migrations[version] = (name, fn)
+        return fn
+    return deco
+
+
+def _ensure_version_table(conn) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(120) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def _applied(conn) -> set[int]:
+    return {int(r[0]) for r in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def _apply_pending() -> list[int]:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        done = _applied(conn)
+
+    applied = []
+    for version in sorted(_migrations):
+        if version in done:
+            continue
+        name, fn = _migrations[version]
+        started = time.monotonic()
+        try:
+            fn()
+        except Exception as e:
+            log.warning("migration %s %s failed: %s", version, name, e)
+            continue
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                {"v": version, "n": name},
+            )
+        log.info("migration %s %s applied in %.2fs", version, name, time.monotonic() - started)
+        applied.append(version)
+    return applied
+
+
+def run_migrations() -> list[int]:
+    """Bekleyen göçleri uygular; uygulanan sürümleri döner."""
+    if engine.dialect.name != "postgresql":
+        return _apply_pending()
+
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": LOCK_KEY})
+        lock_conn.commit()
+        try:
+            return _apply_pending()
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_KEY})
+            lock_conn.commit()
+
+
+def get_migration_status() -> dict:
+    with engine.connect() as conn:
+        try:
+            done = _applied(conn)
+        except Exception:
+            done = set()
+    return {
+        "applied": sorted(done & set(_migrations)),
+        "pending": [
+            {"version": v, "name": _migrations[v][0]}
+            for v in sorted(_migrations)
+            if v not in done
+        ],
+    }
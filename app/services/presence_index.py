@@ -0,0 +1,349 @@
+"""
+Anlaşılma presence indeksi — frekans başına bellek içi embedding matrisi.
+
+`/api/anlasilma/enter` eskiden aynı frekanstaki tüm aktif eşleri çekip her
+birinin `embedding_json`'ını (1536 float, metin) parse ediyor ve kosinüsü saf
+Python döngüsüyle hesaplıyordu. Bunun yerine:
+
+- embedding'ler DB'de `embedding_blob` (float32 bayt, ~6 KB) olarak tutulur;
+  `to_blob` / `from_blob` dönüşümü kopyasız `np.frombuffer`'dır;
+- her frekans için satırları önceden normalize edilmiş (n, dim) float32 matris
+  tutulur; benzerlik tek bir matris-vektör çarpımı + argpartition top-k'dır;
+- satırlar `last_seen_at` ile yaşlanır: sorgular pencere dışını maskeler,
+  süresi dolanlar matristen sıkıştırılarak atılır;
+- `sync(db, hz)` diğer worker'ların yazdığı/dokunduğu satırları
+  `last_seen_at >= son senkron` ile artımlı çeker (SYNC_INTERVAL_SEC'te bir);
+  RECONCILE_INTERVAL_SEC'te bir de frekansın DB'deki aktif session_id
+  kümesini okuyup başka worker'da frekans değiştirmiş/silinmiş oturumları
+  atar (active_count şişmesin);
+- `top_k_verified` dönen adayları DB satırıyla (frekans + pencere) doğrular,
+  tutmayanları indeksten çıkarır.
+
+Süreç içi; yeniden başlatmada ilk sorgu aktif pencereyi DB'den yükler.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.anlasilma_field import AnlasilmaPresence
+
+SYNC_INTERVAL_SEC = float(os.getenv("SANRI_PRESENCE_SYNC_SEC", "1.0"))
+RECONCILE_INTERVAL_SEC = float(os.getenv("SANRI_PRESENCE_RECONCILE_SEC", "30"))
+# başka worker'ın commit'i ile bizim senkronumuz arasındaki saat kayması payı
+SYNC_SKEW_SEC = 2.0
+_MIN_CAPACITY = 64
+
+
+def to_blob(vec: Iterable[float]) -> bytes:
+    return np.asarray(vec if isinstance(vec, np.ndarray) else list(vec), dtype="<f4").tobytes()
+
+
+def from_blob(blob: Optional[bytes]) -> Optional[np.ndarray]:
+    if not blob:
+        return None
+    return np.frombuffer(blob, dtype="<f4")
+
+
+def _row_vector(row: AnlasilmaPresence) -> Optional[np.ndarray]:
+    """embedding_blob; yoksa eski embedding_json satırları."""
+    vec = from_blob(row.embedding_blob)
+    if vec is not None:
+        return vec
+    try:
+        raw = json.loads(row.embedding_json or "[]")
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(raw, list) or not raw:
+        return None
+    try:
+        return np.asarray(raw, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize(vec: np.ndarray) -> np.ndarray:
+    vec = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else np.zeros_like(vec)
+
+
+def _ts(dt: datetime) -> float:
+    return dt.replace(tzinfo=timezone.utc).timestamp() if dt.tzinfo is None else dt.timestamp()
+
+
+class _Shard:
+    """Tek frekansın satırları: matrix[:n] normalize vektörler, seen[:n] epoch."""
+
+    def __init__(self) -> None:
+        self.dim = 0
+        self.n = 0
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.seen = np.zeros(0, dtype=np.float64)
+        self.sessions: list[str] = []
+        self.slots: dict[str, int] = {}
+        self.synced_at: Optional[datetime] = None
+        self.synced_mono = 0.0
+        self.reconciled_mono: Optional[float] = None
+
+    def _reset(self, dim: int) -> None:
+        self.dim = dim
+        self.n = 0
+        self.matrix = np.zeros((_MIN_CAPACITY, dim), dtype=np.float32)
+        self.seen = np.zeros(_MIN_CAPACITY, dtype=np.float64)
+        self.sessions = []
+        self.slots = {}
+
+    def upsert(self, session_id: str, vec: np.ndarray, seen_ts: float) -> None:
+        if vec.ndim != 1 or not vec.size:
+            return
+        if vec.size != self.dim:
+            # model/boyut değişti: eski vektörler karşılaştırılamaz
+            self._reset(vec.size)
+        slot = self.slots.get(session_id)
+        if slot is None:
+            if self.n == self.matrix.shape[0]:
+                cap = max(_MIN_CAPACITY, self.n * 2)
+                self.matrix = np.resize(self.matrix, (cap, self.dim))
+                self.seen = np.resize(self.seen, cap)
+            slot = self.n
+            self.n += 1
+            self.sessions.append(session_id)
+            self.slots[session_id] = slot
+            self.seen[slot] = seen_ts
+        else:
+            self.seen[slot] = max(self.seen[slot], seen_ts)
+        self.matrix[slot] = _normalize(vec)
+
+    def touch(self, session_id: str, seen_ts: float) -> None:
+        slot = self.slots.get(session_id)
+        if slot is not None:
+            self.seen[slot] = max(self.seen[slot], seen_ts)
+
+    def remove(self, session_id: str) -> None:
+        slot = self.slots.pop(session_id, None)
+        if slot is None:
+            return
+        last = self.n - 1
+        if slot != last:
+            moved = self.sessions[last]
+            self.matrix[slot] = self.matrix[last]
+            self.seen[slot] = self.seen[last]
+            self.sessions[slot] = moved
+            self.slots[moved] = slot
+        self.sessions.pop()
+        self.n = last
+
+    def expire(self, cutoff_ts: float) -> int:
+        if not self.n:
+            return 0
+        keep = self.seen[: self.n] >= cutoff_ts
+        dropped = int(self.n - keep.sum())
+        if dropped:
+            idx = np.flatnonzero(keep)
+            self.matrix[: idx.size] = self.matrix[idx]
+            self.seen[: idx.size] = self.seen[idx]
+            self.sessions = [self.sessions[i] for i in idx]
+            self.slots = {s: i for i, s in enumerate(self.sessions)}
+            self.n = idx.size
+        return dropped
+
+
+_lock = threading.Lock()
+_shards: dict[int, _Shard] = {}
+_session_hz: dict[str, int] = {}
+_stats = {"queries": 0, "syncs": 0, "synced_rows": 0, "expired": 0, "reconciles": 0, "evicted": 0}
+
+
+def _shard(hz: int) -> _Shard:
+    shard = _shards.get(hz)
+    if shard is None:
+        shard = _shards[hz] = _Shard()
+    return shard
+
+
+def _put(hz: int, session_id: str, vec: np.ndarray, seen_ts: float) -> None:
+    prev = _session_hz.get(session_id)
+    if prev is not None and prev != hz and prev in _shards:
+        _shards[prev].remove(session_id)
+    _shard(hz).upsert(session_id, vec, seen_ts)
+    _session_hz[session_id] = hz
+
+
+def upsert(hz: int, session_id: str, vec: Iterable[float], last_seen_at: datetime) -> None:
+    """Yazan istek kendi satırını hemen indekse koyar (senkronu beklemeden)."""
+    arr = np.asarray(list(vec) if not isinstance(vec, np.ndarray) else vec, dtype=np.float32)
+    with _lock:
+        _put(hz, session_id, arr, _ts(last_seen_at))
+
+
+def _evict(session_id: str, hz: Optional[int] = None) -> None:
+    """Oturumu çıkarır; hz verilirse yalnızca o frekanstan."""
+    current = _session_hz.get(session_id)
+    if hz is None:
+        hz = current
+    if hz is None or hz not in _shards or session_id not in _shards[hz].slots:
+        return
+    _shards[hz].remove(session_id)
+    if current == hz:
+        del _session_hz[session_id]
+    _stats["evicted"] += 1
+
+
+def touch(hz: int, session_id: str, last_seen_at: datetime) -> None:
+    with _lock:
+        shard = _shards.get(hz)
+        if shard is not None:
+            shard.touch(session_id, _ts(last_seen_at))
+
+
+def sync(db: Session, hz: int, cutoff: datetime, force: bool = False) -> None:
+    """Frekansın son senkrondan beri değişen aktif satırlarını DB'den çeker."""
+    now_mono = time.monotonic()
+    with _lock:
+        shard = _shard(hz)
+        if not force and shard.synced_at is not None and now_mono - shard.synced_mono < SYNC_INTERVAL_SEC:
+            return
+        since = cutoff
+        if shard.synced_at is not None:
+            since = max(cutoff, shard.synced_at - timedelta(seconds=SYNC_SKEW_SEC))
+        reconcile = force or shard.reconciled_mono is None or now_mono - shard.reconciled_mono >= RECONCILE_INTERVAL_SEC
+        started = datetime.utcnow()
+
+    rows = (
+        db.query(AnlasilmaPresence)
+        .filter(
+            AnlasilmaPresence.frequency_hz == hz,
+            AnlasilmaPresence.last_seen_at >= since,
+        )
+        .all()
+    )
+    decoded = [(r.session_id, _row_vector(r), _ts(r.last_seen_at)) for r in rows]
+    active = None
+    if reconcile:
+        active = {
+            sid
+            for (sid,) in db.query(AnlasilmaPresence.session_id).filter(
+                AnlasilmaPresence.frequency_hz == hz,
+                AnlasilmaPresence.last_seen_at >= cutoff,
+            )
+        }
+
+    with _lock:
+        for session_id, vec, seen_ts in decoded:
+            if vec is not None:
+                _put(hz, session_id, vec, seen_ts)
+        shard = _shard(hz)
+        if active is not None:
+            # DB'de bu frekansta aktif olmayanlar (başka worker'da taşınmış/silinmiş)
+            for session_id in [s for s in shard.sessions if s not in active]:
+                _evict(session_id, hz)
+            shard.reconciled_mono = now_mono
+            _stats["reconciles"] += 1
+        shard.synced_at = started
+        shard.synced_mono = now_mono
+        _stats["syncs"] += 1
+        _stats["synced_rows"] += len(decoded)
+
+
+def _expire(shard: _Shard, cutoff_ts: float) -> None:
+    before = set(shard.sessions)
+    dropped = shard.expire(cutoff_ts)
+    if dropped:
+        _stats["expired"] += dropped
+        for session_id in before.difference(shard.sessions):
+            _session_hz.pop(session_id, None)
+
+
+def active_count(hz: int, cutoff: datetime) -> int:
+    with _lock:
+        shard = _shards.get(hz)
+        if shard is None:
+            return 0
+        _expire(shard, _ts(cutoff))
+        return shard.n
+
+
+def top_k(
+    hz: int,
+    vec: Iterable[float],
+    cutoff: datetime,
+    k: int = 1,
+    exclude: Optional[str] = None,
+) -> list[tuple[str, float]]:
+    """Aktif eşler arasında en yüksek kosinüs benzerliğine sahip k oturum."""
+    q = _normalize(np.asarray(list(vec) if not isinstance(vec, np.ndarray) else vec, dtype=np.float32))
+    with _lock:
+        _stats["queries"] += 1
+        shard = _shards.get(hz)
+        if shard is None or not shard.n or q.size != shard.dim:
+            return []
+        _expire(shard, _ts(cutoff))
+        sims = shard.matrix[: shard.n] @ q
+        if exclude is not None and exclude in shard.slots:
+            sims[shard.slots[exclude]] = -np.inf
+        k = min(k, shard.n)
+        if k <= 0:
+            return []
+        idx = np.argpartition(-sims, k - 1)[:k] if k < shard.n else np.arange(shard.n)
+        idx = idx[np.argsort(-sims[idx])]
+        return [(shard.sessions[i], float(sims[i])) for i in idx if np.isfinite(sims[i])]
+
+
+def top_k_verified(
+    db: Session,
+    hz: int,
+    vec: Iterable[float],
+    cutoff: datetime,
+    k: int = 1,
+    exclude: Optional[str] = None,
+) -> list[tuple[str, float]]:
+    """top_k; adaylar DB satırıyla doğrulanır (hâlâ bu frekansta ve pencerede mi), bayatlar indeksten atılır."""
+    hits = top_k(hz, vec, cutoff, k=k * 2, exclude=exclude)
+    if not hits:
+        return []
+    valid = {
+        sid
+        for (sid,) in db.query(AnlasilmaPresence.session_id).filter(
+            AnlasilmaPresence.session_id.in_([sid for sid, _ in hits]),
+            AnlasilmaPresence.frequency_hz == hz,
+            AnlasilmaPresence.last_seen_at >= cutoff,
+        )
+    }
+    stale = [sid for sid, _ in hits if sid not in valid]
+    if stale:
+        with _lock:
+            for sid in stale:
+                _evict(sid, hz)
+    return [(sid, sim) for sid, sim in hits if sid in valid][:k]
+
+
+def rank(hz: int, session_id: str, candidates: list[str]) -> list[str]:
+    """candidates'ı session_id'ye benzerliğe göre sıralar; vektörü olmayanlar sona, kendi sıralarıyla."""
+    with _lock:
+        shard = _shards.get(hz)
+        if shard is None or session_id not in shard.slots:
+            return list(candidates)
+        q = shard.matrix[shard.slots[session_id]]
+        scored = [
+            (float(shard.matrix[shard.slots[c]] @ q) if c in shard.slots else float("-inf"), i, c)
+            for i, c in enumerate(candidates)
+        ]
+    scored.sort(key=lambda t: (-t[0], t[1]))
+    return [c for _, _, c in scored]
+
+
+def get_index_stats() -> dict:
+    with _lock:
+        return {
+            "frequencies": {hz: s.n for hz, s in _shards.items()},
+            "sessions": len(_session_hz),
+            **_stats,
+        }
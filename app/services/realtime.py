@@ -0,0 +1,180 @@
+"""
+Gerçek zamanlı dağıtım — kanal başına süreç içi pub/sub (+ Postgres LISTEN/NOTIFY).
+
+Abone olan SSE uçları (`subscribe(channel)`) kendi event loop'larında bir
+asyncio.Queue alır; `publish(channel, event, data)` hem sync handler
+thread'lerinden hem event loop'tan çağrılabilir (call_soon_threadsafe).
+
+Birden çok worker varsa yayın Postgres `pg_notify(sanri_realtime, ...)` ile
+de gönderilir; her süreçteki tek bir dinleyici thread'i bildirimleri yerel
+abonelere dağıtır. Kendi sürecinden gelenler atlanır (yerelde zaten teslim
+edildi). SQLite'ta ya da SANRI_REALTIME_PG=0 iken yalnızca süreç içi çalışır.
+
+Teslim en-iyi-çaba: yavaş abonenin kuyruğu dolarsa olay düşer; uçlar
+bağlanırken DB'den bir kez yakalama (backlog) yapar.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from sqlalchemy import text
+
+from app.db import engine
+
+log = logging.getLogger("sanri.realtime")
+
+PG_CHANNEL = "sanri_realtime"
+PG_FANOUT = engine.dialect.name == "postgresql" and os.getenv("SANRI_REALTIME_PG", "1").strip() not in ("0", "false", "")
+QUEUE_MAX = int(os.getenv("SANRI_REALTIME_QUEUE_MAX", "100"))
+# pg_notify yükü 8000 bayt ile sınırlı
+PG_PAYLOAD_MAX = 7900
+
+_ORIGIN = uuid.uuid4().hex
+
+_lock = threading.Lock()
+_subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+_stats = {"published": 0, "delivered": 0, "dropped": 0, "remote_received": 0, "notify_failed": 0}
+
+
+def _offer(queue: asyncio.Queue, message: dict) -> None:
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        with _lock:
+            _stats["dropped"] += 1
+
+
+def _deliver(channel: str, message: dict) -> None:
+    with _lock:
+        targets = list(_subscribers.get(channel, ()))
+        _stats["delivered"] += len(targets)
+    for loop, queue in targets:
+        try:
+            loop.call_soon_threadsafe(_offer, queue, message)
+        except RuntimeError:
+            # loop kapanmış; abone finally'de zaten çıkacak
+            continue
+
+
+def publish(channel: str, event: str, data: Any) -> None:
+    """Commit'ten sonra çağrılır. Event loop içinden çağrılırsa NOTIFY bloklar — sync handler'lardan çağırın."""
+    message = {"event": event, "data": data}
+    with _lock:
+        _stats["published"] += 1
+    _deliver(channel, message)
+    if PG_FANOUT:
+        _notify(channel, message)
+
+
+def _notify(channel: str, message: dict) -> None:
+    payload = json.dumps({"o": _ORIGIN, "c": channel, "m": message}, ensure_ascii=False, separators=(",", ":"), default=str)
+    if len(payload.encode("utf-8")) > PG_PAYLOAD_MAX:
+        log.warning("realtime payload too large for NOTIFY on %s", channel)
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:ch, :p)"), {"ch": PG_CHANNEL, "p": payload})
+    except Exception as exc:
+        with _lock:
+            _stats["notify_failed"] += 1
+        log.warning("realtime NOTIFY failed: %s", exc)
+
+
+@contextmanager
+def subscribe(channel: str) -> Iterator[asyncio.Queue]:
+    """`with subscribe("room:12") as q: msg = await q.get()` — {"event", "data"}."""
+    entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_MAX))
+    with _lock:
+        _subscribers.setdefault(channel, set()).add(entry)
+    if PG_FANOUT:
+        _ensure_listener()
+    try:
+        yield entry[1]
+    finally:
+        with _lock:
+            subs = _subscribers.get(channel)
+            if subs is not None:
+                subs.discard(entry)
+                if not subs:
+                    del _subscribers[channel]
+
+
+def get_realtime_stats() -> dict:
+    with _lock:
+        return {
+            "channels": len(_subscribers),
+            "subscribers": sum(len(s) for s in _subscribers.values()),
+            "pg_fanout": PG_FANOUT,
+            "listener_alive": bool(_listener and _listener.is_alive()),
+            **_stats,
+        }
+
+
+# ----------------------------------------------------
+# Postgres LISTEN thread
+# ----------------------------------------------------
+
+_listener: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def _ensure_listener() -> None:
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return
+    with _lock:
+        if _listener is not None and _listener.is_alive():
+            return
+        _stop.clear()
+        _listener = threading.Thread(target=_listen_forever, name="sanri-realtime-listen", daemon=True)
+        _listener.start()
+
+
+def _dispatch_remote(payload: str) -> None:
+    try:
+        env = json.loads(payload)
+    except (TypeError, ValueError):
+        return
+    if env.get("o") == _ORIGIN:
+        return
+    with _lock:
+        _stats["remote_received"] += 1
+    _deliver(env.get("c") or "", env.get("m") or {})
+
+
+def _listen_once() -> None:
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {PG_CHANNEL}")
+        while not _stop.is_set():
+            if select.select([conn], [], [], 5.0) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                _dispatch_remote(conn.notifies.pop(0).payload)
+    finally:
+        raw.invalidate()
+
+
+def _listen_forever() -> None:
+    while not _stop.is_set():
+        try:
+            _listen_once()
+        except Exception as exc:
+            log.warning("realtime LISTEN failed, reconnecting: %s", exc)
+            _stop.wait(2.0)
+
+
+def stop_listener() -> None:
+    _stop.set()
@@ -1,16 +1,8 @@
-import os
 import json
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from openai import OpenAI
-
-
-def _client():
-    key = os.getenv("OPENAI_API_KEY")
-    if not key:
-        return None
-    return OpenAI(api_key=key)
+from app.services import llm_gateway
 
 
 def latest_ritual(db: Session):
@@ -38,9 +30,7 @@ def latest_ritual(db: Session):
 
 def generate_ritual(db: Session):
 
-    client = _client()
-
-    if client is None:
+    if not llm_gateway.is_configured():
         return latest_ritual(db)
 
     prompt = """
@@ -58,16 +48,16 @@ tags
 
     try:
 
-        res = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
+        raw = llm_gateway.chat_text_sync(
+            [
                 {"role":"system","content":"You create short spiritual rituals."},
                 {"role":"user","content":prompt}
             ],
+            model="gpt-4o-mini",
             temperature=0.6
         )
 
-        obj = json.loads(res.choices[0].message.content)
+        obj = json.loads(raw)
 
     except Exception:
         return latest_ritual(db)
@@ -1,21 +1,40 @@
-import json
+import logging
 import os
+import re
+from typing import AsyncIterator
 
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-
-from app.prompts.system_base import build_system_prompt, SANRI_PROMPT_VERSION
-from app.services.ai_service import get_client, generate_sanri_response
-from app.services.memory_service import load_memory, save_memory
-from app.services.profile_service import (
-    load_profile,
-    build_runtime_profile,
-    build_profile_prompt,
-    save_profile,
+
+from starlette.concurrency import run_in_threadpool
+
+from app.prompts.sanri_turn import build_dynamic_tail, build_static_prefix, prefix_version
+from app.prompts.system_base import SANRI_PROMPT_VERSION
+from app.services.ai_service import (
+    generate_sanri_response,
+    generate_sanri_response_sync,
+    stream_sanri_response,
+)
+from app.services.conversation_context import (
+    DAILY_FREE_LIMIT,
+    count_turn,
+    enqueue_conversation_turn,
+    load_conversation_context,
 )
+from app.services.profile_service import build_runtime_profile
+
+log = logging.getLogger("sanri.orchestrator")
 
 MODEL = (os.getenv("OPENAI_MODEL") or "gpt-4.1-mini").strip()
 
+LIMIT_TEXT = (
+    "Bugünlük ücretsiz kullanım sınırına ulaştın. "
+    "Yarın tekrar deneyebilir veya premium erişime geçebilirsin."
+)
+FALLBACK_TEXT = "Sanrı seni duyuyor. Şu an cevap akışı kısa bir sessizlikten geçiyor."
+
+# Akışta cümle sınırı: noktalama + boşluk ya da satır sonu.
+_SENTENCE_BREAK = re.compile(r"[.!?…]\s+|\n")
+
 
 def enforce_no_question_ending(text_resp: str) -> str:
     text_resp = (text_resp or "").strip()
@@ -58,47 +77,74 @@ def enforce_no_question_ending(text_resp: str) -> str:
     return text_resp
 
 
-def get_daily_message_count(db: Session, user_id: int) -> int:
-    try:
-        row = db.execute(
-            text("""
-                SELECT COUNT(*) AS count
-                FROM user_memory
-                WHERE user_id = :uid
-                  AND type = 'user'
-                  AND DATE(created_at) = CURRENT_DATE
-            """),
-            {"uid": user_id},
-        ).mappings().first()
-
-        return int(row["count"]) if row and row.get("count") is not None else 0
-    except Exception as e:
-        print("SANRI DAILY COUNT ERROR =", repr(e))
-        return 0
+def _reply(text_resp: str, session_id: str, prompt_version: str, usage: dict = None) -> dict:
+    return {
+        "answer": text_resp,
+        "response": text_resp,
+        "session_id": session_id,
+        "prompt_version": prompt_version,
+        "title": None,
+        "message": None,
+        "steps": None,
+        "closing": None,
+        "usage": usage,
+    }
 
 
-def check_is_premium(db: Session, user_id: int) -> bool:
-    try:
-        row = db.execute(
-            text("""
-                SELECT is_premium
-                FROM users
-                WHERE id = :uid
-                LIMIT 1
-            """),
-            {"uid": user_id},
-        ).mappings().first()
-
-        if not row:
-            return False
-
-        return bool(row.get("is_premium"))
-    except Exception as e:
-        print("SANRI PREMIUM CHECK ERROR =", repr(e))
-        return False
+def _report_usage(session_id: str, turn: dict, usage: dict) -> None:
+    """İstek başına prompt token raporu; cached_tokens önek isabetini gösterir."""
+    if not usage:
+        return
+    usage["prefix_version"] = turn["prefix_version"]
+    log.info(
+        "sanri turn session=%s prefix=%s prompt_tokens=%d cached_tokens=%d completion_tokens=%d",
+        session_id,
+        turn["prefix_version"],
+        usage.get("prompt_tokens", 0),
+        usage.get("cached_tokens", 0),
+        usage.get("completion_tokens", 0),
+    )
 
 
-def run_sanri(
+def _prepare_turn(
+    db: Session,
+    user_id: int,
+    user_message: str,
+    lang: str,
+    system_context: str,
+    gate_name: str,
+) -> dict:
+    """LLM öncesi DB işi: limit kontrolü, hafıza + profil, prompt kurulumu."""
+    ctx = load_conversation_context(db, user_id)
+    if ctx["limited"]:
+        return {"limited": True}
+    # sayaç yanıt beklenmeden, istek yolunda artar; eşzamanlı istekler de limiti aşamaz
+    count = count_turn(db, user_id)
+    if not ctx["is_premium"] and count is not None and count > DAILY_FREE_LIMIT:
+        return {"limited": True}
+
+    runtime_profile = build_runtime_profile(ctx["profile"], user_message)
+
+    # Statik önek her istekte byte düzeyinde aynı → sağlayıcı prompt cache'i;
+    # kullanıcıya özgü kısım user mesajında yalnızca bir kez yer alır.
+    system_prompt = build_static_prefix(lang or "tr", system_context or "", gate_name or "")
+    user_input = build_dynamic_tail(runtime_profile, ctx["memory_text"], user_message)
+
+    return {
+        "limited": False,
+        "system_prompt": system_prompt,
+        "user_input": user_input,
+        "runtime_profile": runtime_profile,
+        "prefix_version": prefix_version(system_prompt),
+    }
+
+
+def _finish_turn(user_id: int, user_message: str, text_resp: str, runtime_profile: dict) -> None:
+    # hafıza + profil yazımı job_queue worker'ında; yanıt beklemez
+    enqueue_conversation_turn(user_id, user_message, text_resp, runtime_profile)
+
+
+async def run_sanri(
     db: Session,
     user_id: int,
     user_message: str,
@@ -107,141 +153,148 @@ def run_sanri(
     system_context: str = None,
     gate_name: str = None,
 ) -> dict:
-    is_premium = check_is_premium(db, user_id)
-    daily_count = get_daily_message_count(db, user_id)
-
-    if not is_premium and daily_count >= 10:
-        limit_text = (
-            "Bugünlük ücretsiz kullanım sınırına ulaştın. "
-            "Yarın tekrar deneyebilir veya premium erişime geçebilirsin."
-        )
-
-        return {
-            "answer": limit_text,
-            "response": limit_text,
-            "session_id": session_id,
-            "prompt_version": "limit_v1",
-            "title": None,
-            "message": None,
-            "steps": None,
-            "closing": None,
-        }
-
-    memory_text = load_memory(db, user_id)
-    existing_profile = load_profile(db, user_id)
-    runtime_profile = build_runtime_profile(existing_profile, user_message)
-
-    profile_text = json.dumps(runtime_profile, ensure_ascii=False)
-    profile_prompt = build_profile_prompt(runtime_profile)
-
-    lang_instruction = (
-        "Respond in Turkish."
-        if (lang or "tr").lower() == "tr"
-        else "Respond in English."
+    """
+    Async akış: DB adımları threadpool'da, LLM çağrısı event loop'ta beklenir —
+    ağ I/O süresince worker thread tutulmaz.
+    """
+    turn = await run_in_threadpool(
+        _prepare_turn, db, user_id, user_message, lang, system_context, gate_name
     )
+    if turn["limited"]:
+        return _reply(LIMIT_TEXT, session_id, "limit_v1")
 
-    gate_block = ""
-    if system_context:
-        gate_label = gate_name or "Gate"
-        gate_block = (
-            f"\n\nACTIVE GATE: {gate_label}\n"
-            f"GATE INSTRUCTIONS (follow these strictly, they define your tone and behavior for this gate):\n"
-            f"{system_context}\n"
+    usage: dict = {}
+    try:
+        text_resp = await generate_sanri_response(
+            model=MODEL,
+            system_prompt=turn["system_prompt"],
+            user_input=turn["user_input"],
+            usage=usage,
         )
+        text_resp = enforce_no_question_ending(text_resp)
+    except Exception as e:
+        print("SANRI OPENAI ERROR =", repr(e))
+        return _reply(FALLBACK_TEXT, session_id, "fallback_v11")
 
-    system_prompt = (
-        build_system_prompt("user")
-        + "\n\n"
-        + lang_instruction
-        + gate_block
-        + "\n\n"
-        + profile_prompt
-        + "\n\n"
-        + "MEMORY:\n"
-        + memory_text
-        + "\n\n"
-        + "USER PROFILE:\n"
-        + profile_text
-        + "\n\n"
-        + "CRITICAL RULES:\n"
-        + "1. If the user asks what they said before, who said what, or whether you remember, you MUST answer directly from MEMORY.\n"
-        + "2. In memory questions, do NOT become abstract.\n"
-        + "3. If memory exists, use it clearly.\n"
-        + "4. Stay short, human, conscious, and clear — mirror first, not question-first.\n"
-        + "5. Maximum 4 sentences. Do not end every reply with a question; often use none.\n"
-        + "6. NEVER end your response with a question mark.\n"
-        + "7. The last sentence must always be a statement, not a question.\n"
-        + "8. If the user does not want questions, ask zero questions.\n"
-        + "9. Sanri does not interrogate; Sanri makes the pattern visible.\n"
-        + "10. Close with insight, naming, direction, or opening — never a question.\n"
-        + "11. Awakened / gate context: hold city or gate energy in imagery and tone; never interrogate the user.\n"
+    _report_usage(session_id, turn, usage)
+    await run_in_threadpool(
+        _finish_turn, user_id, user_message, text_resp, turn["runtime_profile"]
     )
+    return _reply(text_resp, session_id, SANRI_PROMPT_VERSION, usage or None)
 
-    user_input = f"""
-IMPORTANT:
-
-User profile:
-{profile_text}
 
-Conversation memory:
-{memory_text}
-
-Current user message:
-{user_message}
-
-RULE:
-If the user is asking about past conversation, memory, or recall, answer directly using memory.
-Do NOT go abstract in those cases.
-
-If the user says they do not want questions, do not ask a question.
-Give a direct opening, name the pattern, and suggest one next step.
-
-IMPORTANT ENDING RULE:
-Cevabı soru ile bitirme.
-Son cümle soru değil, net bir ifade olsun.
-Kullanıcı soru istemiyorsa hiç soru sorma.
-
-Now respond:
-""".strip()
+def run_sanri_sync(
+    db: Session,
+    user_id: int,
+    user_message: str,
+    session_id: str,
+    lang: str = "tr",
+    system_context: str = None,
+    gate_name: str = None,
+) -> dict:
+    """Sync handler'lar için (ör. yanki.sanri_reflect)."""
+    turn = _prepare_turn(db, user_id, user_message, lang, system_context, gate_name)
+    if turn["limited"]:
+        return _reply(LIMIT_TEXT, session_id, "limit_v1")
 
+    usage: dict = {}
     try:
-        client = get_client()
-
-        text_resp = generate_sanri_response(
-            client=client,
+        text_resp = generate_sanri_response_sync(
             model=MODEL,
-            system_prompt=system_prompt,
-            user_input=user_input,
+            system_prompt=turn["system_prompt"],
+            user_input=turn["user_input"],
+            usage=usage,
         )
-
         text_resp = enforce_no_question_ending(text_resp)
-
     except Exception as e:
         print("SANRI OPENAI ERROR =", repr(e))
+        return _reply(FALLBACK_TEXT, session_id, "fallback_v11")
+
+    _report_usage(session_id, turn, usage)
+    _finish_turn(user_id, user_message, text_resp, turn["runtime_profile"])
+    return _reply(text_resp, session_id, SANRI_PROMPT_VERSION, usage or None)
+
+
+def _split_settled(buf: str) -> tuple[str, str]:
+    """
+    buf'u (gönderilebilir kısım, son cümle) olarak böl. Son cümle akış bitene
+    kadar tutulur; enforce_no_question_ending yalnızca onu değiştirebilir.
+    Arkasından metin gelmeyen sınır ("...?\n" gibi) bölmez — o cümle son
+    cümle olabilir.
+    """
+    last = None
+    for m in _SENTENCE_BREAK.finditer(buf):
+        if buf[m.end():].strip():
+            last = m
+    if last is None:
+        return "", buf
+    return buf[: last.end()], buf[last.end():]
+
+
+async def stream_sanri(
+    db: Session,
+    user_id: int,
+    user_message: str,
+    session_id: str,
+    lang: str = "tr",
+    system_context: str = None,
+    gate_name: str = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    run_sanri'nin akış hali. LLM öncesi DB işi burada, isteğin session'ı ile
+    yapılır; dönen olay akışı ("delta" / "replace" / "done") isteğin session'ına dokunmaz —
+    StreamingResponse gövdesi Depends(get_db) kapandıktan sonra çalışır.
+    """
+    turn = await run_in_threadpool(
+        _prepare_turn, db, user_id, user_message, lang, system_context, gate_name
+    )
+    return _sanri_events(turn, user_id, user_message, session_id)
 
-        fallback_text = "Sanrı seni duyuyor. Şu an cevap akışı kısa bir sessizlikten geçiyor."
-
-        return {
-            "answer": fallback_text,
-            "response": fallback_text,
-            "session_id": session_id,
-            "prompt_version": "fallback_v11",
-            "title": None,
-            "message": None,
-            "steps": None,
-            "closing": None,
-        }
-
-    save_memory(db, user_id, user_message, text_resp)
-    save_profile(db, user_id, runtime_profile)
 
-    return {
-        "answer": text_resp,
-        "response": text_resp,
-        "session_id": session_id,
-        "prompt_version": SANRI_PROMPT_VERSION,
-        "title": None,
-        "message": None,
-        "steps": None,
-        "closing": None,
-    }
\ No newline at end of file
+async def _sanri_events(
+    turn: dict,
+    user_id: int,
+    user_message: str,
+    session_id: str,
+) -> AsyncIterator[tuple[str, dict]]:
+    if turn["limited"]:
+        yield "delta", {"text": LIMIT_TEXT}
+        yield "done", _reply(LIMIT_TEXT, session_id, "limit_v1")
+        return
+
+    sent = ""
+    pending = ""
+    usage: dict = {}
+    try:
+        async for delta in stream_sanri_response(
+            model=MODEL,
+            system_prompt=turn["system_prompt"],
+            user_input=turn["user_input"],
+            usage=usage,
+        ):
+            if not sent and not pending:
+                delta = delta.lstrip()
+            ready, pending = _split_settled(pending + delta)
+            if ready:
+                sent += ready
+                yield "delta", {"text": ready}
+
+        text_resp = enforce_no_question_ending(sent + pending) or "Sanrı seni duydu."
+    except Exception as e:
+        print("SANRI OPENAI STREAM ERROR =", repr(e))
+        yield "done", _reply(FALLBACK_TEXT, session_id, "fallback_v11")
+        return
+
+    # Son cümle düzeltilmiş haliyle gider; gönderilen önek değiştiyse istemci
+    # "replace" ile tüm metni alır. "done" her zaman nihai metni taşır.
+    if text_resp.startswith(sent):
+        if len(text_resp) > len(sent):
+            yield "delta", {"text": text_resp[len(sent):]}
+    else:
+        yield "replace", {"text": text_resp}
+
+    _report_usage(session_id, turn, usage)
+    await run_in_threadpool(
+        _finish_turn, user_id, user_message, text_resp, turn["runtime_profile"]
+    )
+    yield "done", _reply(text_resp, session_id, SANRI_PROMPT_VERSION, usage or None)
@@ -0,0 +1,395 @@
+"""
+Birleşik zamanlayıcı — tek iş kayıt defteri, DB job store, kira tabanlı lider seçimi.
+
+Her uvicorn worker'ı `start_scheduler()` çağırır ama yalnızca `scheduler_leases`
+kirasını tutan süreç APScheduler'ı çalıştırır; diğerleri kirayı izler.
+Kira LEASE_TTL_SEC içinde yenilenmezse başka bir süreç devralır. APScheduler
+job store'u (apscheduler_jobs) DB'de olduğu için devralan süreç sonraki çalışma
+zamanlarını ve kaçırılan (misfire) işleri kaldığı yerden sürdürür.
+
+Her çalışma `scheduler_runs` tablosuna süre/sonuç ile yazılır;
+/health/scheduler kira sahibini ve iş başına gecikme geçmişini gösterir.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.db import SessionLocal, engine
+from app.services import feed_scheduler as feed
+
+log = logging.getLogger("sanri.scheduler")
+
+LEASE_NAME = "scheduler"
+LEASE_TTL_SEC = int(os.getenv("SANRI_SCHEDULER_LEASE_TTL", "60"))
+RENEW_EVERY_SEC = max(5, LEASE_TTL_SEC // 3)
+HISTORY_LIMIT = int(os.getenv("SANRI_SCHEDULER_HISTORY", "10"))
+RUN_RETENTION_DAYS = 30
+
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _env_on(name: str, default: str = "1") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _purge_scheduler_runs(db) -> None:
+    db.execute(
+        text("DELETE FROM scheduler_runs WHERE started_at < :cutoff"),
+        {"cutoff": datetime.utcnow() - timedelta(days=RUN_RETENTION_DAYS)},
+    )
+    db.commit()
+
+
+# ----------------------------------------------------
+# registry — tüm zamanlanmış işler burada
+# ----------------------------------------------------
+
+JOBS: dict[str, dict] = {
+    "morning_feed": {"fn": feed.morning_feed, "trigger": "cron", "args": {"hour": 6, "minute": 0}},
+    "midday_feed": {"fn": feed.midday_feed, "trigger": "cron", "args": {"hour": 12, "minute": 0}},
+    "night_feed": {"fn": feed.night_feed, "trigger": "cron", "args": {"hour": 21, "minute": 0}},
+    "daily_feeling_morning": {"fn": feed.daily_feeling_job, "trigger": "cron", "args": {"hour": 8, "minute": 0}},
+    "daily_feeling_evening": {"fn": feed.daily_feeling_job, "trigger": "cron", "args": {"hour": 20, "minute": 0}},
+    "welcome_emails": {"fn": feed.welcome_email_job, "trigger": "interval", "args": {"hours": 2}},
+    "llm_cache_purge": {"fn": feed.llm_cache_purge_job, "trigger": "cron", "args": {"hour": 4, "minute": 30}},
+    "embedding_cache_purge": {"fn": feed.embedding_cache_purge_job, "trigger": "cron", "args": {"hour": 4, "minute": 35}},
+    "job_queue_purge": {"fn": feed.job_queue_purge_job, "trigger": "cron", "args": {"hour": 4, "minute": 45}},
+    "scheduler_runs_purge": {"fn": _purge_scheduler_runs, "trigger": "cron", "args": {"hour": 4, "minute": 50}},
+    "pageview_rollup": {"fn": feed.pageview_rollup_job, "trigger": "interval", "args": {"minutes": 1}},
+    "global_signal_echoes": {"fn": feed.global_signal_echo_job, "trigger": "interval", "args": {"minutes": 1}},
+    "events_backfill": {"fn": feed.events_backfill_job, "trigger": "interval", "args": {"minutes": 5}},
+    "bank_temp_sweep": {
+        "fn": feed.bank_temp_sweep_job,
+        "trigger": "interval",
+        "args": {"minutes": 1},
+        "enabled": _env_on("BANK_TRANSFER_TEMP_SWEEP"),
+    },
+}
+
+
+def _enabled_jobs() -> dict[str, dict]:
+    return {k: v for k, v in JOBS.items() if v.get("enabled", True)}
+
+
+_TRIGGERS = {"cron": CronTrigger, "interval": IntervalTrigger}
+
+
+def _build_trigger(spec: dict):
+    return _TRIGGERS[spec["trigger"]](**spec["args"])
+
+
+# ----------------------------------------------------
+# lease
+# ----------------------------------------------------
+
+_state_lock = threading.Lock()
+_lease_until: Optional[datetime] = None
+_scheduler: Optional[BackgroundScheduler] = None
+_stop = threading.Event()
+_elector: Optional[threading.Thread] = None
+
+
+def _try_acquire_lease() -> bool:
+    """Kirayı al ya da yenile. Süresi dolmuş kira başkasınınsa devralınır."""
+    global _lease_until
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=LEASE_TTL_SEC)
+    db = SessionLocal()
+    try:
+        res = db.execute(
+            text("""
+                UPDATE scheduler_leases
+                SET holder = :me,
+                    acquired_at = CASE WHEN holder = :me THEN acquired_at ELSE :now END,
+                    expires_at = :exp
+                WHERE name = :name AND (holder = :me OR expires_at < :now)
+            """),
+            {"me": NODE_ID, "now": now, "exp": expires, "name": LEASE_NAME},
+        )
+        if not res.rowcount:
+            try:
+                db.execute(
+                    text("""
+                        INSERT INTO scheduler_leases (name, holder, acquired_at, expires_at)
+                        VALUES (:name, :me, :now, :exp)
+                    """),
+                    {"me": NODE_ID, "now": now, "exp": expires, "name": LEASE_NAME},
+                )
+            except IntegrityError:
+                db.rollback()
+                _lease_until = None
+                return False
+        db.commit()
+        _lease_until = expires
+        return True
+    except Exception as exc:
+        db.rollback()
+        log.warning("scheduler lease renew failed: %s", exc)
+        _lease_until = None
+        return False
+    finally:
+        db.close()
+
+
+def _release_lease() -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            text("UPDATE scheduler_leases SET expires_at = :now WHERE name = :name AND holder = :me"),
+            {"now": datetime.utcnow(), "name": LEASE_NAME, "me": NODE_ID},
+        )
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        log.warning("scheduler lease release failed: %s", exc)
+    finally:
+        db.close()
+
+
+def is_leader() -> bool:
+    return _lease_until is not None and datetime.utcnow() < _lease_until
+
+
+# ----------------------------------------------------
+# run + history
+# ----------------------------------------------------
+
+def run_registered(job_id: str) -> None:
+    """APScheduler'ın DB job store'unda saklanan tek giriş noktası."""
+    spec = JOBS.get(job_id)
+    if spec is None:
+        log.warning("Scheduler job '%s' not in registry, skipping", job_id)
+        return
+    if not is_leader():
+        # kira bu arada kaybedildiyse çift çalışmayı önle
+        log.warning("Scheduler job '%s' skipped: lease not held by %s", job_id, NODE_ID)
+        return
+
+    started = datetime.utcnow()
+    t0 = time.perf_counter()
+    ok, error = True, None
+    db = SessionLocal()
+    try:
+        spec["fn"](db)
+        log.info("Scheduler job '%s' completed", job_id)
+    except Exception as exc:
+        db.rollback()
+        ok, error = False, str(exc)[:500]
+        log.exception("Scheduler job '%s' failed: %s", job_id, exc)
+    finally:
+        db.close()
+
+    _record_run(job_id, started, int((time.perf_counter() - t0) * 1000), ok, error)
+
+
+def _record_run(job_id: str, started: datetime, duration_ms: int, ok: bool, error: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            text("""
+                INSERT INTO scheduler_runs (job_id, node, started_at, duration_ms, ok, error)
+                VALUES (:job_id, :node, :started, :ms, :ok, :error)
+            """),
+            {"job_id": job_id, "node": NODE_ID, "started": started, "ms": duration_ms, "ok": ok, "error": error},
+        )
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        log.warning("scheduler run record failed for %s: %s", job_id, exc)
+    finally:
+        db.close()
+
+
+# ----------------------------------------------------
+# lifecycle
+# ----------------------------------------------------
+
+def _start_local_scheduler() -> None:
+    global _scheduler
+    sched = BackgroundScheduler(
+        jobstores={"default": SQLAlchemyJobStore(engine=engine, tablename="apscheduler_jobs")},
+        job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 300},
+    )
+    sched.start(paused=True)
+    try:
+        enabled = _enabled_jobs()
+        for job in sched.get_jobs():
+            if job.id not in enabled:
+                job.remove()
+        for job_id, spec in enabled.items():
+            trigger = _build_trigger(spec)
+            existing = sched.get_job(job_id)
+            if existing is not None and existing.func is run_registered and existing.args == (job_id,):
+                # Kayıtlı next_run_time korunur (kaçırılan çalışmalar resume'da işlenir);
+                # yalnızca takvim değiştiyse yeniden hesaplanır.
+                if str(existing.trigger) != str(trigger):
+                    sched.reschedule_job(job_id, trigger=trigger)
+                continue
+            sched.add_job(run_registered, trigger, args=[job_id], id=job_id, replace_existing=True)
+
+        sched.resume()
+    except Exception:
+        # başlatılmış scheduler thread'i sızmasın; elector sonraki turda yeniden dener
+        sched.shutdown(wait=False)
+        raise
+    _scheduler = sched
+    log.info("Scheduler leader %s started with %d jobs", NODE_ID, len(sched.get_jobs()))
+
+
+def _detach_local_scheduler() -> Optional[BackgroundScheduler]:
+    """_state_lock altında çağrılır; durdurma kilit dışında yapılır (bkz. _shutdown)."""
+    global _scheduler
+    sched, _scheduler = _scheduler, None
+    return sched
+
+
+def _shutdown(sched: Optional[BackgroundScheduler]) -> None:
+    # wait=True: çalışan iş bitmeden dönmez, yeni lider aynı işi paralel başlatmasın.
+    # Kilit dışında çünkü iş thread'i unschedule() ile _state_lock alabilir.
+    if sched is None:
+        return
+    try:
+        sched.shutdown(wait=True)
+    except Exception as exc:
+        log.warning("Scheduler shutdown failed: %s", exc)
+    log.info("Scheduler stopped on %s", NODE_ID)
+
+
+def _elect_loop() -> None:
+    while not _stop.is_set():
+        held = _try_acquire_lease()
+        lost = None
+        with _state_lock:
+            if held and _scheduler is None:
+                try:
+                    _start_local_scheduler()
+                except Exception as exc:
+                    log.warning("Scheduler start failed: %s", exc)
+            elif not held and _scheduler is not None:
+                log.warning("Scheduler lease lost by %s", NODE_ID)
+                lost = _detach_local_scheduler()
+        _shutdown(lost)
+        _stop.wait(RENEW_EVERY_SEC)
+
+
+def unschedule(job_id: str) -> None:
+    """İşini bitiren job kendini çalışan takvimden çıkarır (ör. tek seferlik backfill)."""
+    with _state_lock:
+        if _scheduler is not None and _scheduler.get_job(job_id) is not None:
+            _scheduler.remove_job(job_id)
+            log.info("Scheduler job '%s' unscheduled", job_id)
+
+
+def start_scheduler() -> None:
+    """Her süreçte çağrılır; yalnızca kirayı alan süreç işleri çalıştırır."""
+    global _elector
+    if _elector is not None and _elector.is_alive():
+        log.info("Scheduler elector already running, skipping")
+        return
+    _stop.clear()
+    _elector = threading.Thread(target=_elect_loop, name="sanri-scheduler-elector", daemon=True)
+    _elector.start()
+
+
+def stop_scheduler() -> None:
+    global _lease_until
+    _stop.set()
+    with _state_lock:
+        sched = _detach_local_scheduler()
+    _shutdown(sched)
+    if sched is not None:
+        # çalışan iş bittikten sonra bırakılır
+        _release_lease()
+    _lease_until = None
+
+
+# ----------------------------------------------------
+# health
+# ----------------------------------------------------
+
+def _iso(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def get_scheduler_health() -> dict:
+    """Returns scheduler status for the /health/scheduler endpoint."""
+    db = SessionLocal()
+    try:
+        lease = db.execute(
+            text("SELECT holder, acquired_at, expires_at FROM scheduler_leases WHERE name = :name"),
+            {"name": LEASE_NAME},
+        ).mappings().first()
+
+        next_runs = {}
+        try:
+            for r in db.execute(text("SELECT id, next_run_time FROM apscheduler_jobs")).mappings():
+                nrt = r["next_run_time"]
+                next_runs[r["id"]] = datetime.utcfromtimestamp(nrt).isoformat() if nrt else None
+        except Exception:
+            db.rollback()
+
+        jobs = []
+        for job_id, spec in JOBS.items():
+            runs = db.execute(
+                text("""
+                    SELECT node, started_at, duration_ms, ok, error
+                    FROM scheduler_runs
+                    WHERE job_id = :job_id
+                    ORDER BY id DESC
+                    LIMIT :limit
+                """),
+                {"job_id": job_id, "limit": HISTORY_LIMIT},
+            ).mappings().all()
+            durations = [int(r["duration_ms"]) for r in runs]
+            jobs.append({
+                "id": job_id,
+                "enabled": spec.get("enabled", True),
+                "trigger": spec["trigger"],
+                "schedule": spec["args"],
+                "next_run_utc": next_runs.get(job_id),
+                "latency_ms": {
+                    "last": durations[0] if durations else None,
+                    "avg": round(sum(durations) / len(durations)) if durations else None,
+                    "max": max(durations) if durations else None,
+                },
+                "history": [
+                    {
+                        "node": r["node"],
+                        "started_at": _iso(r["started_at"]),
+                        "duration_ms": int(r["duration_ms"]),
+                        "ok": bool(r["ok"]),
+                        "error": r["error"],
+                    }
+                    for r in runs
+                ],
+            })
+    finally:
+        db.close()
+
+    return {
+        "node": NODE_ID,
+        "is_leader": is_leader(),
+        "running": _scheduler is not None and _scheduler.running,
+        "lease": {
+            "holder": lease["holder"],
+            "acquired_at": _iso(lease["acquired_at"]),
+            "expires_at": _iso(lease["expires_at"]),
+        } if lease else None,
+        "jobs": jobs,
+    }
@@ -6,7 +6,7 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
-from openai import OpenAI
+from app.services import llm_gateway
 
 
 # ----------------------------------------------------
@@ -20,13 +20,6 @@ def _normalize_lang(lang: str) -> str:
     return lang
 
 
-def _openai_client() -> Optional[OpenAI]:
-    key = (os.getenv("OPENAI_API_KEY") or "").strip()
-    if not key:
-        return None
-    return OpenAI(api_key=key, timeout=60)
-
-
 def _model_name() -> str:
     return (os.getenv("OPENAI_MODEL") or "gpt-4o-mini").strip()
 
@@ -242,8 +235,7 @@ def generate_and_store_feed(db: Optional[Session], lang: str = "tr") -> Dict[str
 def _generate_item(lang: str = "tr") -> Dict[str, Any]:
     lang = _normalize_lang(lang)
 
-    client = _openai_client()
-    if client is None:
+    if not llm_gateway.is_configured():
         stub = _stub_feed(lang)
         stub["warning"] = "OPENAI_KEY_MISSING"
         return stub
@@ -279,17 +271,16 @@ def _generate_item(lang: str = "tr") -> Dict[str, Any]:
     }
 
     try:
-        resp = client.chat.completions.create(
-            model=_model_name(),
-            messages=[
+        raw = llm_gateway.chat_text_sync(
+            [
                 {"role": "system", "content": system},
                 {"role": "user", "content": json.dumps(user, ensure_ascii=False)},
             ],
+            model=_model_name(),
             temperature=0.6,
             max_tokens=500,
+            timeout=60,
         )
-
-        raw = (resp.choices[0].message.content or "").strip()
         raw = _strip_code_fences(raw)
         obj = _safe_json(raw)
 
@@ -0,0 +1,69 @@
+"""
+Kullanıcı satırı önbelleği — kimlik doğrulamalı her istekte users SELECT'ini keser.
+
+get_current_user / get_current_admin (app/routes/auth.py) ve token'dan e-posta
+çözen yardımcılar satırı buradan okur. Kayıtlar USER_CACHE_TTL_SEC kadar
+tutulur; rol, e-posta, 2FA veya premium değişikliği yapan yazım yolları
+`invalidate_user(user_id)` çağırır. Diğer yazıcılar için bayatlık TTL ile sınırlı.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+USER_CACHE_TTL_SEC = float(os.getenv("SANRI_USER_CACHE_TTL", "30"))
+USER_CACHE_MAX = int(os.getenv("SANRI_USER_CACHE_MAX", "20000"))
+
+_lock = threading.Lock()
+_rows: "OrderedDict[int, tuple[float, Optional[dict]]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def get_user_row(db: Session, user_id: int) -> Optional[dict]:
+    """{id, email, role, two_fa_enabled, created_at} ya da None (kopya döner)."""
+    uid = int(user_id)
+    now = time.monotonic()
+    with _lock:
+        hit = _rows.get(uid)
+        if hit is not None and hit[0] > now:
+            _rows.move_to_end(uid)
+            _stats["hits"] += 1
+            return dict(hit[1]) if hit[1] is not None else None
+        _stats["misses"] += 1
+
+    row = db.execute(
+        text("""
+            SELECT id, email, role, two_fa_enabled, created_at
+            FROM users
+            WHERE id = :uid
+            LIMIT 1
+        """),
+        {"uid": uid},
+    ).mappings().first()
+    value = dict(row) if row else None
+
+    with _lock:
+        _rows[uid] = (now + USER_CACHE_TTL_SEC, value)
+        _rows.move_to_end(uid)
+        while len(_rows) > USER_CACHE_MAX:
+            _rows.popitem(last=False)
+    return dict(value) if value is not None else None
+
+
+def invalidate_user(user_id: Optional[int]) -> None:
+    if not user_id:
+        return
+    with _lock:
+        if _rows.pop(int(user_id), None) is not None:
+            _stats["invalidations"] += 1
+
+
+def get_user_cache_stats() -> dict:
+    with _lock:
+        return {"entries": len(_rows), "ttl_sec": USER_CACHE_TTL_SEC, **_stats}
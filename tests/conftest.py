@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+# app.db DATABASE_URL'i import anında okur; uygulama modüllerinden önce ayarlanmalı.
+_DB_DIR = tempfile.mkdtemp(prefix="sanri-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/test.db"
+
+import pytest  # noqa: E402
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+import app.models  # noqa: E402,F401
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _schema():
+    Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
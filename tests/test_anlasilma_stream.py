@@ -0,0 +1,39 @@
+import asyncio
+import json
+from datetime import datetime
+
+from app.models.anlasilma_field import AnlasilmaChatMessage, AnlasilmaChatRoom
+from app.routes.anlasilma_alani import MESSAGES_PAGE, chat_stream
+
+
+async def _read_messages(room_id, session_id, after_id, n):
+    response = await chat_stream(room_id=room_id, session_id=session_id, after_id=after_id)
+    frames = response.body_iterator
+    out = []
+    try:
+        while len(out) < n:
+            frame = await asyncio.wait_for(frames.__anext__(), timeout=5)
+            if frame.startswith("event: message"):
+                out.append(json.loads(frame.split("data: ", 1)[1]))
+    finally:
+        await frames.aclose()
+    return out
+
+
+def test_stream_backlog_pages_past_one_page(db):
+    now = datetime.utcnow()
+    room = AnlasilmaChatRoom(session_a="stream-a-001", session_b="stream-b-001", frequency_hz=528, created_at=now, is_active=True)
+    db.add(room)
+    db.commit()
+    total = MESSAGES_PAGE * 2 + 7
+    db.add_all(
+        AnlasilmaChatMessage(room_id=room.id, from_session="stream-b-001", body=f"m{i}", created_at=now)
+        for i in range(total)
+    )
+    db.commit()
+
+    got = asyncio.run(_read_messages(room.id, "stream-a-001", 0, total))
+
+    assert [m["body"] for m in got] == [f"m{i}" for i in range(total)]
+    ids = [m["id"] for m in got]
+    assert ids == sorted(set(ids))
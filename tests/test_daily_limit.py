@@ -0,0 +1,18 @@
+from app.services import sanri_orchestrator as orch
+from app.services.conversation_context import DAILY_FREE_LIMIT, count_turn
+
+
+def test_count_turn_is_atomic_upsert(db):
+    assert count_turn(db, 90001) == 1
+    assert count_turn(db, 90001) == 2
+
+
+def test_free_limit_enforced_on_request_path(db, monkeypatch):
+    ctx = {"is_premium": False, "limited": False, "profile": {}, "memory_text": ""}
+    monkeypatch.setattr(orch, "load_conversation_context", lambda db, uid: dict(ctx))
+    monkeypatch.setattr(orch, "build_runtime_profile", lambda profile, msg: {})
+
+    results = [orch._prepare_turn(db, 90002, "selam", "tr", "", "")["limited"] for _ in range(DAILY_FREE_LIMIT + 1)]
+
+    # kuyruk hiç çalışmasa da sayaç istek yolunda artar
+    assert results == [False] * DAILY_FREE_LIMIT + [True]
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from app.services import embedding_store, llm_gateway
+
+
+def test_short_provider_response_fails_every_waiter(monkeypatch):
+    async def short(texts, *, model=None):
+        return [[0.1, 0.2]] * (len(texts) - 1)
+
+    monkeypatch.setattr(llm_gateway, "embed_many", short)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(
+                embedding_store.embed("kısa yanıt bir"),
+                embedding_store.embed("kısa yanıt iki"),
+                return_exceptions=True,
+            ),
+            timeout=5,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_short_provider_response_sync(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "embed_many_sync", lambda texts, *, model=None: [])
+    with pytest.raises(RuntimeError):
+        embedding_store.embed_many_sync(["senkron bir", "senkron iki"])
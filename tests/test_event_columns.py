@@ -0,0 +1,17 @@
+from app.services.event_columns import typed_columns
+
+
+def test_fallback_keys_only_for_their_actions():
+    meta = {"session_id": "s1", "page": "/home", "seconds": 12, "duration_sec": 30}
+
+    assert typed_columns("screen_view", meta)["screen"] == "/home"
+    assert typed_columns("time_spent", meta)["screen"] is None
+    assert typed_columns("heartbeat", meta)["screen"] is None
+
+    assert typed_columns("time_spent", meta)["duration_sec"] == 12.0
+    assert typed_columns("heartbeat", meta)["duration_sec"] == 30.0
+    assert typed_columns("heartbeat", {"seconds": 12})["duration_sec"] is None
+
+
+def test_screen_key_wins_over_page():
+    assert typed_columns("page_view", {"screen": "home", "page": "/x"})["screen"] == "home"
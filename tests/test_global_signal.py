@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+import app.main
+from app.routes.global_signal import similarity_score
+
+client = TestClient(app.main.app)
+
+
+def _send(text, user_id):
+    r = client.post("/global-signal/send", json={"text": text, "user_id": user_id})
+    assert r.json()["ok"], r.text
+    return r.json()["signal"]
+
+
+def test_echo_scores_match_full_scan_for_long_texts():
+    long_word = "x" * 80
+    base = " ".join(f"kelime{i}" for i in range(100)) + " " + long_word
+    other = " ".join(f"kelime{i}" for i in range(60)) + " " + long_word
+
+    a = _send(base, "gs-long-a")
+    b = _send(other, "gs-long-b")
+
+    r = client.post("/global-signal/process-echoes", params={"force": True}).json()
+    notif = next(n for n in r["notifications"] if n["signal_id"] == a["id"])
+    scores = {m["signal_id"]: m["score"] for m in notif["items"]}
+
+    assert scores[b["id"]] == round(similarity_score(base, other), 3)
@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+
+from app.models.funnel_event import FunnelEvent
+from app.routes.funnel import EventIn, _funnel_row
+from app.services.ingest_buffer import IngestBuffer
+
+
+def _row(i, **over):
+    row = {
+        "event_type": "landing_view",
+        "session_id": f"s-{i}",
+        "source": "direct",
+        "device_type": "unknown",
+        "extra": None,
+        "created_at": datetime.now(timezone.utc),
+    }
+    row.update(over)
+    return row
+
+
+def test_flush_drops_only_the_poison_row(db):
+    buf = IngestBuffer("funnel_events_test", FunnelEvent.__table__)
+    rows = [_row(i) for i in range(20)]
+    rows[7] = _row(7, event_type=None)  # NOT NULL ihlali
+    assert buf.add_many(rows)
+
+    assert buf.flush() == 19
+    assert len(buf) == 0
+    assert buf.stats["dead_lettered"] == 1
+    written = db.query(func.count(FunnelEvent.id)).filter(FunnelEvent.session_id.like("s-%")).scalar()
+    assert written == 19
+
+    # sonraki flush'lar temiz
+    assert buf.add(_row(99))
+    assert buf.flush() == 1
+
+
+def test_funnel_row_truncates_to_column_sizes():
+    row = _funnel_row(
+        EventIn(event_type="landing_view", session_id="x" * 500, source="s" * 100, device_type="d" * 100, extra="e" * 2000),
+        datetime.now(timezone.utc),
+    )
+    assert len(row["session_id"]) == 128
+    assert len(row["source"]) == 64
+    assert len(row["device_type"]) == 32
+    assert len(row["extra"]) == 512
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from app.models.background_job import BackgroundJob
+from app.services import job_queue
+
+
+def _running(db, attempts, max_attempts, worker="w-old"):
+    job = BackgroundJob(
+        kind="test.noop",
+        payload="{}",
+        status="running",
+        attempts=attempts,
+        max_attempts=max_attempts,
+        locked_by=worker,
+        locked_at=datetime.utcnow() - timedelta(seconds=job_queue.LEASE_SEC + 60),
+    )
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_reap_dead_letters_exhausted_jobs(db, monkeypatch):
+    exhausted = _running(db, attempts=3, max_attempts=3)
+    retryable = _running(db, attempts=1, max_attempts=3)
+    monkeypatch.setattr(job_queue, "_last_reap", 0.0)
+
+    job_queue._reap_stale(db)
+
+    db.expire_all()
+    dead = db.get(BackgroundJob, exhausted)
+    assert dead.status == "dead"
+    assert dead.finished_at is not None and "lease expired" in dead.last_error
+    assert db.get(BackgroundJob, retryable).status == "pending"
+
+
+def test_finish_ignores_a_reaped_run(db):
+    job_id = _running(db, attempts=1, max_attempts=3, worker="w-new")
+
+    assert not job_queue._finish(db, job_id, "w-old", status="done", finished_at=datetime.utcnow(), last_error=None)
+    db.commit()
+    db.expire_all()
+    assert db.get(BackgroundJob, job_id).status == "running"
+
+    assert job_queue._finish(db, job_id, "w-new", status="done", finished_at=datetime.utcnow(), last_error=None)
+    db.commit()
+    db.expire_all()
+    assert db.get(BackgroundJob, job_id).status == "done"
@@ -0,0 +1,20 @@
+from app.services import llm_cache
+
+
+def test_key_keeps_case_by_default():
+    a = llm_cache.make_key("matrix_sections", "m", "v", "AYŞE", "1990-01-01")
+    b = llm_cache.make_key("matrix_sections", "m", "v", "ayşe", "1990-01-01")
+    assert a != b
+    assert llm_cache.make_key("ns", "m", "v", "Işık") != llm_cache.make_key("ns", "m", "v", "ışık")
+
+
+def test_key_normalizes_whitespace():
+    a = llm_cache.make_key("ns", "m", "v", "  Ayşe \n Yılmaz ")
+    b = llm_cache.make_key("ns", "m", "v", "Ayşe Yılmaz")
+    assert a == b
+
+
+def test_casefold_opt_in():
+    a = llm_cache.make_key("field_moderation", "m", "v", "Merhaba Dünya", casefold=True)
+    b = llm_cache.make_key("field_moderation", "m", "v", "merhaba dünya", casefold=True)
+    assert a == b
@@ -0,0 +1,93 @@
+import threading
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import or_
+
+import app.main
+from app.models.anlasilma_field import AnlasilmaChatRoom, AnlasilmaPresence
+from app.services import matchmaker
+
+HZ = 639
+
+client = TestClient(app.main.app)
+
+
+def _presence(db, session_id):
+    now = datetime.utcnow()
+    db.add(AnlasilmaPresence(
+        session_id=session_id,
+        frequency_hz=HZ,
+        intent_text="test",
+        wants_chat=False,
+        last_seen_at=now,
+        created_at=now,
+    ))
+    db.commit()
+
+
+def _queue(session_id):
+    r = client.post("/api/anlasilma/chat/queue", json={"session_id": session_id, "frequency_hz": HZ})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _rooms(db, session_id):
+    return (
+        db.query(AnlasilmaChatRoom)
+        .filter(
+            AnlasilmaChatRoom.is_active.is_(True),
+            or_(AnlasilmaChatRoom.session_a == session_id, AnlasilmaChatRoom.session_b == session_id),
+        )
+        .all()
+    )
+
+
+def test_concurrent_queue_for_same_session_pairs_once(db):
+    for i in range(10):
+        me, peer, late = f"me-{i:04d}-xx", f"peer-{i:04d}-xx", f"late-{i:04d}-xx"
+        for sid in (me, peer, late):
+            _presence(db, sid)
+
+        assert _queue(me)["status"] == "waiting"
+
+        barrier = threading.Barrier(2)
+        results = {}
+
+        def call(sid):
+            barrier.wait()
+            results[sid] = _queue(sid)
+
+        threads = [threading.Thread(target=call, args=(sid,)) for sid in (peer, me)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results[peer]["status"] == "paired"
+        # `me`in ikinci isteği ya mevcut odayı döner ya da (eşleşmeden önce) kuyrukta kalır
+        assert results[me]["status"] in ("paired", "waiting")
+        if results[me]["status"] == "paired":
+            assert results[me]["room_id"] == results[peer]["room_id"]
+
+        # eşleşmiş oturum kuyruğa geri girmemiş olmalı: geç gelen onunla eşleşemez
+        assert _queue(late)["status"] == "waiting"
+        db.expire_all()
+        assert len(_rooms(db, me)) == 1
+        assert _rooms(db, late) == []
+
+        matchmaker.leave(late)
+        db.query(AnlasilmaPresence).filter(AnlasilmaPresence.session_id == late).update({"wants_chat": False})
+        db.commit()
+
+
+def test_queue_returns_existing_room(db):
+    a, b = "exist-a-0001", "exist-b-0001"
+    for sid in (a, b):
+        _presence(db, sid)
+    assert _queue(a)["status"] == "waiting"
+    first = _queue(b)
+    assert first["status"] == "paired"
+
+    again = _queue(a)
+    assert again == {"status": "paired", "room_id": first["room_id"], "message": "Zaten bir bağ odasındasın."}
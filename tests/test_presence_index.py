@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.models.anlasilma_field import AnlasilmaPresence
+from app.services import presence_index
+
+
+def test_sessions_moved_by_another_worker_are_dropped(db):
+    hz, other = 741, 852
+    now = datetime.utcnow()
+    cutoff = now - timedelta(minutes=15)
+    vec = np.ones(8, dtype=np.float32)
+    for sid in ("pi-stay-0001", "pi-move-0001"):
+        db.add(AnlasilmaPresence(
+            session_id=sid, frequency_hz=hz, intent_text="t",
+            embedding_blob=presence_index.to_blob(vec), last_seen_at=now, created_at=now,
+        ))
+    db.commit()
+    presence_index.sync(db, hz, cutoff, force=True)
+    assert presence_index.active_count(hz, cutoff) == 2
+
+    # başka bir worker oturumu taşıdı; bu sürecin indeksi habersiz
+    db.query(AnlasilmaPresence).filter(AnlasilmaPresence.session_id == "pi-move-0001").update({"frequency_hz": other})
+    db.commit()
+
+    hits = presence_index.top_k_verified(db, hz, vec, cutoff, k=2)
+    assert [sid for sid, _ in hits] == ["pi-stay-0001"]
+
+    presence_index.upsert(hz, "pi-move-0001", vec, now)  # bayat kopya geri gelse bile
+    presence_index.sync(db, hz, cutoff, force=True)
+    assert presence_index.active_count(hz, cutoff) == 1
@@ -0,0 +1,42 @@
+import asyncio
+
+from app.services import sanri_orchestrator as orch
+
+
+def _run(chunks, monkeypatch):
+    async def fake_stream(**kwargs):
+        for c in chunks:
+            yield c
+
+    monkeypatch.setattr(orch, "stream_sanri_response", fake_stream)
+    monkeypatch.setattr(orch, "_report_usage", lambda *a: None)
+    monkeypatch.setattr(orch, "_finish_turn", lambda *a: None)
+
+    async def collect():
+        turn = {"limited": False, "system_prompt": "", "user_input": "", "runtime_profile": {}}
+        return [e async for e in orch._sanri_events(turn, 1, "selam", "s1")]
+
+    return asyncio.run(collect())
+
+
+def _client_text(events):
+    text = ""
+    for event, data in events:
+        if event == "delta":
+            text += data["text"]
+        elif event == "replace":
+            text = data["text"]
+    return text
+
+
+def test_trailing_question_is_held_back_until_the_end(monkeypatch):
+    events = _run(["Merhaba. ", "Nasılsın?", "\n"], monkeypatch)
+    assert events[-1][0] == "done"
+    assert events[-1][1]["answer"] == "Merhaba. Nasılsın."
+    assert _client_text(events) == "Merhaba. Nasılsın."
+    assert "Nasılsın?" not in "".join(d["text"] for e, d in events if e == "delta")
+
+
+def test_split_settled_keeps_last_sentence():
+    assert orch._split_settled("Bir. İki? ") == ("Bir. ", "İki? ")
+    assert orch._split_settled("Bir.\n") == ("", "Bir.\n")
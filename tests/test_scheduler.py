@@ -0,0 +1,37 @@
+import threading
+import time
+
+from app.services import scheduler
+
+
+class _SlowScheduler:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waited = None
+
+    def shutdown(self, wait=True):
+        self.waited = wait
+        if wait:
+            self.done.wait(2)
+
+
+def test_lease_loss_waits_for_running_job_outside_state_lock(monkeypatch):
+    fake = _SlowScheduler()
+    monkeypatch.setattr(scheduler, "_scheduler", fake)
+    monkeypatch.setattr(scheduler, "_try_acquire_lease", lambda: False)
+    monkeypatch.setattr(scheduler, "RENEW_EVERY_SEC", 0)
+    scheduler._stop.clear()
+
+    elector = threading.Thread(target=scheduler._elect_loop, daemon=True)
+    elector.start()
+    time.sleep(0.1)
+
+    # çalışan iş unschedule() çağırabilmeli (kilit serbest), shutdown ise işi bekliyor
+    assert scheduler._state_lock.acquire(timeout=1)
+    scheduler._state_lock.release()
+    assert elector.is_alive() and fake.waited is True
+
+    fake.done.set()
+    scheduler._stop.set()
+    elector.join(2)
+    assert scheduler._scheduler is None